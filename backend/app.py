@@ -1,9 +1,22 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request, g, Response
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import config
 from services.neo4j_service import Neo4jService
+from services.async_neo4j_service import AsyncNeo4jService
 from services.recommendation_engine import RecommendationEngine
+from services.metrics import REGISTRY
+from services.snapshot_store import SnapshotStore
+from services.query_cache import QueryCache
+from services.rating_matrix import RatingMatrix
+from services.recommendation_pipeline import RecommendationPipeline
+from services.popularity import PopularityRanking
+from services.rating_counter import UserRatingCounter
+from services.onboarding import OnboardingRecommender
+from services.movie_stats import MovieStatsQueue
+from services.precomputed_recommendations import PrecomputedRecommendationStore
+import atexit
+import time
 import os
 
 def create_app(config_name=None):
@@ -30,7 +43,8 @@ def create_app(config_name=None):
         "origins" : allowed_origins} },
         supports_credentials=True,
         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-        allow_headers=["Content-Type", "Authorization"])
+        allow_headers=["Content-Type", "Authorization"],
+        expose_headers=["Age", "Warning", "X-Cache"])
     
     jwt = JWTManager(app)
     
@@ -49,25 +63,101 @@ def create_app(config_name=None):
     
     # Initialize services
     print("🔌 Connecting to Neo4j database...")
-    neo4j_service = Neo4jService()
+    neo4j_service = Neo4jService(app.config)
+    neo4j_async = AsyncNeo4jService(
+        neo4j_service.uri, neo4j_service.user, neo4j_service.password, app.config,
+        breaker=neo4j_service.breaker, bookmark_store=neo4j_service
+    )
     print("🧠 Initializing recommendation engine...")
-    recommendation_engine = RecommendationEngine(neo4j_service)
+    rating_matrix = None
+    if app.config['RATING_MATRIX_ENABLED']:
+        # Loads in the background; collaborative filtering uses Cypher until it is ready
+        rating_matrix = RatingMatrix.from_settings(app.config)
+        rating_matrix.start(
+            neo4j_service,
+            sync_seconds=app.config['RATING_MATRIX_SYNC_SECONDS'],
+            rebuild_seconds=app.config['RATING_MATRIX_REBUILD_SECONDS']
+        )
+    # Per-user rating counts and when each user's ratings last changed in any worker
+    app.rating_counter = UserRatingCounter.from_settings(neo4j_service, rating_matrix, app.config)
+    recommendation_engine = RecommendationEngine.from_settings(
+        neo4j_service, app.config, neo4j_async=neo4j_async, rating_matrix=rating_matrix,
+        rating_counter=app.rating_counter
+    )
+    factor_store = recommendation_engine.factor_store
     print("✅ Backend services initialized successfully!")
     
     # Make services available to routes
     app.neo4j_service = neo4j_service
+    app.neo4j_async = neo4j_async
     app.recommendation_engine = recommendation_engine
+    app.factor_store = factor_store
+    
+    # Hybrid lists precomputed for every user; /for-me falls back to live scoring
+    precomputed = PrecomputedRecommendationStore.from_settings(app.config)
+    if app.config['PRECOMPUTE_INTERVAL_SECONDS'] > 0:
+        precomputed.start(
+            recommendation_engine, app.config['PRECOMPUTE_INTERVAL_SECONDS'],
+            chunk_size=app.config['PRECOMPUTE_CHUNK_SIZE'], top_n=app.config['PRECOMPUTE_TOP_N']
+        )
+    app.precomputed = precomputed
+    
+    # Staged generate/merge/filter/rank alternative to the fixed hybrid merge
+    app.recommendation_pipeline = RecommendationPipeline.from_settings(recommendation_engine, app.config)
+    
+    # Cold start: new users are spotted by the rating counter and get the popularity ranking
+    app.popularity = PopularityRanking.from_settings(neo4j_service, app.config)
+    app.popularity.start()
+    app.onboarding = OnboardingRecommender.from_settings(app.popularity, recommendation_engine, app.config)
+    
+    # Recommendation responses per user, invalidated from routes/ratings.py
+    app.recommendation_cache = QueryCache(
+        max_entries=app.config['RECOMMENDATION_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['RECOMMENDATION_CACHE_MAX_BYTES'],
+        ttl=app.config['RECOMMENDATION_CACHE_TTL']
+    )
+    app.rating_matrix = rating_matrix
+    app.snapshot_store = SnapshotStore.from_settings(app.config)
+    
+    # Movie rating totals are written behind the rating routes in batches
+    app.movie_stats = MovieStatsQueue.from_settings(neo4j_service, app.config)
+    app.movie_stats.start()
     
     # Import and register blueprints
     from routes.auth import auth_bp
     from routes.movies import movies_bp
     from routes.ratings import ratings_bp
     from routes.recommendations import recommendations_bp
+    from routes.admin import admin_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(movies_bp, url_prefix='/api/movies')
     app.register_blueprint(ratings_bp, url_prefix='/api/ratings')
     app.register_blueprint(recommendations_bp, url_prefix='/api/recommendations')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    
+    # Per-route request latency, exported on /api/metrics
+    request_seconds = REGISTRY.histogram(
+        'http_request_duration_seconds', 'Request latency by route', ('method', 'route', 'status'))
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def record_request_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            request_seconds.observe(
+                time.perf_counter() - started,
+                method=request.method, route=route, status=response.status_code
+            )
+        return response
+    
+    @app.route('/api/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
     
     # Health check route
     @app.route('/api/health')
@@ -76,6 +166,21 @@ def create_app(config_name=None):
             'status': 'healthy',
             'message': 'Movie Recommendation API is running!',
             'database': 'connected' if neo4j_service.driver else 'disconnected',
+            'circuit': neo4j_service.breaker.stats(),
+            'snapshots': app.snapshot_store.stats(),
+            'rating_matrix': rating_matrix.stats() if rating_matrix else None,
+            'factor_model': factor_store.stats(),
+            'similarity_index': recommendation_engine.similarity_index.stats(),
+            'text_vectors': recommendation_engine.text_vectors.stats(),
+            'precomputed': precomputed.stats(),
+            'popularity': app.popularity.stats(),
+            'rating_counter': app.rating_counter.stats(),
+            'onboarding': app.onboarding.stats(),
+            'movie_stats': app.movie_stats.stats(),
+            'recommendation_cache': app.recommendation_cache.stats(),
+            'pool': neo4j_service.pool_stats(),
+            'async_pool': neo4j_async.pool_stats(),
+            'query_cache': neo4j_service.query_cache.stats(),
             'version': '1.0.0'
         })
     
@@ -86,6 +191,7 @@ def create_app(config_name=None):
             'version': '1.0.0',
             'endpoints': {
                 'health': '/api/health',
+                'metrics': '/api/metrics',
                 'auth': '/api/auth',
                 'movies': '/api/movies',
                 'ratings': '/api/ratings',
@@ -118,11 +224,14 @@ def create_app(config_name=None):
     def internal_error(error):
         return jsonify({'message': 'Internal server error'}), 500
     
-    # Cleanup on app teardown
-    @app.teardown_appcontext
-    def close_db(error):
-        if hasattr(app, 'neo4j_service'):
-            app.neo4j_service.close()
+    # The connection pool lives as long as the process; close it on shutdown only
+    atexit.register(neo4j_service.close)
+    atexit.register(neo4j_async.close)
+    atexit.register(precomputed.stop)
+    atexit.register(app.recommendation_pipeline.close)
+    atexit.register(app.popularity.stop)
+    # Registered after close, so runs before it: the last deltas need the pool
+    atexit.register(app.movie_stats.stop)
     
     return app
 
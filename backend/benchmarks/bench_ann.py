@@ -0,0 +1,134 @@
+"""
+Benchmark: LSH nearest-neighbour lookups vs exact search
+
+Generates synthetic item vectors at each size and compares top-k lookups
+through services.ann_index.LSHIndex with an exact scan of every item.
+
+- factors: clustered dense vectors standing in for MF item factors,
+  searched by inner product (augmented as in FactorModel)
+- text: sparse hashed-term rows standing in for TextVectors, by cosine
+
+For each size and table count it prints build time, mean candidates per
+query, recall@k against the exact top-k and p50/p99 latency of both. The
+last column is recall for items added with `insert` after the build.
+
+Usage (from backend/):
+    python benchmarks/bench_ann.py --sizes 100000 1000000
+    python benchmarks/bench_ann.py --kind text --sizes 100000 --tables 8 12 16
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import scipy.sparse as sp
+from services.ann_index import LSHIndex, mips_vectors, top_rows
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def synthetic_factors(n_items, dims=64, seed=42):
+    """Items around 1,000 taste clusters, with varying norms like trained factors"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((1000, dims))
+    items = centers[rng.integers(0, len(centers), n_items)] + 0.5 * rng.standard_normal((n_items, dims))
+    return (items * rng.uniform(0.5, 1.5, (n_items, 1)) / np.sqrt(dims)).astype(np.float32)
+
+def synthetic_text(n_items, n_features=2 ** 18, terms=40, seed=42):
+    """L2-normalised TF-IDF rows of Zipf-distributed terms, drawn around 1,000 topics"""
+    rng = np.random.default_rng(seed)
+    topics = rng.integers(0, n_features, (1000, 200))
+    topic = rng.integers(0, len(topics), n_items)
+    own = topics[topic[:, None], np.minimum(rng.zipf(1.3, (n_items, terms // 2)) - 1, 199)]
+    shared = np.minimum(rng.zipf(1.3, (n_items, terms // 2)), n_features) - 1
+    cols = np.hstack([own, shared])
+    rows = np.repeat(np.arange(n_items), terms)
+    matrix = sp.csr_matrix((np.ones(rows.size, dtype=np.float32), (rows, cols.ravel())), shape=(n_items, n_features))
+    matrix.data = 1.0 + np.log(matrix.data)
+    df = np.bincount(matrix.indices, minlength=n_features)
+    matrix = matrix.multiply(np.log((n_items + 1) / (df + 1)) + 1.0).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    return sp.diags(1.0 / norms).dot(matrix).tocsr().astype(np.float32)
+
+def dense_scorer(items):
+    return lambda rows, query: items[rows] @ query
+
+def sparse_scorer(items):
+    return lambda rows, query: (items[rows] @ query.T).toarray().ravel()
+
+def run(items, index_items, queries, query_for, score, k, index):
+    """(recall, mean candidates, exact ms, ann ms) over `queries` rows"""
+    everything = np.arange(items.shape[0])
+    recall, candidates, exact_ms, ann_ms = [], [], [], []
+    for row in queries:
+        query = query_for(row)
+
+        started = time.perf_counter()
+        exact, _ = top_rows(everything, score(everything, query), k + 1)
+        exact_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        rows = index.candidates(index_items(query))
+        found, _ = top_rows(rows, score(rows, query), k + 1)
+        ann_ms.append((time.perf_counter() - started) * 1000)
+
+        # The query item itself is in both; compare its neighbours
+        exact, found = set(exact.tolist()) - {row}, set(found.tolist()) - {row}
+        recall.append(len(exact & found) / max(len(exact), 1))
+        candidates.append(len(rows))
+    return np.mean(recall), np.mean(candidates), exact_ms, ann_ms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kind', choices=['factors', 'text'], default='factors')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--tables', type=int, nargs='+', default=[8, 12, 16])
+    parser.add_argument('--queries', type=int, default=200, help='Items sampled as queries per run')
+    parser.add_argument('--probes', type=int, default=16, help='Signatures probed per table')
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'items':>9}{'tables':>7}{'bits':>6}{'build':>9}{'cands':>8}{'recall':>8}"
+          f"{'ex p50':>10}{'ex p99':>10}{'ann p50':>10}{'ann p99':>10}{'ins rec':>9}")
+
+    for size in args.sizes:
+        if args.kind == 'factors':
+            items = synthetic_factors(size)
+            indexed = mips_vectors(items)
+            score = dense_scorer(items)
+            query_for = lambda row: items[row]
+            index_items = lambda query: np.append(query, np.float32(0.0))
+        else:
+            items = indexed = synthetic_text(size)
+            score = sparse_scorer(items)
+            query_for = lambda row: items[row]
+            index_items = lambda query: query
+
+        rng = np.random.default_rng(7)
+        queries = rng.choice(size, args.queries, replace=False).tolist()
+        split = int(size * 0.9)
+        inserted = rng.choice(np.arange(split, size), min(args.queries, size - split), replace=False).tolist()
+
+        for tables in args.tables:
+            started = time.perf_counter()
+            index = LSHIndex.build(indexed, n_tables=tables, n_probes=args.probes)
+            build_s = time.perf_counter() - started
+            recall, candidates, exact_ms, ann_ms = run(items, index_items, queries, query_for, score, args.k, index)
+
+            # Build on the first 90%, insert the rest, query the inserted items
+            partial = LSHIndex.build(indexed[:split], n_tables=tables, n_bits=index.n_bits, n_probes=args.probes)
+            partial.insert(indexed[split:])
+            insert_recall = run(items, index_items, inserted, query_for, score, args.k, partial)[0]
+
+            print(f"{size:>9}{tables:>7}{index.n_bits:>6}{build_s:>8.2f}s{candidates:>8.0f}{recall:>8.3f}"
+                  f"{percentile(exact_ms, 50):>8.2f}ms{percentile(exact_ms, 99):>8.2f}ms"
+                  f"{percentile(ann_ms, 50):>8.2f}ms{percentile(ann_ms, 99):>8.2f}ms{insert_recall:>9.3f}")
+
+if __name__ == '__main__':
+    main()
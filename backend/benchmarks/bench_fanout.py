@@ -0,0 +1,147 @@
+"""
+Benchmark: sequential vs concurrent query fan-out
+
+Runs the independent queries behind three endpoints against your Neo4j
+database, first one after another on Neo4jService (the old route behaviour)
+and then concurrently on AsyncNeo4jService (the async routes), and prints
+p50/p99 latency for each.
+
+    - GET /api/movies/<movie_id>                   movie + reviews
+    - GET /api/recommendations/hybrid/<user_id>   collaborative + content
+    - GET /api/auth/profile                        user + stats + genres + recent ratings
+
+Usage (from backend/):
+    python benchmarks/bench_fanout.py --iterations 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from services.neo4j_service import Neo4jService
+from services.async_neo4j_service import AsyncNeo4jService
+from services.auth_service import AuthService
+from services.recommendation_engine import COLLABORATIVE_QUERY, CONTENT_BASED_QUERY
+
+load_dotenv()
+
+MOVIE_QUERY = """
+MATCH (m:Movie {id: $movie_id})
+OPTIONAL MATCH (m)-[:HAS_GENRE]->(g:Genre)
+OPTIONAL MATCH (m)-[:DIRECTED_BY]->(d:Director)
+OPTIONAL MATCH (m)-[:STARS]->(a:Actor)
+RETURN m.id as id, m.title as title, collect(DISTINCT g.name) as genres,
+       collect(DISTINCT d.name) as directors, collect(DISTINCT a.name) as actors
+"""
+
+REVIEWS_QUERY = """
+MATCH (u:User)-[r:RATED]->(m:Movie {id: $movie_id})
+RETURN u.username as username, r.rating as rating, coalesce(r.review, '') as review
+ORDER BY r.timestamp DESC
+LIMIT 10
+"""
+
+GENRES_QUERY = """
+MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie)-[:HAS_GENRE]->(g:Genre)
+WHERE r.rating >= 4.0
+WITH g, COUNT(r) as count, AVG(r.rating) as avg_rating
+RETURN g.name as genre, count, avg_rating
+ORDER BY count DESC, avg_rating DESC
+LIMIT 5
+"""
+
+RECENT_RATINGS_QUERY = """
+MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie)
+RETURN m.id as movie_id, r.rating as rating
+ORDER BY r.timestamp DESC
+LIMIT 5
+"""
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def endpoint_queries(movie_id, user_id, limit=15):
+    rec_params = {'userId': user_id, 'limit': limit * 2}
+    user_params = {'user_id': user_id}
+    return {
+        'movie_details': [
+            (MOVIE_QUERY, {'movie_id': movie_id}),
+            (REVIEWS_QUERY, {'movie_id': movie_id}),
+        ],
+        'hybrid_recommendations': [
+            (COLLABORATIVE_QUERY, rec_params),
+            (CONTENT_BASED_QUERY, rec_params),
+        ],
+        'user_profile': [
+            (AuthService.USER_BY_ID_QUERY, user_params),
+            (AuthService.USER_STATS_QUERY, user_params),
+            (GENRES_QUERY, user_params),
+            (RECENT_RATINGS_QUERY, user_params),
+        ],
+    }
+
+
+def run_sequential(neo4j, queries):
+    started = time.perf_counter()
+    for query, params in queries:
+        neo4j.execute_read(query, params)
+    return (time.perf_counter() - started) * 1000
+
+
+def run_concurrent(neo4j_async, queries):
+    started = time.perf_counter()
+    neo4j_async.run(neo4j_async.gather(*queries))
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--movie-id', help='Movie to benchmark (default: most rated movie)')
+    parser.add_argument('--user-id', help='User to benchmark (default: user with most ratings)')
+    args = parser.parse_args()
+
+    neo4j = Neo4jService()
+    neo4j_async = AsyncNeo4jService(neo4j.uri, neo4j.user, neo4j.password, {})
+
+    try:
+        movie_id = args.movie_id or neo4j.execute_read(
+            "MATCH (m:Movie) OPTIONAL MATCH (m)<-[r:RATED]-() "
+            "RETURN m.id as id ORDER BY count(r) DESC LIMIT 1"
+        )[0]['id']
+        user_id = args.user_id or neo4j.execute_read(
+            "MATCH (u:User)-[r:RATED]->() RETURN u.id as id ORDER BY count(r) DESC LIMIT 1"
+        )[0]['id']
+
+        print(f"🎬 movie_id={movie_id}  👤 user_id={user_id}  🔁 iterations={args.iterations}\n")
+        print(f"{'endpoint':<24}{'queries':>8}{'seq p50':>10}{'seq p99':>10}{'conc p50':>10}{'conc p99':>10}")
+
+        for name, queries in endpoint_queries(movie_id, user_id).items():
+            for _ in range(args.warmup):
+                run_sequential(neo4j, queries)
+                run_concurrent(neo4j_async, queries)
+
+            sequential = [run_sequential(neo4j, queries) for _ in range(args.iterations)]
+            concurrent = [run_concurrent(neo4j_async, queries) for _ in range(args.iterations)]
+
+            print(
+                f"{name:<24}{len(queries):>8}"
+                f"{percentile(sequential, 50):>8.1f}ms{percentile(sequential, 99):>8.1f}ms"
+                f"{percentile(concurrent, 50):>8.1f}ms{percentile(concurrent, 99):>8.1f}ms"
+            )
+    finally:
+        neo4j_async.close()
+        neo4j.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark: collaborative filtering on the in-memory rating matrix vs Cypher
+
+Generates synthetic ratings (popularity-skewed movies, per-user and
+per-movie rating bias) at each size, builds a RatingMatrix from them and
+times `recommend()` for a sample of users. Prints build time, matrix memory
+and p50/p99 latency.
+
+With --cypher the same ratings are also written to Neo4j under `bench-`
+ids and COLLABORATIVE_QUERY is timed for the same users. The bench nodes
+are deleted afterwards. This writes to the configured database, so point
+NEO4J_URI at a scratch instance.
+
+Usage (from backend/):
+    python benchmarks/bench_rating_matrix.py --sizes 10000 100000 1000000
+    python benchmarks/bench_rating_matrix.py --sizes 10000 100000 --cypher
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from dotenv import load_dotenv
+from services.rating_matrix import RatingMatrix
+from services.recommendation_engine import COLLABORATIVE_QUERY
+
+load_dotenv()
+
+BENCH_PREFIX = 'bench-'
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def synthetic_ratings(n_ratings, seed=42):
+    """~20 ratings per user, ~50 per movie, movie popularity following a power law"""
+    rng = np.random.default_rng(seed)
+    n_users = max(n_ratings // 20, 10)
+    n_movies = max(min(n_ratings // 50, 20000), 20)
+
+    popularity = 1.0 / np.arange(1, n_movies + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    # Oversample, then drop repeated (user, movie) pairs
+    users = rng.integers(0, n_users, int(n_ratings * 1.3))
+    movies = rng.choice(n_movies, size=len(users), p=popularity)
+    pairs = np.unique(users.astype(np.int64) * n_movies + movies)[:n_ratings]
+    users, movies = pairs // n_movies, pairs % n_movies
+
+    user_bias = rng.normal(0, 0.5, n_users)
+    movie_quality = rng.normal(3.5, 0.7, n_movies)
+    ratings = np.clip(movie_quality[movies] + user_bias[users] + rng.normal(0, 0.6, len(pairs)), 1.0, 5.0)
+
+    return [
+        {'user_id': f"{BENCH_PREFIX}u{u}", 'movie_id': f"{BENCH_PREFIX}m{m}", 'rating': round(float(r), 1)}
+        for u, m, r in zip(users.tolist(), movies.tolist(), ratings.tolist())
+    ]
+
+def matrix_bytes(matrix):
+    snapshot = matrix._snapshot
+    total = 0
+    for m in (snapshot.ratings, snapshot.rated, snapshot.centered):
+        total += m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+    return total
+
+def load_into_neo4j(neo4j, ratings):
+    neo4j.execute_write_batch(
+        "UNWIND $rows AS row MERGE (:User {id: row.id})",
+        [{'id': uid} for uid in sorted({r['user_id'] for r in ratings})], progress=lambda *a: None
+    )
+    neo4j.execute_write_batch(
+        "UNWIND $rows AS row MERGE (:Movie {id: row.id, title: row.id, avg_rating: 3.5})",
+        [{'id': mid} for mid in sorted({r['movie_id'] for r in ratings})], progress=lambda *a: None
+    )
+    neo4j.execute_write_batch(
+        """
+        UNWIND $rows AS row
+        MATCH (u:User {id: row.user_id}), (m:Movie {id: row.movie_id})
+        CREATE (u)-[:RATED {rating: row.rating, timestamp: datetime()}]->(m)
+        """,
+        ratings, batch_size=5000, progress=lambda *a: None
+    )
+
+def remove_from_neo4j(neo4j):
+    for label in ('User', 'Movie'):
+        neo4j.execute_write_query(
+            f"""
+            MATCH (n:{label}) WHERE n.id STARTS WITH $prefix
+            CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF 5000 ROWS
+            """,
+            {'prefix': BENCH_PREFIX}, timeout=0
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=200, help='Users sampled per size')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--similarity', choices=['pearson', 'cosine'], default='pearson')
+    parser.add_argument('--cypher', action='store_true', help='Also time COLLABORATIVE_QUERY on Neo4j')
+    args = parser.parse_args()
+
+    neo4j = None
+    if args.cypher:
+        from services.neo4j_service import Neo4jService
+        neo4j = Neo4jService()
+
+    header = f"{'ratings':>10}{'users':>8}{'movies':>8}{'build':>9}{'memory':>10}{'mx p50':>10}{'mx p99':>10}"
+    if neo4j:
+        header += f"{'cy p50':>10}{'cy p99':>10}"
+    print(header)
+
+    try:
+        for size in args.sizes:
+            ratings = synthetic_ratings(size)
+            matrix = RatingMatrix(similarity=args.similarity)
+
+            started = time.perf_counter()
+            matrix.build(ratings)
+            build_s = time.perf_counter() - started
+
+            rng = np.random.default_rng(7)
+            sample = [matrix.user_ids[i] for i in rng.choice(len(matrix.user_ids), args.queries, replace=False)]
+
+            matrix_ms = []
+            for user_id in sample:
+                started = time.perf_counter()
+                matrix.recommend(user_id, args.limit)
+                matrix_ms.append((time.perf_counter() - started) * 1000)
+
+            row = (
+                f"{len(ratings):>10}{len(matrix.user_ids):>8}{len(matrix.movie_ids):>8}"
+                f"{build_s:>8.2f}s{matrix_bytes(matrix) / 1e6:>8.1f}MB"
+                f"{percentile(matrix_ms, 50):>8.2f}ms{percentile(matrix_ms, 99):>8.2f}ms"
+            )
+
+            if neo4j:
+                try:
+                    load_into_neo4j(neo4j, ratings)
+                    cypher_ms = []
+                    for user_id in sample:
+                        started = time.perf_counter()
+                        neo4j.execute_read(COLLABORATIVE_QUERY, {'userId': user_id, 'limit': args.limit}, timeout=0)
+                        cypher_ms.append((time.perf_counter() - started) * 1000)
+                    row += f"{percentile(cypher_ms, 50):>8.1f}ms{percentile(cypher_ms, 99):>8.1f}ms"
+                finally:
+                    remove_from_neo4j(neo4j)
+
+            print(row)
+    finally:
+        if neo4j:
+            neo4j.close()
+
+if __name__ == '__main__':
+    main()
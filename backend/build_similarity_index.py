@@ -0,0 +1,45 @@
+"""
+Similar Movies Index Builder
+Builds the item-item similarity index that /api/recommendations/similar
+serves from, weighting shared genres, directors and actors. By default only
+movies missing from the current index are added; --rebuild starts over.
+
+Usage (from backend/):
+    python build_similarity_index.py
+    python build_similarity_index.py --rebuild
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import config
+from services.neo4j_service import Neo4jService
+from services.similarity_index import SimilarityIndexStore, sync_similarity_index
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help='Recompute every movie (refreshes IDF weights)')
+    args = parser.parse_args()
+
+    config_class = config[os.getenv('FLASK_ENV', 'development')]
+    settings = {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+
+    neo4j = Neo4jService(settings)
+    try:
+        print("🎭 Updating similar movies index...")
+        version = sync_similarity_index(neo4j, SimilarityIndexStore.from_settings(settings), rebuild=args.rebuild)
+    finally:
+        neo4j.close()
+
+    if version:
+        print(f"✅ Saved similarity index {version}")
+    else:
+        print("✅ Similarity index already up to date")
+
+if __name__ == "__main__":
+    main()
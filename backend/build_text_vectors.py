@@ -0,0 +1,45 @@
+"""
+Plot Text Vectors Builder
+Builds the TF-IDF vectors of every movie's plot, title and cast that
+content-based and similar-movie scoring use. By default only movies missing
+from the current version are added; --rebuild starts over.
+
+Usage (from backend/):
+    python build_text_vectors.py
+    python build_text_vectors.py --rebuild
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import config
+from services.neo4j_service import Neo4jService
+from services.text_vectors import TextVectorStore, sync_text_vectors
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help='Re-vectorise every movie (refreshes IDF weights)')
+    args = parser.parse_args()
+
+    config_class = config[os.getenv('FLASK_ENV', 'development')]
+    settings = {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+
+    neo4j = Neo4jService(settings)
+    try:
+        print("📝 Updating plot text vectors...")
+        version = sync_text_vectors(neo4j, TextVectorStore.from_settings(settings), rebuild=args.rebuild)
+    finally:
+        neo4j.close()
+
+    if version:
+        print(f"✅ Saved text vectors {version}")
+    else:
+        print("✅ Text vectors already up to date")
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,147 @@ class Config:
     NEO4J_USER = os.getenv('NEO4J_USER', 'neo4j')
     NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
     
+    # Neo4j connection pool (shared by every request in a worker process)
+    NEO4J_MAX_POOL_SIZE = int(os.getenv('NEO4J_MAX_POOL_SIZE', 50))
+    NEO4J_ACQUISITION_TIMEOUT = float(os.getenv('NEO4J_ACQUISITION_TIMEOUT', 30.0))  # seconds
+    NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv('NEO4J_MAX_CONNECTION_LIFETIME', 3600))  # seconds
+    NEO4J_POOL_WARMUP = int(os.getenv('NEO4J_POOL_WARMUP', 4))  # connections opened at startup
+    NEO4J_ASYNC_MAX_POOL_SIZE = int(os.getenv('NEO4J_ASYNC_MAX_POOL_SIZE', 10))  # async driver's pool, on top of the one above
+    
+    # Managed transactions
+    NEO4J_QUERY_TIMEOUT = float(os.getenv('NEO4J_QUERY_TIMEOUT', 10.0))  # seconds per transaction, 0 = no limit
+    NEO4J_MAX_TX_RETRY_TIME = float(os.getenv('NEO4J_MAX_TX_RETRY_TIME', 15.0))  # retry budget for transient errors
+    NEO4J_MAX_BOOKMARK_KEYS = int(os.getenv('NEO4J_MAX_BOOKMARK_KEYS', 10000))  # users tracked for read-your-writes
+    NEO4J_FETCH_SIZE = int(os.getenv('NEO4J_FETCH_SIZE', 1000))  # records per round trip for streamed reads
+    
+    # UNWIND batch writes
+    NEO4J_BATCH_SIZE = int(os.getenv('NEO4J_BATCH_SIZE', 1000))  # rows per transaction
+    NEO4J_BATCH_MAX_RETRIES = int(os.getenv('NEO4J_BATCH_MAX_RETRIES', 3))  # extra attempts per failed chunk
+    
+    # Micro-batching of concurrent point lookups (BatchLoader)
+    NEO4J_LOADER_WINDOW_MS = float(os.getenv('NEO4J_LOADER_WINDOW_MS', 2))  # how long a batch collects keys
+    NEO4J_LOADER_MAX_BATCH = int(os.getenv('NEO4J_LOADER_MAX_BATCH', 100))  # keys per UNWIND query
+    
+    # Query-result cache for catalog reads (per worker process)
+    QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', 1000))  # 0 = cache off
+    QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', 32 * 1024 * 1024))  # approximate memory budget
+    QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', 300))  # seconds, backstop for other workers' writes
+    
+    # Hybrid recommendations: arms still running after this are dropped and backfilled with popular movies
+    HYBRID_DEADLINE_MS = float(os.getenv('HYBRID_DEADLINE_MS', 800))
+    
+    # Staged recommendation pipeline (/for-me?type=pipeline): generators as name:weight pairs
+    PIPELINE_GENERATORS = os.getenv(
+        'PIPELINE_GENERATORS', 'collaborative:0.6,content:0.4,similar_to_recent:0.4,new_releases:0.1,popular:0.1'
+    )
+    PIPELINE_GENERATOR_BUDGET = int(os.getenv('PIPELINE_GENERATOR_BUDGET', 50))  # candidates per generator
+    PIPELINE_MERGE_BUDGET = int(os.getenv('PIPELINE_MERGE_BUDGET', 200))  # candidates kept after dedup
+    PIPELINE_RANK_BUDGET = int(os.getenv('PIPELINE_RANK_BUDGET', 100))  # candidates re-scored by the ranker
+    PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', 32))  # generator threads shared by all pipeline requests
+    
+    # Cold start: /for-me answers users without ratings from a popularity ranking
+    POPULARITY_TOP_N = int(os.getenv('POPULARITY_TOP_N', 100))  # movies kept overall and per genre
+    POPULARITY_PRIOR_VOTES = float(os.getenv('POPULARITY_PRIOR_VOTES', 10))  # weight of the IMDb rating, in ratings
+    POPULARITY_REFRESH_SECONDS = float(os.getenv('POPULARITY_REFRESH_SECONDS', 600))
+    RATING_COUNTER_MAX_ENTRIES = int(os.getenv('RATING_COUNTER_MAX_ENTRIES', 100000))  # users whose counts are cached
+    RATING_COUNTER_TTL_SECONDS = float(os.getenv('RATING_COUNTER_TTL_SECONDS', 60))  # backstop for other workers' writes
+    RATING_CHANGES_TTL_SECONDS = float(os.getenv('RATING_CHANGES_TTL_SECONDS', 1.0))  # how late other workers' ratings may be noticed
+    
+    # Write-behind movie rating totals (rating_sum / rating_count / avg_rating)
+    MOVIE_STATS_FLUSH_SECONDS = float(os.getenv('MOVIE_STATS_FLUSH_SECONDS', 0.25))  # how often queued deltas are written
+    MOVIE_STATS_BATCH_SIZE = int(os.getenv('MOVIE_STATS_BATCH_SIZE', 500))  # movies per UNWIND transaction
+    MOVIE_STATS_SPOOL_DIR = os.getenv('MOVIE_STATS_SPOOL_DIR', os.path.join(os.path.dirname(__file__), 'movie_stats'))  # deltas not written at shutdown
+    MOVIE_STATS_BATCH_RETENTION_SECONDS = float(os.getenv('MOVIE_STATS_BATCH_RETENTION_SECONDS', 7 * 24 * 3600))  # how long applied batch ids are remembered
+    
+    # Bulk rating import (/api/ratings/bulk)
+    BULK_RATINGS_MAX_ROWS = int(os.getenv('BULK_RATINGS_MAX_ROWS', 5000))  # ratings per request
+    
+    # Onboarding (/api/recommendations/onboarding): genre picks plus a few liked movies
+    ONBOARDING_LIKE_WEIGHT = float(os.getenv('ONBOARDING_LIKE_WEIGHT', 0.5))  # similarity to liked movies vs popularity
+    ONBOARDING_MAX_LIKED = int(os.getenv('ONBOARDING_MAX_LIKED', 10))  # liked movies considered per request
+    ONBOARDING_CACHE_ENTRIES = int(os.getenv('ONBOARDING_CACHE_ENTRIES', 10000))  # memoised answers
+    
+    # Per-user cache of recommendation responses, dropped when the user rates
+    RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv('RECOMMENDATION_CACHE_MAX_ENTRIES', 10000))  # 0 = cache off
+    RECOMMENDATION_CACHE_MAX_BYTES = int(os.getenv('RECOMMENDATION_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    RECOMMENDATION_CACHE_TTL = float(os.getenv('RECOMMENDATION_CACHE_TTL', 600))  # seconds, bounds drift from other users' ratings
+    
+    # In-memory rating matrix for collaborative filtering
+    RATING_MATRIX_ENABLED = os.getenv('RATING_MATRIX_ENABLED', 'true').lower() == 'true'
+    RATING_MATRIX_SIMILARITY = os.getenv('RATING_MATRIX_SIMILARITY', 'pearson')  # pearson | cosine
+    RATING_MATRIX_NEIGHBORS = int(os.getenv('RATING_MATRIX_NEIGHBORS', 50))  # similar users scored per request
+    RATING_MATRIX_SHRINKAGE = float(os.getenv('RATING_MATRIX_SHRINKAGE', 25.0))  # damps similarity on few co-ratings
+    RATING_MATRIX_MIN_COMMON = int(os.getenv('RATING_MATRIX_MIN_COMMON', 2))  # co-rated movies needed to be a neighbour
+    RATING_MATRIX_COMPACT_THRESHOLD = int(os.getenv('RATING_MATRIX_COMPACT_THRESHOLD', 1000))  # changes before re-packing
+    RATING_MATRIX_COMPACT_SECONDS = float(os.getenv('RATING_MATRIX_COMPACT_SECONDS', 30))  # max age of un-packed changes
+    RATING_MATRIX_SYNC_SECONDS = float(os.getenv('RATING_MATRIX_SYNC_SECONDS', 60))  # pull other workers' ratings
+    RATING_MATRIX_REBUILD_SECONDS = float(os.getenv('RATING_MATRIX_REBUILD_SECONDS', 3600))  # full reload (picks up deletes)
+    
+    # Matrix factorization (trained offline by train_mf.py, memory-mapped by the API)
+    MF_MODEL_DIR = os.getenv('MF_MODEL_DIR', os.path.join(os.path.dirname(__file__), 'factors'))
+    MF_FACTORS = int(os.getenv('MF_FACTORS', 64))  # latent dimensions
+    MF_REGULARIZATION = float(os.getenv('MF_REGULARIZATION', 0.1))  # L2 penalty, scaled by rating count
+    MF_ITERATIONS = int(os.getenv('MF_ITERATIONS', 15))  # ALS sweeps
+    MF_WORKERS = int(os.getenv('MF_WORKERS', 0))  # solver threads, 0 = CPU count
+    MF_KEEP_VERSIONS = int(os.getenv('MF_KEEP_VERSIONS', 3))  # saved versions kept for rollback
+    MF_RELOAD_SECONDS = float(os.getenv('MF_RELOAD_SECONDS', 30))  # how often workers look for a new version
+    MF_MAX_FOLD_INS = int(os.getenv('MF_MAX_FOLD_INS', 10000))  # raters since training remembered for replay
+    
+    # Precomputed hybrid recommendations (precompute_recommendations.py or the in-app schedule)
+    PRECOMPUTE_DIR = os.getenv('PRECOMPUTE_DIR', os.path.join(os.path.dirname(__file__), 'precomputed'))
+    PRECOMPUTE_TOP_N = int(os.getenv('PRECOMPUTE_TOP_N', 15))  # list length stored per user (the /for-me default)
+    PRECOMPUTE_CHUNK_SIZE = int(os.getenv('PRECOMPUTE_CHUNK_SIZE', 200))  # users per batch query
+    PRECOMPUTE_WORKERS = int(os.getenv('PRECOMPUTE_WORKERS', 0))  # CLI worker processes, 0 = CPU count
+    PRECOMPUTE_INTERVAL_SECONDS = float(os.getenv('PRECOMPUTE_INTERVAL_SECONDS', 0))  # in-app schedule, 0 = off
+    PRECOMPUTE_MAX_AGE_SECONDS = float(os.getenv('PRECOMPUTE_MAX_AGE_SECONDS', 86400))  # older lists are computed live
+    PRECOMPUTE_KEEP_VERSIONS = int(os.getenv('PRECOMPUTE_KEEP_VERSIONS', 2))
+    PRECOMPUTE_RELOAD_SECONDS = float(os.getenv('PRECOMPUTE_RELOAD_SECONDS', 30))  # how often workers look for a new version
+    
+    # Item-item similarity index for /similar (build_similarity_index.py)
+    SIMILAR_INDEX_DIR = os.getenv('SIMILAR_INDEX_DIR', os.path.join(os.path.dirname(__file__), 'similarity'))
+    SIMILAR_TOP_K = int(os.getenv('SIMILAR_TOP_K', 50))  # neighbours kept per movie (the /similar max limit)
+    SIMILAR_GENRE_WEIGHT = float(os.getenv('SIMILAR_GENRE_WEIGHT', 1.0))
+    SIMILAR_DIRECTOR_WEIGHT = float(os.getenv('SIMILAR_DIRECTOR_WEIGHT', 2.0))
+    SIMILAR_ACTOR_WEIGHT = float(os.getenv('SIMILAR_ACTOR_WEIGHT', 1.0))
+    SIMILAR_KEEP_VERSIONS = int(os.getenv('SIMILAR_KEEP_VERSIONS', 2))
+    SIMILAR_RELOAD_SECONDS = float(os.getenv('SIMILAR_RELOAD_SECONDS', 30))  # how often workers look for a new version
+    
+    # Plot/title/cast TF-IDF vectors (build_text_vectors.py)
+    TEXT_VECTORS_DIR = os.getenv('TEXT_VECTORS_DIR', os.path.join(os.path.dirname(__file__), 'text_vectors'))
+    TEXT_VECTORS_FEATURES = int(os.getenv('TEXT_VECTORS_FEATURES', 2 ** 18))  # hashed term buckets
+    TEXT_VECTORS_KEEP_VERSIONS = int(os.getenv('TEXT_VECTORS_KEEP_VERSIONS', 2))
+    TEXT_VECTORS_RELOAD_SECONDS = float(os.getenv('TEXT_VECTORS_RELOAD_SECONDS', 30))
+    TEXT_CONTENT_WEIGHT = float(os.getenv('TEXT_CONTENT_WEIGHT', 1.0))  # content score boost at text similarity 1.0
+    TEXT_SIMILAR_WEIGHT = float(os.getenv('TEXT_SIMILAR_WEIGHT', 0.3))  # share of text similarity in /similar scores
+    
+    # LSH nearest-neighbour indexes over MF item factors and text vectors
+    ANN_MIN_ITEMS = int(os.getenv('ANN_MIN_ITEMS', 20000))  # smaller catalogs are scanned exactly
+    ANN_TABLES = int(os.getenv('ANN_TABLES', 12))  # more tables: better recall, slower lookups
+    
+    # Circuit breaker around Neo4j
+    CIRCUIT_FAILURE_RATE = float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5))  # share of outage errors that opens the circuit
+    CIRCUIT_SLOW_CALL_MS = float(os.getenv('CIRCUIT_SLOW_CALL_MS', 2000))  # calls slower than this count as slow
+    CIRCUIT_SLOW_CALL_RATE = float(os.getenv('CIRCUIT_SLOW_CALL_RATE', 0.8))  # share of slow calls that opens the circuit
+    CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', 50))  # recent calls considered
+    CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', 10))  # calls needed before the circuit can open
+    CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', 30))  # fail fast this long before probing again
+    
+    # Last good responses served while the circuit is open
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(os.path.dirname(__file__), 'snapshots'))
+    SNAPSHOT_MAX_ENTRIES = int(os.getenv('SNAPSHOT_MAX_ENTRIES', 500))
+    SNAPSHOT_REFRESH_SECONDS = float(os.getenv('SNAPSHOT_REFRESH_SECONDS', 60))  # min seconds between disk writes per key
+    
+    # Slow-query log (queried via /api/admin/slow-queries)
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 500))  # log queries slower than this, 0 = off
+    SLOW_QUERY_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_SAMPLE_RATE', 0.1))  # share of slow queries whose plan is captured
+    SLOW_QUERY_PLAN = os.getenv('SLOW_QUERY_PLAN', 'profile')  # profile | explain | none
+    SLOW_QUERY_LOG_PATH = os.getenv('SLOW_QUERY_LOG_PATH', os.path.join(os.path.dirname(__file__), 'logs', 'slow_queries.log'))
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024))
+    SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', 5))
+    
+    # Users allowed on /api/admin (comma-separated user ids)
+    ADMIN_USER_IDS = [uid for uid in os.getenv('ADMIN_USER_IDS', '').split(',') if uid]
+    
     # CORS Configuration (allows frontend to talk to backend)
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'https://popcorn-flax.vercel.app').split(',')
 
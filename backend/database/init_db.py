@@ -22,6 +22,9 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.neo4j_service import Neo4jService
+from services.similarity_index import SimilarityIndexStore, sync_similarity_index
+from services.text_vectors import TextVectorStore, sync_text_vectors
+from config import Config
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash
 
@@ -37,7 +40,7 @@ class DatabaseSetup:
     def clear_database(self):
         """⚠️ WARNING: This deletes ALL data in the database!"""
         print("\n⚠️  CLEARING ALL DATABASE DATA...")
-        self.neo4j.execute_query("MATCH (n) DETACH DELETE n")
+        self.neo4j.execute_write_query("MATCH (n) DETACH DELETE n", timeout=0)
         print("🗑️  Database cleared!")
     
     def create_constraints_and_indexes(self):
@@ -51,17 +54,22 @@ class DatabaseSetup:
             "CREATE CONSTRAINT genre_name_unique IF NOT EXISTS FOR (g:Genre) REQUIRE g.name IS UNIQUE",
             "CREATE CONSTRAINT director_name_unique IF NOT EXISTS FOR (d:Director) REQUIRE d.name IS UNIQUE",
             "CREATE CONSTRAINT actor_name_unique IF NOT EXISTS FOR (a:Actor) REQUIRE a.name IS UNIQUE",
+            # Markers of applied movie stats batches (services/movie_stats.py)
+            "CREATE CONSTRAINT movie_stats_batch_id_unique IF NOT EXISTS FOR (b:MovieStatsBatch) REQUIRE b.id IS UNIQUE",
             
             # Indexes for fast searching
             "CREATE INDEX user_email_index IF NOT EXISTS FOR (u:User) ON (u.email)",
             "CREATE INDEX movie_title_index IF NOT EXISTS FOR (m:Movie) ON (m.title)",
             "CREATE INDEX movie_rating_index IF NOT EXISTS FOR (m:Movie) ON (m.imdb_rating)",
             "CREATE INDEX movie_year_index IF NOT EXISTS FOR (m:Movie) ON (m.year)",
+            # The rating matrix's periodic sync reads ratings changed since a time
+            "CREATE INDEX rated_timestamp_index IF NOT EXISTS FOR ()-[r:RATED]-() ON (r.timestamp)",
+            "CREATE INDEX movie_stats_batch_applied_index IF NOT EXISTS FOR (b:MovieStatsBatch) ON (b.applied_at)",
         ]
         
         for constraint in constraints:
             try:
-                self.neo4j.execute_query(constraint)
+                self.neo4j.execute_write_query(constraint)
                 print(f"✅ {constraint}")
             except Exception as e:
                 print(f"⚠️  {constraint} - {e}")
@@ -139,11 +147,10 @@ class DatabaseSetup:
         
         all_genres = [g for g in all_genres if g and g != 'nan']
         
-        for genre in all_genres:
-            self.neo4j.execute_write_query(
-                "MERGE (g:Genre {name: $name})",
-                {'name': genre}
-            )
+        self.neo4j.execute_write_batch(
+            "UNWIND $rows AS row MERGE (g:Genre {name: row.name})",
+            [{'name': genre} for genre in all_genres]
+        )
         
         print(f"✅ Created {len(all_genres)} genres!")
         return all_genres
@@ -154,12 +161,11 @@ class DatabaseSetup:
         
         directors = df['Director'].dropna().unique()
         
-        for director in directors:
-            if director and str(director).strip():
-                self.neo4j.execute_write_query(
-                    "MERGE (d:Director {name: $name})",
-                    {'name': str(director).strip()}
-                )
+        self.neo4j.execute_write_batch(
+            "UNWIND $rows AS row MERGE (d:Director {name: row.name})",
+            [{'name': str(director).strip()} for director in directors
+             if director and str(director).strip()]
+        )
         
         print(f"✅ Created {len(directors)} directors!")
     
@@ -173,11 +179,10 @@ class DatabaseSetup:
         
         all_actors = [actor for actor in all_actors if actor and str(actor).strip()]
         
-        for actor in all_actors:
-            self.neo4j.execute_write_query(
-                "MERGE (a:Actor {name: $name})",
-                {'name': str(actor).strip()}
-            )
+        self.neo4j.execute_write_batch(
+            "UNWIND $rows AS row MERGE (a:Actor {name: row.name})",
+            [{'name': str(actor).strip()} for actor in all_actors]
+        )
         
         print(f"✅ Created {len(all_actors)} actors!")
     
@@ -186,12 +191,21 @@ class DatabaseSetup:
         print(f"\n🎬 Creating {len(df)} movies from CSV...")
         
         created_count = 0
+        seen_ids = set()
+        movie_rows = []
+        genre_links = []
+        director_links = []
+        actor_links = []
         
         for idx, row in df.iterrows():
             try:
                 # Generate unique movie ID
                 # movie_id = f"movie_{uuid.uuid4().hex[:8]}"
                 movie_id = str(row.iloc[0])
+                if movie_id in seen_ids:
+                    print(f"⚠️  Skipping duplicate movie ID {movie_id} ({row.get('Series_Title', 'Unknown')})")
+                    continue
+                seen_ids.add(movie_id)
                 
                 # Extract cast data from the row
                 cast_list = row['Cast_List']  # This is already parsed in clean_and_parse_data
@@ -219,66 +233,117 @@ class DatabaseSetup:
                     'cast': ', '.join(cast_list) if cast_list else None    # Alternative field name
                 }
                 
-                # Create movie node with cast properties
-                self.neo4j.execute_write_query(
-                    """
-                    CREATE (m:Movie {
-                        id: $id, title: $title, year: $year, plot: $plot,
-                        imdb_rating: $imdb_rating, meta_score: $meta_score,
-                        runtime_minutes: $runtime_minutes, certificate: $certificate,
-                        poster_url: $poster_url, votes_count: $votes_count, gross: $gross,
-                        avg_rating: $imdb_rating, rating_count: 0,
-                        Star1: $Star1, Star2: $Star2, Star3: $Star3, Star4: $Star4,
-                        stars: $stars, cast: $cast
-                    })
-                    """,
-                    movie_data
-                )
+                movie_rows.append(movie_data)
                 
-                # Connect to genres (keep existing code)
+                # Relationship rows, written in batches once all movies exist
                 for genre in row['Genre_List']:
                     if genre and genre.strip():
-                        self.neo4j.execute_write_query(
-                            """
-                            MATCH (m:Movie {id: $movie_id}), (g:Genre {name: $genre})
-                            MERGE (m)-[:HAS_GENRE]->(g)
-                            """,
-                            {'movie_id': movie_id, 'genre': genre.strip()}
-                        )
+                        genre_links.append({'movie_id': movie_id, 'name': genre.strip()})
                 
-                # Connect to director (keep existing code)
                 if pd.notna(row['Director']) and str(row['Director']).strip():
-                    self.neo4j.execute_write_query(
-                        """
-                        MATCH (m:Movie {id: $movie_id}), (d:Director {name: $director})
-                        MERGE (m)-[:DIRECTED_BY]->(d)
-                        """,
-                        {'movie_id': movie_id, 'director': str(row['Director']).strip()}
-                    )
+                    director_links.append({'movie_id': movie_id, 'name': str(row['Director']).strip()})
                 
-                # Connect to actors (keep existing relationship code for advanced queries)
                 for actor in cast_list:
                     if actor and str(actor).strip():
-                        self.neo4j.execute_write_query(
-                            """
-                            MATCH (m:Movie {id: $movie_id}), (a:Actor {name: $actor})
-                            MERGE (m)-[:STARS]->(a)
-                            """,
-                            {'movie_id': movie_id, 'actor': str(actor).strip()}
-                        )
+                        actor_links.append({'movie_id': movie_id, 'name': str(actor).strip()})
                 
                 created_count += 1
-                
-                # Progress indicator
-                if created_count % 50 == 0:
-                    print(f"  📊 Progress: {created_count}/{len(df)} movies created")
                     
             except Exception as e:
-                print(f"❌ Error creating movie {row.get('Series_Title', 'Unknown')}: {e}")
+                print(f"❌ Error preparing movie {row.get('Series_Title', 'Unknown')}: {e}")
                 continue
         
+        def report(done, total, batch):
+            print(f"  📊 Progress: {done}/{total} rows ({batch['elapsed_ms']} ms for {batch['rows']} rows)")
+        
+        # Create movie nodes with cast properties; movies already in the
+        # database are left as they are rather than failing their whole chunk
+        self.neo4j.execute_write_batch(
+            """
+            UNWIND $rows AS row
+            MERGE (m:Movie {id: row.id})
+            ON CREATE SET m += {
+                title: row.title, year: row.year, plot: row.plot,
+                imdb_rating: row.imdb_rating, meta_score: row.meta_score,
+                runtime_minutes: row.runtime_minutes, certificate: row.certificate,
+                poster_url: row.poster_url, votes_count: row.votes_count, gross: row.gross,
+                avg_rating: row.imdb_rating, rating_count: 0, rating_sum: 0.0,
+                Star1: row.Star1, Star2: row.Star2, Star3: row.Star3, Star4: row.Star4,
+                stars: row.stars, cast: row.cast
+            }
+            """,
+            movie_rows,
+            progress=report
+        )
+        
+        # Connect to genres, directors and actors
+        print("🔗 Linking genres, directors and actors...")
+        self.neo4j.execute_write_batch(
+            """
+            UNWIND $rows AS row
+            MATCH (m:Movie {id: row.movie_id}), (g:Genre {name: row.name})
+            MERGE (m)-[:HAS_GENRE]->(g)
+            """,
+            genre_links,
+            progress=report
+        )
+        self.neo4j.execute_write_batch(
+            """
+            UNWIND $rows AS row
+            MATCH (m:Movie {id: row.movie_id}), (d:Director {name: row.name})
+            MERGE (m)-[:DIRECTED_BY]->(d)
+            """,
+            director_links,
+            progress=report
+        )
+        self.neo4j.execute_write_batch(
+            """
+            UNWIND $rows AS row
+            MATCH (m:Movie {id: row.movie_id}), (a:Actor {name: row.name})
+            MERGE (m)-[:STARS]->(a)
+            """,
+            actor_links,
+            progress=report
+        )
+        
         print(f"✅ Successfully created {created_count} movies with cast data!")
     
+    def recompute_movie_stats(self):
+        """
+        Rebuild rated movies' rating_sum, rating_count and avg_rating from
+        their RATED relationships. The API keeps these up to date per write;
+        this is for ratings loaded behind its back and for databases from
+        before the running totals existed.
+        """
+        print("\n📊 Recomputing movie rating statistics...")
+        movies = self.neo4j.execute_query("MATCH (m:Movie)<-[:RATED]-(:User) RETURN DISTINCT m.id as movie_id")
+        self.neo4j.execute_write_batch(
+            """
+            UNWIND $rows AS row
+            MATCH (m:Movie {id: row.movie_id})<-[r:RATED]-(:User)
+            WITH m, sum(r.rating) as rating_sum, count(r) as rating_count
+            SET m.rating_sum = rating_sum,
+                m.rating_count = rating_count,
+                m.avg_rating = rating_sum / rating_count
+            """,
+            movies
+        )
+        print(f"✅ Recomputed statistics for {len(movies)} movies")
+    
+    def update_similarity_index(self, rebuild=False):
+        """Add the imported movies to the similar-movies index (or rebuild it)"""
+        print("\n🎭 Updating similar movies index...")
+        settings = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+        version = sync_similarity_index(self.neo4j, SimilarityIndexStore.from_settings(settings), rebuild=rebuild)
+        print(f"✅ Similarity index {version or 'already up to date'}")
+    
+    def update_text_vectors(self, rebuild=False):
+        """Vectorise the imported movies' plot, title and cast (or rebuild all)"""
+        print("\n📝 Updating plot text vectors...")
+        settings = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+        version = sync_text_vectors(self.neo4j, TextVectorStore.from_settings(settings), rebuild=rebuild)
+        print(f"✅ Text vectors {version or 'already up to date'}")
+    
     def create_sample_users_and_ratings(self):
         """Create sample users with ratings for testing recommendations"""
         print("\n👥 Creating sample users and ratings...")
@@ -324,47 +389,56 @@ class DatabaseSetup:
             }
         ]
         
+        import random
+        reviews = [
+            "Great movie!", "Loved it!", "Amazing cinematography",
+            "Excellent story", "Must watch", "Brilliant acting",
+            "Very engaging", "Masterpiece"
+        ]
+        
+        user_rows = []
+        rating_rows = []
         for user_data in users_data:
-            # Create user
             user_info = user_data['user'].copy()
             user_info['password_hash'] = generate_password_hash(user_info.pop('password'))
+            user_rows.append(user_info)
             
-            self.neo4j.execute_write_query(
-                """
-                CREATE (u:User {
-                    id: $id, username: $username, email: $email,
-                    password_hash: $password_hash, created_at: datetime()
-                })
-                """,
-                user_info
-            )
-            
-            # Create ratings (random ratings between 3.5 and 5.0)
-            import random
+            # Random ratings between 3.5 and 5.0
             for movie_id in user_data['movie_ratings']:
-                rating = round(random.uniform(3.5, 5.0), 1)
-                reviews = [
-                    "Great movie!", "Loved it!", "Amazing cinematography",
-                    "Excellent story", "Must watch", "Brilliant acting",
-                    "Very engaging", "Masterpiece"
-                ]
-                
-                self.neo4j.execute_write_query(
-                    """
-                    MATCH (u:User {id: $user_id}), (m:Movie {id: $movie_id})
-                    CREATE (u)-[:RATED {
-                        rating: $rating,
-                        review: $review,
-                        timestamp: datetime()
-                    }]->(m)
-                    """,
-                    {
-                        'user_id': user_data['user']['id'],
-                        'movie_id': movie_id,
-                        'rating': rating,
-                        'review': random.choice(reviews)
-                    }
-                )
+                rating_rows.append({
+                    'user_id': user_data['user']['id'],
+                    'movie_id': movie_id,
+                    'rating': round(random.uniform(3.5, 5.0), 1),
+                    'review': random.choice(reviews)
+                })
+        
+        # Create users
+        self.neo4j.execute_write_batch(
+            """
+            UNWIND $rows AS row
+            CREATE (u:User {
+                id: row.id, username: row.username, email: row.email,
+                password_hash: row.password_hash, created_at: datetime()
+            })
+            """,
+            user_rows
+        )
+        
+        # Create ratings
+        self.neo4j.execute_write_batch(
+            """
+            UNWIND $rows AS row
+            MATCH (u:User {id: row.user_id}), (m:Movie {id: row.movie_id})
+            CREATE (u)-[:RATED {
+                rating: row.rating,
+                review: row.review,
+                timestamp: datetime()
+            }]->(m)
+            """,
+            rating_rows
+        )
+        
+        self.recompute_movie_stats()
         
         print(f"✅ Created {len(users_data)} demo users with ratings!")
         print("\n🔐 Demo user credentials:")
@@ -451,6 +525,8 @@ class DatabaseSetup:
             self.create_directors_from_csv(df)
             self.create_actors_from_csv(df)
             self.create_movies_from_csv(df)
+            self.update_similarity_index(rebuild=clear_existing)
+            self.update_text_vectors(rebuild=clear_existing)
             
             # Create sample users for testing
             self.create_sample_users_and_ratings()
@@ -0,0 +1,65 @@
+"""
+Recommendation Precompute Job
+Computes hybrid top-N recommendations for every user who has rated a movie,
+in chunks across a process pool, and saves them as a new version under
+PRECOMPUTE_DIR, where /api/recommendations/for-me serves them from.
+
+Usage (from backend/):
+    python precompute_recommendations.py
+    python precompute_recommendations.py --workers 8 --chunk-size 500
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import config
+from services.neo4j_service import Neo4jService
+from services.rating_matrix import RatingMatrix
+from services.precomputed_recommendations import (
+    PrecomputedRecommendationStore, RATED_USERS_QUERY, compute_in_pool
+)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, help='Worker processes (default: PRECOMPUTE_WORKERS or CPU count)')
+    parser.add_argument('--chunk-size', type=int, help='Users per batch query')
+    parser.add_argument('--top-n', type=int, help='Recommendations stored per user')
+    args = parser.parse_args()
+
+    config_class = config[os.getenv('FLASK_ENV', 'development')]
+    settings = {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+    top_n = args.top_n or settings['PRECOMPUTE_TOP_N']
+
+    neo4j = Neo4jService(settings)
+    try:
+        user_ids = [row['id'] for row in neo4j.stream_query(RATED_USERS_QUERY, timeout=0, name='rated_users')]
+        print(f"👥 Precomputing recommendations for {len(user_ids)} users...")
+
+        rating_matrix = None
+        if settings['RATING_MATRIX_ENABLED']:
+            # Loaded once here and shared with the forked workers
+            rating_matrix = RatingMatrix.from_settings(settings)
+            rating_matrix.load(neo4j)
+    finally:
+        neo4j.close()
+
+    store = PrecomputedRecommendationStore.from_settings(settings)
+    version = store.save(
+        compute_in_pool(
+            settings, user_ids,
+            chunk_size=args.chunk_size or settings['PRECOMPUTE_CHUNK_SIZE'],
+            top_n=top_n,
+            workers=args.workers or settings['PRECOMPUTE_WORKERS'] or None,
+            rating_matrix=rating_matrix
+        ),
+        top_n
+    )
+    print(f"✅ Saved precomputed recommendations {version}")
+
+if __name__ == "__main__":
+    main()
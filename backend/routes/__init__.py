@@ -6,6 +6,7 @@ This package contains all the Flask route blueprints organized by functionality:
 - movies: Movie-related routes (browse, search)
 - ratings: Rating-related routes (rate movies, get user ratings)
 - recommendations: Recommendation routes (get personalized recommendations)
+- admin: Operational routes for admins (slow-query log)
 """
 
 # Note: We import blueprints in the app.py to avoid circular import issues
@@ -13,5 +14,6 @@ from .auth import auth_bp
 from .movies import movies_bp
 from .ratings import ratings_bp
 from .recommendations import recommendations_bp
+from .admin import admin_bp
 
-__all__ = ['auth_bp', 'movies_bp', 'ratings_bp', 'recommendations_bp']
\ No newline at end of file
+__all__ = ['auth_bp', 'movies_bp', 'ratings_bp', 'recommendations_bp', 'admin_bp']
\ No newline at end of file
@@ -0,0 +1,42 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from routes.decorators import admin_required
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_slow_queries():
+    """
+    Recent slow queries with their redacted parameters and, when sampled,
+    the PROFILE/EXPLAIN plan (db hits and rows per operator)
+
+    Query params:
+        limit: Max entries to return (default 50, max 500)
+        query: Only this query name, e.g. `collaborative`
+        user: Only queries run for this user id
+        min_ms: Only queries at least this slow
+    """
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        min_ms = request.args.get('min_ms', type=float)
+        slow_queries = current_app.neo4j_service.slow_queries
+
+        entries = slow_queries.entries(
+            limit=limit,
+            query_name=request.args.get('query'),
+            user=request.args.get('user'),
+            min_ms=min_ms
+        )
+
+        return jsonify({
+            'threshold_ms': slow_queries.threshold_ms,
+            'sample_rate': slow_queries.sample_rate,
+            'plan_mode': slow_queries.plan_mode,
+            'count': len(entries),
+            'slow_queries': entries
+        }), 200
+
+    except Exception as e:
+        return jsonify({'message': 'Failed to get slow queries', 'error': str(e)}), 500
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models.user import User
+from routes.decorators import read_your_writes
 from services.auth_service import AuthService
 
 auth_bp = Blueprint('auth', __name__)
@@ -130,19 +131,12 @@ def refresh_token():
 
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
-def get_user_profile():
+@read_your_writes
+async def get_user_profile():
     """Get detailed user profile with statistics"""
     try:
         user_id = get_jwt_identity()
-        auth_service = AuthService(current_app.neo4j_service)
-        
-        # Get basic user info
-        user = auth_service.get_user_by_id(user_id)
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
-        
-        # Get user statistics
-        stats = auth_service.get_user_stats(user_id)
+        params = {'user_id': user_id}
         
         # Get favorite genres
         genres_query = """
@@ -154,10 +148,6 @@ def get_user_profile():
         LIMIT 5
         """
         
-        favorite_genres = current_app.neo4j_service.execute_query(
-            genres_query, {'user_id': user_id}
-        )
-        
         # Get recently rated movies
         recent_ratings_query = """
         MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie)
@@ -167,13 +157,21 @@ def get_user_profile():
         LIMIT 5
         """
         
-        recent_ratings = current_app.neo4j_service.execute_query(
-            recent_ratings_query, {'user_id': user_id}
+        # The four lookups are independent, so run them concurrently
+        user_data, stats_data, favorite_genres, recent_ratings = await current_app.neo4j_async.gather(
+            (AuthService.USER_BY_ID_QUERY, params),
+            (AuthService.USER_STATS_QUERY, params),
+            (genres_query, params),
+            (recent_ratings_query, params)
         )
         
+        if not user_data:
+            return jsonify({'message': 'User not found'}), 404
+        user = User.from_dict(user_data[0])
+        
         profile_data = {
             'user': user.to_dict(),
-            'stats': stats,
+            'stats': AuthService.format_user_stats(stats_data),
             'favorite_genres': favorite_genres,
             'recent_ratings': recent_ratings
         }
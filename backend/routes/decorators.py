@@ -0,0 +1,173 @@
+from functools import wraps
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from werkzeug.exceptions import HTTPException
+import inspect
+import logging
+import time
+
+def _optional_identity():
+    """The JWT identity if the request carries a valid token, else None"""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+def read_your_writes(view):
+    """
+    Chain Neo4j bookmarks on the current user's id, so e.g. a `/for-me`
+    request sees a rating the same user just wrote via `/rate`. Covers
+    reads through both the sync and the async service. Apply below
+    `@jwt_required()`; on public endpoints anonymous requests just run
+    without a chain. Works on sync and async views.
+    """
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            with current_app.neo4j_service.causal_chain(_optional_identity()):
+                return await view(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with current_app.neo4j_service.causal_chain(_optional_identity()):
+            return view(*args, **kwargs)
+    return wrapper
+
+def admin_required(view):
+    """
+    Restrict a view to the user ids listed in ADMIN_USER_IDS.
+    Apply below `@jwt_required()`.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if get_jwt_identity() not in current_app.config.get('ADMIN_USER_IDS', []):
+            return jsonify({'message': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def snapshot_fallback(view=None, per_user=False):
+    """
+    Serve the endpoint's last good response when the view fails with a 5xx
+    (e.g. while the Neo4j circuit is open) instead of an error. Snapshots
+    are kept per URL, shared by every caller; endpoints whose response
+    depends on the JWT identity use `@snapshot_fallback(per_user=True)`,
+    applied below `@jwt_required()`, to keep one per user. Stale responses
+    carry `Age` and `Warning: 110` headers. Works on sync and async views.
+    """
+    if view is None:
+        return lambda view: snapshot_fallback(view, per_user=per_user)
+
+    def snapshot_key():
+        if not per_user:
+            return f"{request.method} {request.full_path}"
+        return f"{request.method} {request.full_path} user={get_jwt_identity()}"
+
+    def stale_response(error=None):
+        snapshot = current_app.snapshot_store.load(snapshot_key())
+        if snapshot is None:
+            return None
+        age = max(int(time.time() - snapshot['stored_at']), 0)
+        logging.warning(f"⚠️ Serving {age}s old snapshot for {request.full_path}: {error}")
+        response = current_app.response_class(snapshot['body'], status=200, mimetype=snapshot['mimetype'])
+        response.headers['Age'] = str(age)
+        response.headers['Warning'] = '110 - "Response is Stale"'
+        return response
+
+    def finish(rv):
+        response = current_app.make_response(rv)
+        if response.status_code == 200 and not response.is_streamed:
+            current_app.snapshot_store.save(
+                snapshot_key(), response.get_data(as_text=True), response.mimetype
+            )
+        elif response.status_code >= 500:
+            return stale_response(f"status {response.status_code}") or response
+        return response
+
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                rv = await view(*args, **kwargs)
+            except HTTPException:
+                raise
+            except Exception as e:
+                stale = stale_response(e)
+                if stale is None:
+                    raise
+                return stale
+            return finish(rv)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            rv = view(*args, **kwargs)
+        except HTTPException:
+            raise
+        except Exception as e:
+            stale = stale_response(e)
+            if stale is None:
+                raise
+            return stale
+        return finish(rv)
+    return wrapper
+
+def user_cache_tag(user_id):
+    """Tag of every cached recommendation response for `user_id`"""
+    return f"user:{user_id}"
+
+def cached_per_user(view):
+    """
+    Serve repeat requests from `current_app.recommendation_cache`, keyed by
+    user (the `user_id` URL argument, else the JWT identity), endpoint,
+    `type`, `limit`, `genre` (cold-start lists depend on it) and when the
+    user's ratings last changed in any worker, so a rating served by another
+    worker makes this worker's entries unreachable too. Only 200 responses
+    without `Cache-Control: no-store` are stored. Entries are also tagged
+    with `user_cache_tag(user_id)`, so the worker that handles a rating drops
+    them right away. Responses carry `X-Cache: HIT` or `MISS`. Apply below
+    `@snapshot_fallback`. Works on sync and async views.
+    """
+    def lookup(kwargs):
+        cache = current_app.recommendation_cache
+        if not cache.enabled:
+            return None, None
+        user_id = kwargs.get('user_id') or get_jwt_identity()
+        key = (str(user_id), request.endpoint, request.args.get('type', ''), request.args.get('limit', ''),
+               request.args.get('genre', ''), current_app.rating_counter.changed_at(str(user_id)))
+        cached = cache.get(key)
+        if cached is None:
+            return key, None
+        response = current_app.response_class(cached[0]['body'], status=200, mimetype=cached[0]['mimetype'])
+        response.headers['X-Cache'] = 'HIT'
+        return key, response
+
+    def store(key, rv):
+        response = current_app.make_response(rv)
+        if key is not None and response.status_code == 200 and not response.is_streamed \
+                and not response.cache_control.no_store:
+            current_app.recommendation_cache.put(
+                key, [{'body': response.get_data(as_text=True), 'mimetype': response.mimetype}],
+                [user_cache_tag(key[0])]
+            )
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            key, hit = lookup(kwargs)
+            if hit is not None:
+                return hit
+            return store(key, await view(*args, **kwargs))
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key, hit = lookup(kwargs)
+        if hit is not None:
+            return hit
+        return store(key, view(*args, **kwargs))
+    return wrapper
@@ -1,10 +1,40 @@
 from flask import Blueprint, request, jsonify, current_app
 from models.movie import Movie
+from routes.decorators import read_your_writes, snapshot_fallback
+from routes.streaming import stream_records
+import asyncio
 
 # Create blueprint without url_prefix since it's handled in app.py
 movies_bp = Blueprint('movies', __name__)
 
+# Movie details for a batch of ids (see BatchLoader), using normalized field
+# names that match init_db.py schema + cast properties
+MOVIE_DETAILS_BY_IDS_QUERY = """
+UNWIND $ids AS movie_id
+MATCH (m:Movie {id: movie_id})
+OPTIONAL MATCH (m)-[:HAS_GENRE]->(g:Genre)
+OPTIONAL MATCH (m)-[:DIRECTED_BY]->(d:Director)
+OPTIONAL MATCH (m)-[:STARS]->(a:Actor)
+RETURN movie_id as key,
+       m.id as id, 
+       m.title as title, 
+       m.year as year,
+       m.poster_url as poster_url, 
+       coalesce(m.avg_rating, m.imdb_rating, 0) as avg_rating,
+       m.plot as plot, 
+       coalesce(m.rating_count, 0) as rating_count,
+       m.imdb_rating as imdb_rating, 
+       m.meta_score as meta_score,
+       m.runtime_minutes as runtime_minutes, 
+       m.certificate as certificate,
+       collect(DISTINCT g.name) as genres,
+       collect(DISTINCT d.name) as directors,
+       collect(DISTINCT a.name) as actors,
+       m.Star1 as star1, m.Star2 as star2, m.Star3 as star3, m.Star4 as star4
+"""
+
 @movies_bp.route('/', methods=['GET'])
+@snapshot_fallback
 def get_movies():
     """Get movies with pagination and optional genre filtering"""
     try:
@@ -116,6 +146,7 @@ def get_movies():
         return jsonify({'message': 'Error retrieving movies'}), 500
 
 @movies_bp.route('/search', methods=['GET'])
+@snapshot_fallback
 def search_movies():
     """Search movies by title"""
     try:
@@ -167,37 +198,29 @@ def search_movies():
         return jsonify({'message': 'Error searching movies'}), 500
 
 @movies_bp.route('/<movie_id>', methods=['GET'])
-def get_movie_details(movie_id):
+@snapshot_fallback
+@read_your_writes
+async def get_movie_details(movie_id):
     try:
         print(f"🎬 Fetching details for movie ID: {movie_id} (type: {type(movie_id)})")
         
-        # Use normalized field names that match init_db.py schema + cast properties
-        movie_query = """
-        MATCH (m:Movie {id: $movie_id})
-        OPTIONAL MATCH (m)-[:HAS_GENRE]->(g:Genre)
-        OPTIONAL MATCH (m)-[:DIRECTED_BY]->(d:Director)
-        OPTIONAL MATCH (m)-[:STARS]->(a:Actor)
-        RETURN m.id as id, 
-               m.title as title, 
-               m.year as year,
-               m.poster_url as poster_url, 
-               coalesce(m.avg_rating, m.imdb_rating, 0) as avg_rating,
-               m.plot as plot, 
-               coalesce(m.rating_count, 0) as rating_count,
-               m.imdb_rating as imdb_rating, 
-               m.meta_score as meta_score,
-               m.runtime_minutes as runtime_minutes, 
-               m.certificate as certificate,
-               collect(DISTINCT g.name) as genres,
-               collect(DISTINCT d.name) as directors,
-               collect(DISTINCT a.name) as actors,
-               m.Star1 as star1, m.Star2 as star2, m.Star3 as star3, m.Star4 as star4
+        # FIXED: Get recent reviews with proper datetime handling
+        reviews_query = """
+        MATCH (u:User)-[r:RATED]->(m:Movie {id: $movie_id})
+        RETURN u.username as username, 
+               r.rating as rating, 
+               coalesce(r.review, '') as review, 
+               coalesce(toString(r.timestamp), toString(datetime())) as timestamp
+        ORDER BY coalesce(r.timestamp, datetime()) DESC
+        LIMIT 10
         """
         
-        # Use movie_id directly as string
-        movie_data = current_app.neo4j_service.execute_query(
-            movie_query, 
-            {'movie_id': str(movie_id)}  # Ensure it's a string
+        # Movie and reviews are independent lookups, so fetch them concurrently.
+        # The movie lookup is batched with other requests' lookups in the same window
+        movie_loader = current_app.neo4j_service.batch_loader('movie_details', MOVIE_DETAILS_BY_IDS_QUERY)
+        movie_data, reviews_data = await asyncio.gather(
+            movie_loader.load_async(str(movie_id)),  # Ensure it's a string
+            current_app.neo4j_async.execute_read(reviews_query, {'movie_id': str(movie_id)})
         )
         
         if not movie_data:
@@ -216,22 +239,6 @@ def get_movie_details(movie_id):
         # Handle genres from relationships (should work) or fallback to CSV format
         movie.genres = [g for g in movie_info.get('genres', []) if g]
         
-        # FIXED: Get recent reviews with proper datetime handling
-        reviews_query = """
-        MATCH (u:User)-[r:RATED]->(m:Movie {id: $movie_id})
-        RETURN u.username as username, 
-               r.rating as rating, 
-               coalesce(r.review, '') as review, 
-               coalesce(toString(r.timestamp), toString(datetime())) as timestamp
-        ORDER BY coalesce(r.timestamp, datetime()) DESC
-        LIMIT 10
-        """
-        
-        reviews_data = current_app.neo4j_service.execute_query(
-            reviews_query, 
-            {'movie_id': movie_id}
-        )
-        
         result = movie.to_dict()
         result['reviews'] = reviews_data or []
         result['directors'] = [d for d in movie_info.get('directors', []) if d]
@@ -259,12 +266,13 @@ def get_movie_details(movie_id):
         return jsonify({'message': 'Error retrieving movie details'}), 500
 
 @movies_bp.route('/genres', methods=['GET'])
+@snapshot_fallback
 def get_genres():
     """Get all available movie genres"""
     try:
         # Use Genre nodes created by init_db.py
         query = "MATCH (g:Genre) RETURN g.name as name ORDER BY g.name"
-        genres_data = current_app.neo4j_service.execute_query(query)
+        genres_data = current_app.neo4j_service.execute_query(query, name='genres', cache=True)
         
         genres = [{'name': genre['name']} for genre in genres_data]
         
@@ -276,6 +284,7 @@ def get_genres():
         return jsonify({'message': 'Error retrieving genres'}), 500
 
 @movies_bp.route('/popular', methods=['GET'])
+@snapshot_fallback
 def get_popular_movies():
     """Get popular movies"""
     try:
@@ -318,7 +327,7 @@ def get_popular_movies():
                 """
                 params = {'limit': limit}
             
-            movies_data = current_app.neo4j_service.execute_query(query, params)
+            movies_data = current_app.neo4j_service.execute_query(query, params, name='popular', cache=True)
             movies = [Movie.from_dict(movie_data).to_dict() for movie_data in movies_data]
         
         print(f"📈 Retrieved {len(movies)} popular movies")
@@ -333,6 +342,7 @@ def get_popular_movies():
         return jsonify({'message': 'Error retrieving popular movies'}), 500
 
 @movies_bp.route('/featured', methods=['GET'])
+@snapshot_fallback
 def get_featured_movies():
     """Get featured/trending movies for homepage"""
     try:
@@ -353,7 +363,9 @@ def get_featured_movies():
         LIMIT $limit
         """
         
-        movies_data = current_app.neo4j_service.execute_query(query, {'limit': limit})
+        movies_data = current_app.neo4j_service.execute_query(
+            query, {'limit': limit}, name='featured', cache=True
+        )
         movies = [Movie.from_dict(movie_data).to_dict() for movie_data in movies_data]
         
         print(f"🌟 Retrieved {len(movies)} featured movies")
@@ -364,6 +376,7 @@ def get_featured_movies():
         return jsonify({'message': 'Error retrieving featured movies'}), 500
 
 @movies_bp.route('/recent', methods=['GET'])
+@snapshot_fallback
 def get_recent_movies():
     """Get recently added movies"""
     try:
@@ -387,7 +400,7 @@ def get_recent_movies():
         """
         
         movies_data = current_app.neo4j_service.execute_query(
-            query, {'min_year': min_year, 'limit': limit}
+            query, {'min_year': min_year, 'limit': limit}, name='recent', cache=True
         )
         movies = [Movie.from_dict(movie_data).to_dict() for movie_data in movies_data]
         
@@ -399,6 +412,7 @@ def get_recent_movies():
         return jsonify({'message': 'Error retrieving recent movies'}), 500
 
 @movies_bp.route('/top-rated', methods=['GET'])
+@snapshot_fallback
 def get_top_rated_movies():
     """Get top-rated movies"""
     try:
@@ -419,7 +433,9 @@ def get_top_rated_movies():
         LIMIT $limit
         """
         
-        movies_data = current_app.neo4j_service.execute_query(query, {'limit': limit})
+        movies_data = current_app.neo4j_service.execute_query(
+            query, {'limit': limit}, name='top_rated', cache=True
+        )
         movies = [Movie.from_dict(movie_data).to_dict() for movie_data in movies_data]
         
         print(f"🏆 Retrieved {len(movies)} top-rated movies")
@@ -429,6 +445,35 @@ def get_top_rated_movies():
         print(f"❌ Error getting top-rated movies: {e}")
         return jsonify({'message': 'Error retrieving top-rated movies'}), 500
 
+@movies_bp.route('/export', methods=['GET'])
+def export_movies():
+    """Stream the full movie catalog (NDJSON or JSON array)"""
+    try:
+        query = """
+        MATCH (m:Movie)
+        OPTIONAL MATCH (m)-[:HAS_GENRE]->(g:Genre)
+        WITH m, collect(g.name) as genres
+        RETURN m.id as id, 
+               m.title as title, 
+               m.year as year,
+               m.poster_url as poster_url, 
+               coalesce(m.avg_rating, m.imdb_rating, 0) as avg_rating,
+               coalesce(m.rating_count, 0) as rating_count,
+               m.imdb_rating as imdb_rating,
+               m.plot as plot,
+               genres
+        ORDER BY m.id
+        """
+        
+        print("📤 Streaming movie catalog")
+        
+        records = current_app.neo4j_service.stream_query(query, timeout=0)
+        return stream_records(records)
+        
+    except Exception as e:
+        print(f"❌ Error exporting movies: {e}")
+        return jsonify({'message': 'Error exporting movies'}), 500
+
 # Debug endpoint to check database status
 @movies_bp.route('/debug', methods=['GET'])
 def debug_movies():
@@ -1,12 +1,83 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.rating import Rating
+from routes.decorators import read_your_writes, user_cache_tag
+from routes.streaming import stream_records
 from datetime import datetime
+import csv
+import io
+import time
+import uuid
 
 ratings_bp = Blueprint('ratings', __name__)
 
+# The movie's rating_sum / rating_count totals are updated behind the
+# write by current_app.movie_stats (services/movie_stats.py) from the
+# returned old rating. The _LOCK_ property serialises a user's own writes
+# so a rating can't be replaced twice from the same old value.
+# Each write carries a write_id kept on the edge with the rating it replaced:
+# a retry of a write that already committed (its reply was lost) returns that
+# same old rating rather than the one it wrote, so the totals see it once.
+# u.ratings_changed_at (epoch seconds) tells every worker the user's
+# ratings moved, see UserRatingCounter.changed_at.
+RATE_MOVIE_QUERY = """
+MATCH (m:Movie {id: $movie_id}), (u:User {id: $user_id})
+SET u._LOCK_ = true
+MERGE (u)-[r:RATED]->(m)
+WITH u, m, r, CASE WHEN r.write_id = $write_id THEN r.previous_rating ELSE r.rating END as old_rating
+SET r.rating = $rating,
+    r.review = $review,
+    r.timestamp = datetime(),
+    r.write_id = $write_id,
+    r.previous_rating = old_rating,
+    u.ratings_changed_at = $changed_at
+REMOVE u._LOCK_
+RETURN m.title as title, old_rating
+"""
+
+# Bulk import: one chunk of rows per transaction, each row carrying the user id
+BULK_RATE_QUERY = """
+UNWIND $rows AS row
+MATCH (m:Movie {id: row.movie_id}), (u:User {id: row.user_id})
+SET u._LOCK_ = true
+MERGE (u)-[r:RATED]->(m)
+WITH u, m, r, row, CASE WHEN r.write_id = row.write_id THEN r.previous_rating ELSE r.rating END as old_rating
+SET r.rating = row.rating,
+    r.review = row.review,
+    r.timestamp = datetime(),
+    r.write_id = row.write_id,
+    r.previous_rating = old_rating,
+    u.ratings_changed_at = row.changed_at
+REMOVE u._LOCK_
+RETURN m.id as movie_id, old_rating
+"""
+
+# Both use an index: the movie id constraint and movie_title_index
+MOVIES_BY_ID_QUERY = """
+UNWIND $ids AS id
+MATCH (m:Movie {id: id})
+RETURN m.id as movie_id
+"""
+
+MOVIES_BY_TITLE_QUERY = """
+UNWIND $titles AS title
+MATCH (m:Movie {title: title})
+RETURN title, m.id as movie_id, m.year as year
+"""
+
+DELETE_RATING_QUERY = """
+MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie {id: $movie_id})
+SET u._LOCK_ = true
+WITH u, r, r.rating as old_rating
+DELETE r
+SET u.ratings_changed_at = $changed_at
+REMOVE u._LOCK_
+RETURN old_rating
+"""
+
 @ratings_bp.route('/rate', methods=['POST'])
 @jwt_required()
+@read_your_writes
 def rate_movie():
     """Rate a movie"""
     try:
@@ -57,95 +128,43 @@ def rate_movie():
             print(f"❌ Rating validation errors: {validation_errors}")
             return jsonify({'message': 'Validation errors', 'errors': validation_errors}), 400
         
-        # Check if movie exists - with better error handling
+        # Create or update the rating in one transaction; the movie's totals follow behind
         try:
-            movie_check = current_app.neo4j_service.execute_query(
-                "MATCH (m:Movie {id: $movie_id}) RETURN m.id as id, m.title as title",
-                {'movie_id': str(movie_id)}  # Ensure movie_id is string
+            result = current_app.neo4j_service.execute_write_query(
+                RATE_MOVIE_QUERY,
+                {
+                    'user_id': str(user_id),
+                    'movie_id': str(movie_id),
+                    'rating': float(rating_value),
+                    'review': str(review),
+                    'changed_at': time.time(),
+                    'write_id': uuid.uuid4().hex
+                },
+                name='rate_movie',
+                touches=('RATED',)
             )
-            print(f"🎬 Movie check result: {movie_check}")
         except Exception as e:
-            print(f"❌ Error checking movie existence: {e}")
-            return jsonify({'message': 'Database error while checking movie'}), 500
+            print(f"❌ Error saving rating: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'message': 'Database error while saving rating'}), 500
         
-        if not movie_check:
+        if not result:
             print(f"❌ Movie not found: {movie_id}")
             return jsonify({'message': f'Movie with ID {movie_id} not found'}), 404
         
-        # Check if user already rated this movie
-        try:
-            existing_rating = current_app.neo4j_service.execute_query(
-                "MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie {id: $movie_id}) RETURN r",
-                {'user_id': str(user_id), 'movie_id': str(movie_id)}
-            )
-            print(f"🔍 Existing rating check: {'Found' if existing_rating else 'Not found'}")
-        except Exception as e:
-            print(f"❌ Error checking existing rating: {e}")
-            return jsonify({'message': 'Database error while checking existing rating'}), 500
-        
-        if existing_rating:
-            # Update existing rating
-            try:
-                current_app.neo4j_service.execute_write_query(
-                    """
-                    MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie {id: $movie_id})
-                    SET r.rating = $rating,
-                        r.review = $review,
-                        r.timestamp = datetime()
-                    """,
-                    {
-                        'user_id': str(user_id),
-                        'movie_id': str(movie_id),
-                        'rating': float(rating_value),
-                        'review': str(review)
-                    }
-                )
-                print(f"✅ Updated rating for movie {movie_id} by user {user_id}")
-                action = "updated"
-            except Exception as e:
-                print(f"❌ Error updating rating: {e}")
-                import traceback
-                traceback.print_exc()
-                return jsonify({'message': 'Database error while updating rating'}), 500
-        else:
-            # Create new rating
-            try:
-                current_app.neo4j_service.execute_write_query(
-                    """
-                    MATCH (u:User {id: $user_id}), (m:Movie {id: $movie_id})
-                    CREATE (u)-[:RATED {
-                        rating: $rating,
-                        review: $review,
-                        timestamp: datetime()
-                    }]->(m)
-                    """,
-                    {
-                        'user_id': str(user_id),
-                        'movie_id': str(movie_id),
-                        'rating': float(rating_value),
-                        'review': str(review)
-                    }
-                )
-                print(f"✅ Created new rating for movie {movie_id} by user {user_id}")
-                action = "created"
-            except Exception as e:
-                print(f"❌ Error creating rating: {e}")
-                import traceback
-                traceback.print_exc()
-                return jsonify({'message': 'Database error while creating rating'}), 500
-        
-        # Update movie's average rating and count
-        try:
-            update_movie_stats(current_app.neo4j_service, str(movie_id))
-            print(f"✅ Updated movie stats for {movie_id}")
-        except Exception as e:
-            print(f"⚠️ Warning: Error updating movie stats: {e}")
-            # Don't fail the request if stats update fails
+        old_rating = result[0]['old_rating']
+        action = "created" if old_rating is None else "updated"
+        print(f"✅ Rating {action} for movie {movie_id} by user {user_id}")
+        
+        current_app.movie_stats.record(str(movie_id), float(rating_value), old_rating)
+        
+        on_rating_changed(str(user_id), str(movie_id), float(rating_value))
         
         return jsonify({
             'message': f'Rating {action} successfully',
             'rating': rating.to_dict(),
-            'movie_title': movie_check[0]['title'] if movie_check else None,
+            'movie_title': result[0]['title'],
             'action': action
         }), 201 if action == "created" else 200
         
@@ -158,8 +177,106 @@ def rate_movie():
             'error': str(e) if current_app.debug else 'Internal server error'
         }), 500
 
+@ratings_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@read_your_writes
+def bulk_rate_movies():
+    """
+    Import many ratings at once, e.g. a history from another service.
+    
+    Takes a JSON list (or {"ratings": [...]}) or a CSV upload (multipart
+    field "file", or a text/csv body) of rows with movie_id or title (plus
+    an optional year to tell remakes apart), rating and optional review;
+    the columns of /export are accepted too. Every row is checked before
+    anything is written: with problems the response is a 400 listing them
+    all, unless ?skip_invalid=true imports the good rows and reports the rest.
+    """
+    try:
+        started = time.perf_counter()
+        user_id = str(get_jwt_identity())
+        
+        try:
+            rows = read_bulk_rows()
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        max_rows = current_app.config['BULK_RATINGS_MAX_ROWS']
+        if not rows:
+            return jsonify({'message': 'No ratings provided'}), 400
+        if len(rows) > max_rows:
+            return jsonify({'message': f'At most {max_rows} ratings can be imported at once'}), 400
+        
+        ratings, errors = validate_bulk_rows(rows)
+        ratings, resolve_errors = resolve_bulk_movies(current_app.neo4j_service, ratings)
+        errors = sorted(errors + resolve_errors, key=lambda error: error['row'])
+        
+        skip_invalid = request.args.get('skip_invalid', 'false').lower() == 'true'
+        if errors and not skip_invalid:
+            print(f"❌ Bulk rating import by user {user_id} rejected: {len(errors)} invalid rows")
+            return jsonify({'message': 'Validation errors', 'errors': errors}), 400
+        
+        # A movie listed twice keeps its last rating
+        latest = {}
+        for rating in ratings:
+            latest[rating['movie_id']] = rating
+        
+        # Each chunk commits on its own, so its totals and hooks follow it at
+        # once and stay right when a later chunk fails. Queued movie totals
+        # coalesce per movie, so each movie's stats are still written once.
+        committed = []
+        
+        def record_batch(results):
+            for result in results:
+                current_app.movie_stats.record(result['movie_id'], latest[result['movie_id']]['rating'],
+                                               result['old_rating'])
+            on_ratings_changed(user_id, [(result['movie_id'], latest[result['movie_id']]['rating'])
+                                         for result in results])
+            committed.extend(results)
+        
+        changed_at = time.time()
+        write_id = uuid.uuid4().hex
+        try:
+            current_app.neo4j_service.execute_write_batch(
+                BULK_RATE_QUERY,
+                [
+                    {'user_id': user_id, 'movie_id': rating['movie_id'],
+                     'rating': rating['rating'], 'review': rating['review'], 'changed_at': changed_at,
+                     'write_id': write_id}
+                    for rating in latest.values()
+                ],
+                name='bulk_rate',
+                touches=('RATED',),
+                on_batch=record_batch
+            )
+        except Exception as e:
+            print(f"❌ Bulk rating import by user {user_id} failed after {len(committed)} ratings: {e}")
+            return jsonify({
+                'message': f"Error importing ratings: {len(committed)} of {len(latest)} were saved",
+                'imported': len(committed)
+            }), 500
+        
+        created = sum(result['old_rating'] is None for result in committed)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✅ Imported {len(committed)} ratings for user {user_id} in {elapsed_ms} ms")
+        
+        return jsonify({
+            'message': f"Imported {len(committed)} ratings",
+            'imported': len(committed),
+            'created': created,
+            'updated': len(committed) - created,
+            'skipped': errors,
+            'elapsed_ms': elapsed_ms
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error importing ratings: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'message': 'Error importing ratings'}), 500
+
 @ratings_bp.route('/my-ratings', methods=['GET'])
 @jwt_required()
+@read_your_writes
 def get_my_ratings():
     """Get current user's ratings"""
     try:
@@ -266,6 +383,34 @@ def get_my_ratings():
             'total': 0
         }), 500
 
+@ratings_bp.route('/export', methods=['GET'])
+@jwt_required()
+@read_your_writes
+def export_my_ratings():
+    """Stream the current user's full rating history (NDJSON or JSON array)"""
+    try:
+        user_id = get_jwt_identity()
+        
+        query = """
+        MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie)
+        RETURN m.id as movie_id, 
+               m.title as movie_title, 
+               m.year as movie_year,
+               r.rating as rating, 
+               coalesce(r.review, '') as review, 
+               r.timestamp as timestamp
+        ORDER BY r.timestamp DESC
+        """
+        
+        print(f"📤 Streaming rating history for user {user_id}")
+        
+        records = current_app.neo4j_service.stream_query(query, {'user_id': user_id})
+        return stream_records(records)
+        
+    except Exception as e:
+        print(f"❌ Error exporting ratings: {e}")
+        return jsonify({'message': 'Error exporting ratings'}), 500
+
 @ratings_bp.route('/movie/<movie_id>', methods=['GET'])
 def get_movie_ratings(movie_id):
     """Get all ratings for a specific movie"""
@@ -326,6 +471,7 @@ def get_movie_ratings(movie_id):
 
 @ratings_bp.route('/check/<movie_id>', methods=['GET'])
 @jwt_required()
+@read_your_writes
 def check_user_rating(movie_id):
     """Check if current user has rated a specific movie"""
     try:
@@ -376,28 +522,25 @@ def check_user_rating(movie_id):
 
 @ratings_bp.route('/delete/<movie_id>', methods=['DELETE'])
 @jwt_required()
+@read_your_writes
 def delete_rating(movie_id):
     """Delete a user's rating for a movie"""
     try:
         user_id = get_jwt_identity()
         
-        # Check if rating exists
-        existing_rating = current_app.neo4j_service.execute_query(
-            "MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie {id: $movie_id}) RETURN r",
-            {'user_id': user_id, 'movie_id': movie_id}
+        # Delete the rating; the movie's totals follow behind
+        deleted = current_app.neo4j_service.execute_write_query(
+            DELETE_RATING_QUERY,
+            {'user_id': user_id, 'movie_id': movie_id, 'changed_at': time.time()},
+            name='delete_rating',
+            touches=('RATED',)
         )
         
-        if not existing_rating:
+        if not deleted:
             return jsonify({'message': 'Rating not found'}), 404
         
-        # Delete the rating
-        current_app.neo4j_service.execute_write_query(
-            "MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie {id: $movie_id}) DELETE r",
-            {'user_id': user_id, 'movie_id': movie_id}
-        )
-        
-        # Update movie statistics
-        update_movie_stats(current_app.neo4j_service, movie_id)
+        current_app.movie_stats.record(movie_id, None, deleted[0]['old_rating'])
+        on_rating_changed(user_id, movie_id, None)
         
         print(f"✅ Deleted rating for movie {movie_id} by user {user_id}")
         
@@ -452,21 +595,141 @@ def get_user_rating_stats():
         traceback.print_exc()
         return jsonify({'message': 'Error retrieving rating statistics'}), 500
 
-def update_movie_stats(neo4j_service, movie_id):
-    """Update a movie's average rating and rating count"""
+def on_rating_changed(user_id, movie_id, rating):
+    """
+    Keep in-process recommendation state in step with a rating that was just
+    written (rating=None when it was deleted). Failures are logged, never raised.
+    """
+    on_ratings_changed(user_id, [(movie_id, rating)])
+
+def on_ratings_changed(user_id, changes):
+    """on_rating_changed for several (movie_id, rating) changes by one user"""
     try:
-        neo4j_service.execute_write_query(
-            """
-            MATCH (m:Movie {id: $movie_id})
-            OPTIONAL MATCH (u:User)-[r:RATED]->(m)
-            WITH m, AVG(r.rating) as avg_rating, COUNT(r) as rating_count
-            SET m.avg_rating = COALESCE(avg_rating, 0.0),
-                m.rating_count = rating_count
-            """,
-            {'movie_id': movie_id}
-        )
-        print(f"✅ Updated movie stats for {movie_id}")
+        if current_app.rating_matrix is not None:
+            for movie_id, rating in changes:
+                current_app.rating_matrix.record(user_id, movie_id, rating)
     except Exception as e:
-        print(f"❌ Error updating movie stats: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+        print(f"⚠️ Warning: Error updating rating matrix: {e}")
+    
+    try:
+        if len(changes) == 1:
+            current_app.rating_counter.record(user_id, changes[0][1])
+        else:
+            current_app.rating_counter.invalidate(user_id)
+    except Exception as e:
+        print(f"⚠️ Warning: Error updating rating counter: {e}")
+    
+    try:
+        current_app.recommendation_cache.invalidate([user_cache_tag(user_id)])
+    except Exception as e:
+        print(f"⚠️ Warning: Error invalidating cached recommendations: {e}")
+    
+    try:
+        current_app.precomputed.invalidate(user_id)
+    except Exception as e:
+        print(f"⚠️ Warning: Error invalidating precomputed recommendations: {e}")
+    
+    try:
+        current_app.recommendation_engine.fold_in_user(user_id)
+    except Exception as e:
+        print(f"⚠️ Warning: Error folding in user factors: {e}")
+
+def read_bulk_rows():
+    """Rows of a bulk import request as dicts, from JSON or CSV"""
+    upload = request.files.get('file')
+    if upload is not None:
+        text = upload.read().decode('utf-8-sig')
+    elif request.mimetype in ('text/csv', 'text/plain'):
+        text = request.get_data(as_text=True).lstrip('\ufeff')
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('ratings')
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise ValueError('Expected a list of ratings or a CSV file')
+        return data
+    
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames:
+        raise ValueError('CSV file is empty')
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    return list(reader)
+
+def validate_bulk_rows(rows):
+    """
+    Check every row of a bulk import in one pass.
+    
+    Returns:
+        (ratings, errors): ratings as dicts with row, movie_id or title,
+        year, rating and review; errors as {'row', 'message'} (rows from 1)
+    """
+    ratings, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        movie_id = str(row.get('movie_id') or '').strip()
+        title = str(row.get('title') or row.get('movie_title') or '').strip()
+        review = str(row.get('review') or '')
+        year = row.get('year') or row.get('movie_year')
+        
+        try:
+            rating = float(row.get('rating'))
+        except (TypeError, ValueError):
+            rating = None
+        try:
+            year = int(year) if year not in (None, '') else None
+        except (TypeError, ValueError):
+            errors.append({'row': number, 'message': f'Invalid year: {year}'})
+            continue
+        
+        if not movie_id and not title:
+            errors.append({'row': number, 'message': 'Movie ID or title is required'})
+            continue
+        if rating is None or not (1.0 <= rating <= 5.0):
+            errors.append({'row': number, 'message': 'Rating must be between 1.0 and 5.0'})
+            continue
+        if len(review) > 1000:
+            errors.append({'row': number, 'message': 'Review must be 1000 characters or less'})
+            continue
+        ratings.append({'row': number, 'movie_id': movie_id, 'title': title, 'year': year,
+                        'rating': rating, 'review': review})
+    return ratings, errors
+
+def resolve_bulk_movies(neo4j_service, ratings):
+    """
+    Fill in movie_id for ratings given by title and check the given ids
+    exist, with one indexed lookup for all ids and one for all titles.
+    
+    Returns:
+        (resolved ratings, errors for the rows that matched no single movie)
+    """
+    ids = sorted({rating['movie_id'] for rating in ratings if rating['movie_id']})
+    titles = sorted({rating['title'] for rating in ratings if not rating['movie_id']})
+    
+    known = set()
+    if ids:
+        known = {row['movie_id'] for row in neo4j_service.execute_query(
+            MOVIES_BY_ID_QUERY, {'ids': ids}, name='bulk_movies_by_id')}
+    by_title = {}
+    if titles:
+        for row in neo4j_service.execute_query(MOVIES_BY_TITLE_QUERY, {'titles': titles}, name='bulk_movies_by_title'):
+            by_title.setdefault(row['title'], []).append(row)
+    
+    resolved, errors = [], []
+    for rating in ratings:
+        if rating['movie_id']:
+            if rating['movie_id'] in known:
+                resolved.append(rating)
+            else:
+                errors.append({'row': rating['row'], 'message': f"Movie with ID {rating['movie_id']} not found"})
+            continue
+        
+        matches = by_title.get(rating['title'], [])
+        if rating['year'] is not None:
+            matches = [match for match in matches if match['year'] == rating['year']]
+        if len(matches) == 1:
+            resolved.append({**rating, 'movie_id': matches[0]['movie_id']})
+        elif not matches:
+            errors.append({'row': rating['row'], 'message': f"No movie titled {rating['title']!r}"
+                           + (f" from {rating['year']}" if rating['year'] is not None else '')})
+        else:
+            errors.append({'row': rating['row'], 'message': f"Several movies are titled {rating['title']!r}; add a year"})
+    return resolved, errors
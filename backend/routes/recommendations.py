@@ -1,8 +1,15 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from routes.decorators import read_your_writes, snapshot_fallback, cached_per_user
 
 recommendations_bp = Blueprint('recommendations', __name__)
 
+# Hybrid results missing an arm that hit its deadline shouldn't be reused
+PARTIAL_HEADERS = {'Cache-Control': 'no-store'}
+
+# Onboarding answers are the same for everyone until the popularity ranking refreshes
+ONBOARDING_HEADERS = {'Cache-Control': 'public, max-age=60'}
+
 # Add this route to your recommendations_bp.py to check user data
 
 @recommendations_bp.route('/debug/user-stats/<user_id>', methods=['GET'])
@@ -67,6 +74,8 @@ def debug_user_stats(user_id):
         }), 500
     
 @recommendations_bp.route('/collaborative/<user_id>', methods=['GET'])
+@snapshot_fallback
+@cached_per_user
 def get_collaborative_recommendations(user_id):
     """Get collaborative filtering recommendations"""
     try:
@@ -92,6 +101,8 @@ def get_collaborative_recommendations(user_id):
         return jsonify({'message': 'Error generating collaborative recommendations'}), 500
 
 @recommendations_bp.route('/content/<user_id>', methods=['GET'])
+@snapshot_fallback
+@cached_per_user
 def get_content_recommendations(user_id):
     """Get content-based recommendations"""
     try:
@@ -117,7 +128,9 @@ def get_content_recommendations(user_id):
         return jsonify({'message': 'Error generating content-based recommendations'}), 500
 
 @recommendations_bp.route('/hybrid/<user_id>', methods=['GET'])
-def get_hybrid_recommendations(user_id):
+@snapshot_fallback
+@cached_per_user
+async def get_hybrid_recommendations(user_id):
     """Get hybrid recommendations (collaborative + content-based)"""
     try:
         limit = int(request.args.get('limit', 15))
@@ -126,7 +139,9 @@ def get_hybrid_recommendations(user_id):
         if limit < 1 or limit > 50:
             limit = 15
         
-        recommendations = current_app.recommendation_engine.get_hybrid_recommendations(user_id, limit)
+        recommendations, hybrid_info = await current_app.recommendation_engine.get_hybrid_recommendations_budgeted(
+            user_id, limit
+        )
         
         print(f"🚀 Generated {len(recommendations)} hybrid recommendations for user {user_id}")
         
@@ -134,8 +149,10 @@ def get_hybrid_recommendations(user_id):
             'recommendations': recommendations,
             'user_id': user_id,
             'type': 'hybrid',
-            'count': len(recommendations)
-        }), 200
+            'count': len(recommendations),
+            'arms': hybrid_info['arms'],
+            'partial': hybrid_info['partial']
+        }), 200, PARTIAL_HEADERS if hybrid_info['partial'] else {}
         
     except Exception as e:
         print(f"❌ Error getting hybrid recommendations: {e}")
@@ -143,6 +160,9 @@ def get_hybrid_recommendations(user_id):
 
 @recommendations_bp.route('/for-me', methods=['GET'])
 @jwt_required()
+@snapshot_fallback(per_user=True)
+@cached_per_user
+@read_your_writes
 def get_my_recommendations():
     """Get personalized recommendations for the current logged-in user"""
     try:
@@ -160,59 +180,79 @@ def get_my_recommendations():
         if limit < 1 or limit > 50:
             limit = 15
         
-        if rec_type not in ['hybrid', 'collaborative', 'content']:
+        if rec_type not in ['hybrid', 'collaborative', 'content', 'mf', 'pipeline']:
             rec_type = 'hybrid'
         
-        # TEST: First check if user has any ratings at all
-        test_query = """
-        MATCH (u:User {id: $user_id})-[r:RATED]->(m:Movie)
-        RETURN count(r) as rating_count, u.username as username
-        """
-        
-        test_result = current_app.neo4j_service.execute_query(
-            test_query, 
-            {'user_id': user_id}
-        )
-        
-        print(f"🔍 DEBUG - User rating check: {test_result}")
-        
-        if not test_result or test_result[0]['rating_count'] == 0:
-            print(f"⚠️ DEBUG - User {user_id} has no ratings!")
+        # Batch-computed hybrid list, unless the user rated since it was computed
+        if rec_type == 'hybrid':
+            recommendations = current_app.precomputed.get(
+                user_id, limit, current_app.rating_counter.changed_at(user_id))
+            if recommendations is not None:
+                return jsonify({
+                    'recommendations': recommendations,
+                    'user_id': user_id,
+                    'type': rec_type,
+                    'count': len(recommendations),
+                    'precomputed': True
+                }), 200
+        
+        # Cached count instead of a count query per request
+        rating_count = current_app.rating_counter.count(user_id)
+        print(f"🔍 DEBUG - User rating count: {rating_count}")
+        
+        # Cold start: popular movies from the precomputed ranking, optionally of one genre
+        if rating_count == 0:
+            print(f"⚠️ DEBUG - User {user_id} has no ratings, serving popular movies")
+            recommendations = current_app.popularity.top(limit, request.args.get('genre'))
             return jsonify({
-                'recommendations': [],
+                'recommendations': recommendations,
                 'user_id': user_id,
                 'type': rec_type,
-                'count': 0,
-                'message': f'No ratings found for user. Please rate some movies first.',
+                'count': len(recommendations),
+                'cold_start': True,
+                'message': 'Popular picks for you. Rate some movies to get personalized recommendations.',
                 'debug_info': {
-                    'user_found': len(test_result) > 0,
-                    'rating_count': test_result[0]['rating_count'] if test_result else 0,
-                    'username': test_result[0]['username'] if test_result else 'Not found'
+                    'rating_count': 0
                 }
             }), 200
         
         # Get recommendations based on type
+        hybrid_info = None
+        pipeline_info = None
         if rec_type == 'collaborative':
             recommendations = current_app.recommendation_engine.get_collaborative_recommendations(user_id, limit)
         elif rec_type == 'content':
             recommendations = current_app.recommendation_engine.get_content_based_recommendations(user_id, limit)
+        elif rec_type == 'mf':
+            recommendations = current_app.recommendation_engine.get_mf_recommendations(user_id, limit)
+        elif rec_type == 'pipeline':
+            recommendations, pipeline_info = current_app.recommendation_pipeline.run(user_id, limit)
         else:  # hybrid
-            recommendations = current_app.recommendation_engine.get_hybrid_recommendations(user_id, limit)
+            recommendations, hybrid_info = current_app.recommendation_engine.get_hybrid_recommendations_with_arms(
+                user_id, limit
+            )
         
         print(f"🔍 DEBUG - Recommendations returned: {len(recommendations)}")
         if recommendations:
             print(f"🔍 DEBUG - First recommendation: {recommendations[0]}")
         
-        return jsonify({
+        response = {
             'recommendations': recommendations,
             'user_id': user_id,
             'type': rec_type,
             'count': len(recommendations),
             'debug_info': {
-                'user_rating_count': test_result[0]['rating_count'],
-                'username': test_result[0]['username']
+                'user_rating_count': rating_count
             }
-        }), 200
+        }
+        if pipeline_info is not None:
+            response['stages'] = pipeline_info['stages']
+        if hybrid_info is not None:
+            response['arms'] = hybrid_info['arms']
+            response['partial'] = hybrid_info['partial']
+            if hybrid_info['partial']:
+                return jsonify(response), 200, PARTIAL_HEADERS
+        return jsonify(response), 200
         
     except Exception as e:
         print(f"❌ DEBUG - Error getting personal recommendations: {e}")
@@ -230,6 +270,7 @@ def get_my_recommendations():
         }), 500
 
 @recommendations_bp.route('/popular', methods=['GET'])
+@snapshot_fallback
 def get_popular_recommendations():
     """Get popular/trending movies - good for new users or browsing"""
     try:
@@ -255,7 +296,54 @@ def get_popular_recommendations():
         print(f"❌ Error getting popular movies: {e}")
         return jsonify({'message': 'Error retrieving popular movies'}), 500
 
+@recommendations_bp.route('/onboarding', methods=['GET', 'POST'])
+def get_onboarding_recommendations():
+    """
+    Recommendations for new or anonymous visitors from picked genres and
+    optionally a few liked movies, served from memory without touching the
+    graph. GET takes ?genres=Drama,Action&movies=id1,id2; POST takes
+    {"genres": [...], "movie_ids": [...], "limit": n}.
+    """
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            genres = data.get('genres') or []
+            movie_ids = data.get('movie_ids') or []
+            limit = data.get('limit', 20)
+        else:
+            genres = [genre for genre in request.args.get('genres', '').split(',') if genre.strip()]
+            movie_ids = [movie_id for movie_id in request.args.get('movies', '').split(',') if movie_id.strip()]
+            limit = request.args.get('limit', 20)
+        
+        if not isinstance(genres, list) or not isinstance(movie_ids, list) \
+                or not all(isinstance(value, str) for value in genres + movie_ids):
+            return jsonify({'message': 'genres and movie_ids must be lists of strings'}), 400
+        
+        # Validate limit
+        limit = int(limit)
+        if limit < 1 or limit > 50:
+            limit = 20
+        
+        genres = [genre.strip() for genre in genres][:10]
+        movie_ids = [movie_id.strip() for movie_id in movie_ids]
+        recommendations = current_app.onboarding.recommend(genres, movie_ids, limit)
+        
+        return jsonify({
+            'recommendations': recommendations,
+            'genres': genres,
+            'movie_ids': movie_ids,
+            'type': 'onboarding',
+            'count': len(recommendations)
+        }), 200, ONBOARDING_HEADERS
+        
+    except (TypeError, ValueError):
+        return jsonify({'message': 'limit must be a number'}), 400
+    except Exception as e:
+        print(f"❌ Error getting onboarding recommendations: {e}")
+        return jsonify({'message': 'Error generating onboarding recommendations'}), 500
+
 @recommendations_bp.route('/similar/<movie_id>', methods=['GET'])
+@snapshot_fallback
 def get_similar_movies(movie_id):
     """Get movies similar to a specific movie"""
     try:
@@ -265,7 +353,16 @@ def get_similar_movies(movie_id):
         if limit < 1 or limit > 50:
             limit = 10
         
-        # Find movies with similar genres and high ratings
+        similar_movies = current_app.recommendation_engine.get_indexed_similar_movies(movie_id, limit)
+        if similar_movies is not None:
+            print(f"🎭 Found {len(similar_movies)} movies similar to {movie_id} (index)")
+            return jsonify({
+                'similar_movies': similar_movies,
+                'movie_id': movie_id,
+                'count': len(similar_movies)
+            }), 200
+        
+        # Not indexed yet: find movies with similar genres and high ratings
         query = """
         MATCH (target:Movie {id: $movie_id})-[:HAS_GENRE]->(g:Genre)<-[:HAS_GENRE]-(similar:Movie)
         WHERE target <> similar AND similar.avg_rating >= 3.5
@@ -297,6 +394,7 @@ def get_similar_movies(movie_id):
         return jsonify({'message': 'Error finding similar movies'}), 500
 
 @recommendations_bp.route('/by-genre/<genre>', methods=['GET'])
+@snapshot_fallback
 def get_recommendations_by_genre(genre):
     """Get highly-rated movies from a specific genre"""
     try:
@@ -340,6 +438,7 @@ def get_recommendations_by_genre(genre):
 # The issue is likely in your new-releases route. Replace it with this safer version:
 
 @recommendations_bp.route('/new-releases', methods=['GET'])
+@snapshot_fallback
 def get_new_releases():
     """Get recent movies (from the last few years)"""
     try:
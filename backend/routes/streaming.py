@@ -0,0 +1,56 @@
+import json
+import logging
+from flask import Response, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def _json_default(value):
+    """Serialize Neo4j temporal types and other non-JSON values"""
+    if hasattr(value, 'iso_format'):
+        return value.iso_format()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+def wants_ndjson():
+    """NDJSON if asked for with ?format=ndjson or an Accept header, else a JSON array"""
+    if request.args.get('format'):
+        return request.args.get('format') == 'ndjson'
+    return request.accept_mimetypes.best_match([NDJSON_MIMETYPE, 'application/json']) == NDJSON_MIMETYPE
+
+def stream_records(records, transform=None, ndjson=None):
+    """
+    Stream an iterable of records as NDJSON (one object per line) or as a
+    chunked JSON array, without ever holding the full result in memory.
+
+    Args:
+        records: Iterable of dictionaries, e.g. Neo4jService.stream_query(...)
+        transform: Optional function applied to each record before encoding
+        ndjson: Force the output format (defaults to wants_ndjson())
+    """
+    if ndjson is None:
+        ndjson = wants_ndjson()
+
+    def generate():
+        if not ndjson:
+            yield '['
+        try:
+            for index, record in enumerate(records):
+                if transform:
+                    record = transform(record)
+                line = json.dumps(record, default=_json_default)
+                if ndjson:
+                    yield line + '\n'
+                else:
+                    yield (',' if index else '') + line
+        except Exception as e:
+            # Headers are already sent, so all we can do is stop and log it
+            logging.error(f"❌ Error while streaming response: {e}")
+            raise
+        if not ndjson:
+            yield ']'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=NDJSON_MIMETYPE if ndjson else 'application/json'
+    )
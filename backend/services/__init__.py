@@ -3,6 +3,25 @@ Services package for the Movie Recommendation System
 
 This package contains all the business logic services:
 - neo4j_service: Database connection and query execution
+- connection_manager: App-owned Neo4j driver and connection pool
+- metrics: In-process Prometheus metrics registry
+- batch_loader: Micro-batching of concurrent point lookups (UNWIND $ids)
+- query_cache: Tag-invalidated cache for hot catalog reads
+- circuit_breaker: Fail-fast breaker around Neo4j calls
+- snapshot_store: Last good responses served while Neo4j is down
+- slow_query_log: Slow queries with sampled PROFILE/EXPLAIN plans
+- rating_matrix: In-memory CSR rating matrix for collaborative filtering
+- factor_model: ALS matrix factorization trainer and versioned, memory-mapped factor store
+- versioned_store: Atomically swapped, versioned on-disk artifacts
+- precomputed_recommendations: Batch-computed hybrid lists served by /for-me
+- similarity_index: Offline top-K item-item similarity for /similar
+- text_vectors: Hashed TF-IDF plot/title/cast vectors for content scoring
+- ann_index: Random hyperplane LSH for approximate nearest-neighbour lookups
+- recommendation_pipeline: Staged candidate generation, merge, filter and ranking
+- popularity: Periodically refreshed popularity ranking for cold-start users
+- rating_counter: Cached per-user rating counts
+- onboarding: In-memory recommendations from genre picks for new visitors
+- movie_stats: Write-behind queue for movie rating totals
 - recommendation_engine: Machine learning recommendation algorithms
 - auth_service: User authentication and management
 """
@@ -0,0 +1,197 @@
+import json
+import math
+import os
+import numpy as np
+import scipy.sparse as sp
+
+def auto_bits(n_items, bucket_size=32):
+    """Signature bits giving buckets of about `bucket_size` items"""
+    return max(4, min(24, int(round(math.log2(max(n_items, 2) / bucket_size)))))
+
+def top_rows(rows, scores, k):
+    """The k best (row, score) pairs of the candidates, best first"""
+    k = min(k, len(rows))
+    if k <= 0:
+        return rows[:0], scores[:0]
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return rows[top], scores[top]
+
+class LSHIndex:
+    """
+    Approximate nearest neighbours by cosine, with random hyperplane LSH.
+
+    Each of `n_tables` tables hashes a vector to the `n_bits` signs of its
+    projections on random hyperplanes; similar vectors share a signature
+    with high probability. A table is stored as its rows sorted by signature,
+    with the table number in the high bits, so all tables form one sorted
+    array and a lookup is one vectorised binary search. Queries also probe
+    `n_probes` nearby signatures per table, flipping the bits whose
+    projections were closest to zero first (query-directed multi-probe),
+    which keeps recall up with fewer tables.
+
+    The index only proposes candidates; callers score them exactly against
+    their own vectors and keep the best.
+
+    Vectors may be dense arrays or scipy sparse rows. For sparse input only
+    the hyperplane rows of the columns seen so far are kept (`columns`), so
+    hashed feature spaces stay small on disk.
+
+    `insert` adds rows to an in-memory delta that is scanned linearly and
+    merged into the sorted tables by the next `save`.
+    """
+
+    # Probes flip subsets of this many least certain bits
+    PROBE_BITS = 6
+
+    def __init__(self, planes, signatures, order, keys, n_tables, n_bits, columns=None, n_probes=16):
+        self.planes = planes
+        self.columns = columns
+        self.signatures = signatures
+        self.order = order
+        self.keys = keys
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes
+        self._weights = (np.uint32(1) << np.arange(n_bits, dtype=np.uint32)).astype(np.uint32)
+        probe_bits = min(self.PROBE_BITS, n_bits)
+        # Every subset of the least certain bits, as rows of 0/1 flags
+        self._subsets = ((np.arange(2 ** probe_bits)[:, None] >> np.arange(probe_bits)) & 1).astype(np.float32)
+        self._delta = np.zeros((0, n_tables), dtype=np.uint32)
+
+    def __len__(self):
+        return len(self.signatures) + len(self._delta)
+
+    @classmethod
+    def build(cls, vectors, n_tables=8, n_bits=None, n_probes=16, seed=0):
+        """Index the rows of `vectors` (dense array or sparse matrix); row i is item i"""
+        n_bits = n_bits or auto_bits(vectors.shape[0])
+        rng = np.random.default_rng(seed)
+        columns = None
+        if sp.issparse(vectors):
+            vectors = sp.csr_matrix(vectors)
+            columns = np.unique(vectors.indices).astype(np.int64)
+            planes = rng.standard_normal((len(columns), n_tables * n_bits), dtype=np.float32)
+        else:
+            planes = rng.standard_normal((vectors.shape[1], n_tables * n_bits), dtype=np.float32)
+
+        index = cls(planes, np.zeros((0, n_tables), dtype=np.uint32), None, None, n_tables, n_bits, columns, n_probes)
+        signatures = index.signature(vectors)
+        index.signatures = signatures
+        index.order, index.keys = cls._sort(signatures)
+        return index
+
+    @staticmethod
+    def _sort(signatures):
+        """Flat (tables * rows) row numbers and keys, sorted by table then signature"""
+        order = np.argsort(signatures, axis=0, kind='stable').T.astype(np.int32)
+        keys = np.take_along_axis(signatures.T, order, axis=1).astype(np.uint64)
+        keys |= np.arange(signatures.shape[1], dtype=np.uint64)[:, None] << np.uint64(32)
+        return order.ravel(), keys.ravel()
+
+    def project(self, vectors):
+        """(n, n_tables * n_bits) projections of dense or sparse rows"""
+        if not sp.issparse(vectors):
+            return np.atleast_2d(np.asarray(vectors, dtype=np.float32)) @ self.planes
+        vectors = sp.csr_matrix(vectors)
+        # Columns without hyperplanes yet can't be shared with any indexed item
+        positions = np.searchsorted(self.columns, vectors.indices)
+        positions = np.minimum(positions, max(len(self.columns) - 1, 0))
+        known = (self.columns[positions] == vectors.indices) if len(self.columns) else np.zeros(len(vectors.indices), bool)
+        remapped = sp.csr_matrix(
+            (np.where(known, vectors.data, 0).astype(np.float32), np.where(known, positions, 0), vectors.indptr),
+            shape=(vectors.shape[0], len(self.columns))
+        )
+        return np.asarray(remapped @ self.planes)
+
+    def signature(self, vectors):
+        """(n, n_tables) signatures of dense or sparse rows"""
+        return self._signature(self.project(vectors))
+
+    def _signature(self, projections):
+        bits = (projections > 0).reshape(-1, self.n_tables, self.n_bits)
+        return (bits.astype(np.uint32) @ self._weights).astype(np.uint32)
+
+    def probes(self, vector):
+        """
+        (n_tables, n_probes) signatures to look up for `vector`: its own first,
+        then those flipping the bit sets with the smallest total |projection|
+        """
+        projection = self.project(vector)
+        signature = self._signature(projection)[0]
+        margins = np.abs(projection.reshape(self.n_tables, self.n_bits))
+        probe_bits = self._subsets.shape[1]
+        uncertain = np.argsort(margins, axis=1)[:, :probe_bits]
+        cost = np.take_along_axis(margins, uncertain, axis=1) @ self._subsets.T
+        best = np.argsort(cost, axis=1, kind='stable')[:, :self.n_probes]
+        masks = (self._subsets @ self._weights[uncertain].T.astype(np.float32)).T.astype(np.uint32)
+        return signature[:, None] ^ np.take_along_axis(masks, best, axis=1)
+
+    def insert(self, vectors):
+        """
+        Add rows after the existing ones; returns the row number of the first.
+        Sparse rows may use new columns, which get their own hyperplanes.
+        """
+        if sp.issparse(vectors):
+            vectors = sp.csr_matrix(vectors)
+            new = np.setdiff1d(np.unique(vectors.indices), self.columns)
+            if len(new):
+                rng = np.random.default_rng(len(self.columns))
+                columns = np.concatenate([self.columns, new])
+                planes = np.vstack([self.planes, rng.standard_normal((len(new), self.planes.shape[1]), dtype=np.float32)])
+                order = np.argsort(columns)
+                self.columns, self.planes = columns[order], planes[order]
+        first = len(self)
+        self._delta = np.vstack([self._delta, self.signature(vectors)])
+        return first
+
+    def candidates(self, vector):
+        """Rows sharing a probed signature with `vector` in any table"""
+        probes = self.probes(vector)
+        flat = (probes.astype(np.uint64) | (np.arange(self.n_tables, dtype=np.uint64)[:, None] << np.uint64(32))).ravel()
+        lo = np.searchsorted(self.keys, flat, side='left')
+        lengths = np.searchsorted(self.keys, flat, side='right') - lo
+        # Concatenated [lo, hi) ranges without a Python loop
+        positions = np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        found = [self.order[positions]]
+        if len(self._delta):
+            hit = np.zeros(len(self._delta), dtype=bool)
+            for table in range(self.n_tables):
+                hit |= np.isin(self._delta[:, table], probes[table])
+            found.append(np.flatnonzero(hit).astype(np.int32) + len(self.signatures))
+        # Sort and drop repeats; much faster than np.unique at these sizes
+        rows = np.sort(np.concatenate(found).astype(np.int32))
+        return rows[np.concatenate(([True], rows[1:] != rows[:-1]))] if len(rows) else rows
+
+    def save(self, path):
+        """Write the index (delta merged in) to the directory `path`"""
+        os.makedirs(path, exist_ok=True)
+        signatures = np.vstack([np.asarray(self.signatures), self._delta])
+        order, keys = self._sort(signatures)
+        np.save(os.path.join(path, 'signatures.npy'), signatures)
+        np.save(os.path.join(path, 'order.npy'), order)
+        np.save(os.path.join(path, 'keys.npy'), keys)
+        np.save(os.path.join(path, 'planes.npy'), np.asarray(self.planes, dtype=np.float32))
+        if self.columns is not None:
+            np.save(os.path.join(path, 'columns.npy'), np.asarray(self.columns, dtype=np.int64))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'tables': self.n_tables, 'bits': self.n_bits, 'probes': self.n_probes, 'items': len(signatures)}, f)
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved index memory-mapped"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode='r')
+        columns = np.load(os.path.join(path, 'columns.npy')) if os.path.exists(os.path.join(path, 'columns.npy')) else None
+        return cls(load('planes.npy'), load('signatures.npy'), load('order.npy'), load('keys.npy'),
+                   meta['tables'], meta['bits'], columns, meta.get('probes', 16))
+
+def mips_vectors(item_vectors):
+    """
+    Items augmented with sqrt(max_norm^2 - norm^2), so that for a query
+    padded with 0 the cosine ranking equals the inner product ranking
+    """
+    norms = np.einsum('ij,ij->i', item_vectors, item_vectors)
+    pad = np.sqrt(np.maximum(norms.max(initial=0.0) - norms, 0.0))
+    return np.hstack([item_vectors, pad[:, None]]).astype(np.float32)
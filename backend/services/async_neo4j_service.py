@@ -0,0 +1,192 @@
+from neo4j import AsyncGraphDatabase, unit_of_work
+from services.metrics import REGISTRY
+from services.neo4j_service import query_name, _causal_key
+from services.circuit_breaker import CircuitOpenError
+import asyncio
+import threading
+import time
+import logging
+
+class AsyncNeo4jService:
+    """
+    Async counterpart of Neo4jService, built on the driver's AsyncGraphDatabase.
+
+    Flask runs every async view in a short-lived event loop of its own, while an
+    AsyncDriver is bound to the loop it was created on. So the driver lives on a
+    dedicated background loop and views await its work through wrapped futures.
+    Use `gather` to run independent queries of one endpoint concurrently.
+
+    With a `bookmark_store` (the app's Neo4jService) reads chain on the same
+    per-user bookmarks as the sync driver, so read-your-writes holds across
+    both. The causal key is taken from the caller's context when a query is
+    issued, since the driver's loop doesn't share it.
+
+    The driver has its own pool of NEO4J_ASYNC_MAX_POOL_SIZE connections on
+    top of the sync one; `pool_stats` reports its usage.
+    """
+
+    def __init__(self, uri, user, password, settings, metrics=None, breaker=None, bookmark_store=None):
+        self.logger = logging.getLogger(__name__)
+        self.query_timeout = float(settings.get('NEO4J_QUERY_TIMEOUT', 0)) or None
+        
+        # Usually Neo4jService's breaker, so both drivers trip together
+        self.breaker = breaker
+        self.bookmark_store = bookmark_store
+
+        self.max_pool_size = int(settings.get('NEO4J_ASYNC_MAX_POOL_SIZE', 10))
+        self._in_use = 0
+        self._checkouts = 0
+
+        # Same metric families as Neo4jService, with async_* modes
+        self.metrics = metrics or REGISTRY
+        self._query_seconds = self.metrics.histogram(
+            'neo4j_query_duration_seconds', 'Client-side query latency', ('query', 'mode'))
+        self._query_rows = self.metrics.counter(
+            'neo4j_query_rows_total', 'Records returned', ('query',))
+        self._query_errors = self.metrics.counter(
+            'neo4j_query_errors_total', 'Failed queries', ('query', 'mode'))
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name='neo4j-async', daemon=True
+        )
+        self._thread.start()
+
+        async def connect():
+            driver = AsyncGraphDatabase.driver(
+                uri,
+                auth=(user, password),
+                max_connection_pool_size=self.max_pool_size,
+                connection_acquisition_timeout=float(settings.get('NEO4J_ACQUISITION_TIMEOUT', 60.0)),
+                max_connection_lifetime=float(settings.get('NEO4J_MAX_CONNECTION_LIFETIME', 3600)),
+                max_transaction_retry_time=float(settings.get('NEO4J_MAX_TX_RETRY_TIME', 15.0))
+            )
+            await driver.verify_connectivity()
+            return driver
+
+        self.driver = self.run(connect())
+        self.logger.info("✅ Async Neo4j driver ready")
+
+    def run(self, coro):
+        """Run a coroutine on the driver's loop and block for its result (sync callers)"""
+        key = _causal_key.get()
+
+        async def in_caller_chain():
+            # Tasks the coroutine starts copy this context, so they inherit the key too
+            _causal_key.set(key)
+            return await coro
+
+        return asyncio.run_coroutine_threadsafe(in_caller_chain(), self._loop).result()
+
+    async def _submit(self, coro):
+        """Await a coroutine on the driver's loop from any other event loop"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def _execute(self, write, query, parameters=None, timeout=None, metadata=None, name=None, key=None):
+        if timeout is None:
+            timeout = self.query_timeout
+        name = query_name(query, name)
+        mode = 'async_write' if write else 'async_read'
+
+        async def work(tx):
+            result = await tx.run(query, parameters or {})
+            return await result.data()
+
+        work = unit_of_work(timeout=timeout or None, metadata=metadata)(work)
+        if self.breaker:
+            self.breaker.before_call()
+        started = time.perf_counter()
+
+        bookmarks = self.bookmark_store.get_bookmarks(key) if self.bookmark_store is not None else None
+        self._in_use += 1
+        self._checkouts += 1
+        try:
+            async with self.driver.session(bookmarks=bookmarks) as session:
+                if write:
+                    records = await session.execute_write(work)
+                    if key is not None and self.bookmark_store is not None:
+                        self.bookmark_store.store_bookmarks(key, await session.last_bookmarks())
+                else:
+                    records = await session.execute_read(work)
+        except asyncio.CancelledError:
+            # e.g. a hybrid arm that missed its deadline
+            if self.breaker:
+                self.breaker.record_cancelled()
+            raise
+        except Exception as e:
+            self._query_errors.inc(query=name, mode=mode)
+            if self.breaker:
+                self.breaker.record_failure(e)
+            raise
+        finally:
+            self._in_use -= 1
+
+        elapsed = time.perf_counter() - started
+        if self.breaker:
+            self.breaker.record_success(elapsed)
+        self._query_seconds.observe(elapsed, query=name, mode=mode)
+        self._query_rows.inc(len(records), query=name)
+        return records
+
+    async def execute_read(self, query, parameters=None, timeout=None, metadata=None, name=None):
+        """Execute a read query in a managed READ transaction"""
+        try:
+            return await self._submit(
+                self._execute(False, query, parameters, timeout, metadata, name, key=_causal_key.get()))
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logging.error(f"❌ Async query execution failed: {e}")
+            logging.error(f"Query: {query}")
+            logging.error(f"Parameters: {parameters}")
+            raise
+
+    async def execute_write(self, query, parameters=None, timeout=None, metadata=None, name=None):
+        """Execute a write query in a managed WRITE transaction"""
+        try:
+            return await self._submit(
+                self._execute(True, query, parameters, timeout, metadata, name, key=_causal_key.get()))
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logging.error(f"❌ Async write query execution failed: {e}")
+            logging.error(f"Query: {query}")
+            logging.error(f"Parameters: {parameters}")
+            raise
+
+    async def gather(self, *queries, return_exceptions=False):
+        """
+        Run independent read queries concurrently
+
+        Args:
+            queries: (query, parameters) or (query, parameters, name) tuples
+            return_exceptions: Return a failed query's exception in its slot
+                instead of raising it
+
+        Returns:
+            List of result lists, in the same order as `queries`
+        """
+        return await asyncio.gather(*(
+            self.execute_read(query[0], query[1], name=query[2] if len(query) > 2 else None)
+            for query in queries
+        ), return_exceptions=return_exceptions)
+
+    def pool_stats(self):
+        """Usage of the async driver's own connection pool (sessions in use, free session slots)"""
+        return {
+            'max_pool_size': self.max_pool_size,
+            'in_use': self._in_use,
+            'free_slots': max(self.max_pool_size - self._in_use, 0),
+            'checkouts': self._checkouts
+        }
+
+    def close(self):
+        """Close the driver and stop its event loop (process shutdown only)"""
+        if self._loop.is_closed():
+            return
+        try:
+            self.run(self.driver.close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
@@ -7,8 +7,39 @@ class AuthService:
     Authentication service that handles user-related operations
     """
     
-    def __init__(self, neo4j_service):
+    USER_BY_ID_QUERY = """
+    MATCH (u:User {id: $user_id}) 
+    RETURN u.id as id, u.username as username, u.email as email,
+           u.password_hash as password_hash, u.created_at as created_at
+    """
+    
+    # Batched form of USER_BY_ID_QUERY for the `user_by_id` loader
+    USERS_BY_IDS_QUERY = """
+    UNWIND $ids AS user_id
+    MATCH (u:User {id: user_id})
+    RETURN user_id as key, u.id as id, u.username as username, u.email as email,
+           u.password_hash as password_hash, u.created_at as created_at
+    """
+    
+    USER_STATS_QUERY = """
+    MATCH (u:User {id: $user_id})
+    OPTIONAL MATCH (u)-[r:RATED]->(m:Movie)
+    RETURN u.username as username,
+           COUNT(r) as total_ratings,
+           AVG(r.rating) as avg_rating,
+           MIN(r.rating) as min_rating,
+           MAX(r.rating) as max_rating
+    """
+    
+    def __init__(self, neo4j_service, movie_stats=None, on_ratings_changed=None):
+        """
+        `movie_stats` (a MovieStatsQueue) and `on_ratings_changed` (a callable
+        taking user_id and [(movie_id, rating)], see routes/ratings.py) are told
+        about the ratings removed with a deleted user
+        """
         self.neo4j = neo4j_service
+        self.movie_stats = movie_stats
+        self.on_ratings_changed = on_ratings_changed
         self.logger = logging.getLogger(__name__)
     
     def user_exists(self, email: str) -> bool:
@@ -97,14 +128,8 @@ class AuthService:
     def get_user_by_id(self, user_id: str) -> Optional[User]:
         """Get a user by their ID"""
         try:
-            result = self.neo4j.execute_query(
-                """
-                MATCH (u:User {id: $user_id}) 
-                RETURN u.id as id, u.username as username, u.email as email,
-                       u.password_hash as password_hash, u.created_at as created_at
-                """,
-                {'user_id': user_id}
-            )
+            # Concurrent lookups (e.g. /me on every page load) share one query
+            result = self.neo4j.batch_loader('user_by_id', self.USERS_BY_IDS_QUERY).load(user_id)
             
             if not result:
                 return None
@@ -188,21 +213,31 @@ class AuthService:
     def delete_user(self, user_id: str) -> bool:
         """Delete a user and all their ratings"""
         try:
-            # First delete all ratings by this user
-            self.neo4j.execute_write_query(
-                "MATCH (u:User {id: $user_id})-[r:RATED]->() DELETE r",
-                {'user_id': user_id}
-            )
-            
-            # Then delete the user
+            # Delete the user together with all their ratings in one transaction,
+            # returning the ratings so the movies' totals can be taken down
             result = self.neo4j.execute_write_query(
-                "MATCH (u:User {id: $user_id}) DELETE u RETURN count(u) as deleted",
-                {'user_id': user_id}
+                """
+                MATCH (u:User {id: $user_id})
+                OPTIONAL MATCH (u)-[r:RATED]->(m:Movie)
+                WITH u, collect({movie_id: m.id, rating: r.rating}) as ratings
+                DETACH DELETE u
+                RETURN count(u) as deleted, ratings
+                """,
+                {'user_id': user_id},
+                touches=('User', 'RATED')
             )
             
             deleted_count = result[0]['deleted'] if result else 0
             
             if deleted_count > 0:
+                ratings = [rating for rating in result[0]['ratings'] if rating['movie_id'] is not None]
+                if self.movie_stats is not None:
+                    for rating in ratings:
+                        self.movie_stats.record(rating['movie_id'], None, rating['rating'])
+                elif ratings:
+                    self.logger.warning(f"Rating totals of {len(ratings)} movies not updated for deleted user {user_id}")
+                if self.on_ratings_changed is not None and ratings:
+                    self.on_ratings_changed(user_id, [(rating['movie_id'], None) for rating in ratings])
                 self.logger.info(f"Deleted user: {user_id}")
                 return True
             else:
@@ -216,31 +251,24 @@ class AuthService:
     def get_user_stats(self, user_id: str) -> dict:
         """Get statistics about a user's activity"""
         try:
-            result = self.neo4j.execute_query(
-                """
-                MATCH (u:User {id: $user_id})
-                OPTIONAL MATCH (u)-[r:RATED]->(m:Movie)
-                RETURN u.username as username,
-                       COUNT(r) as total_ratings,
-                       AVG(r.rating) as avg_rating,
-                       MIN(r.rating) as min_rating,
-                       MAX(r.rating) as max_rating
-                """,
-                {'user_id': user_id}
-            )
-            
-            if not result:
-                return {}
-            
-            stats = result[0]
-            return {
-                'username': stats['username'],
-                'total_ratings': stats['total_ratings'] or 0,
-                'avg_rating': float(stats['avg_rating']) if stats['avg_rating'] else 0.0,
-                'min_rating': stats['min_rating'],
-                'max_rating': stats['max_rating']
-            }
+            result = self.neo4j.execute_query(self.USER_STATS_QUERY, {'user_id': user_id})
+            return self.format_user_stats(result)
             
         except Exception as e:
             self.logger.error(f"Error getting user stats: {e}")
-            return {}
\ No newline at end of file
+            return {}
+    
+    @staticmethod
+    def format_user_stats(result) -> dict:
+        """Shape the rows of USER_STATS_QUERY into the stats dictionary"""
+        if not result:
+            return {}
+        
+        stats = result[0]
+        return {
+            'username': stats['username'],
+            'total_ratings': stats['total_ratings'] or 0,
+            'avg_rating': float(stats['avg_rating']) if stats['avg_rating'] else 0.0,
+            'min_rating': stats['min_rating'],
+            'max_rating': stats['max_rating']
+        }
\ No newline at end of file
@@ -0,0 +1,137 @@
+from concurrent.futures import Future
+import asyncio
+import threading
+import time
+
+class SingleFlight:
+    """
+    Deduplicates identical in-flight calls: while one caller runs `fn` for a
+    key, concurrent callers with the same key wait for and share its result
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+class BatchLoader:
+    """
+    DataLoader-style coalescing of point lookups by id.
+
+    Keys requested within `window_ms` of each other are resolved together by
+    one query that takes them as `$ids` and returns a `key` column, e.g.
+
+        UNWIND $ids AS id
+        MATCH (m:Movie {id: id})
+        RETURN id AS key, m.title AS title
+
+    The first caller of a window waits out the window and runs the batch on
+    its own thread; a batch is sent early once `max_batch` keys are waiting.
+    A key that is already waiting or being fetched is not queried again, its
+    callers share the pending result (single-flight).
+
+    Lookups run outside any read-your-writes chain since one batch serves
+    many users, so use loaders for catalog-style reads.
+    """
+
+    def __init__(self, neo4j_service, name, query, window_ms=2, max_batch=100, timeout=None):
+        self.neo4j = neo4j_service
+        self.name = name
+        self.query = query
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._pending = []   # keys waiting for the next batch
+        self._inflight = {}  # key -> Future, from enqueue until resolved
+
+        metrics = neo4j_service.metrics
+        self._keys = metrics.counter(
+            'neo4j_loader_keys_total', 'Keys requested from batch loaders', ('loader', 'result'))
+        self._batch_size = metrics.histogram(
+            'neo4j_loader_batch_size', 'Keys resolved per batch query', ('loader',),
+            buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500))
+
+    def submit(self, key):
+        """Future resolving to the list of rows for `key` ([] when nothing matched)"""
+        batch = None
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._keys.inc(loader=self.name, result='coalesced')
+                return future
+
+            future = self._inflight[key] = Future()
+            self._pending.append(key)
+            self._keys.inc(loader=self.name, result='batched')
+            leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_batch:
+                batch, self._pending = self._pending, []
+
+        if batch:
+            self._run(batch)
+        elif leader:
+            time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if batch:
+                self._run(batch)
+        return future
+
+    def load(self, key):
+        """Rows for `key`, like `execute_read` of the equivalent single-id query"""
+        # Coalesced callers share a result; give each its own rows
+        return [dict(row) for row in self.submit(key).result()]
+
+    async def load_async(self, key):
+        """`load` for async views; the window is waited out off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.load, key)
+
+    def _run(self, keys):
+        self._batch_size.observe(len(keys), loader=self.name)
+        try:
+            with self.neo4j.causal_chain(None):
+                rows = self.neo4j.execute_read(
+                    self.query, {'ids': keys}, timeout=self.timeout, name=self.name
+                )
+        except BaseException as e:
+            for future in self._resolve(keys):
+                future.set_exception(e)
+            return
+
+        by_key = {}
+        for row in rows:
+            by_key.setdefault(row.pop('key'), []).append(row)
+        for key, future in zip(keys, self._resolve(keys)):
+            future.set_result(by_key.get(key, []))
+
+    def _resolve(self, keys):
+        # Leave the in-flight map before results land, so later callers query afresh
+        with self._lock:
+            return [self._inflight.pop(key) for key in keys]
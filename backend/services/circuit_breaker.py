@@ -0,0 +1,153 @@
+from collections import deque
+from neo4j.exceptions import ClientError, DatabaseError, ServiceUnavailable, SessionExpired, TransientError
+from services.connection_manager import PoolExhaustedError
+import logging
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Neo4j while the circuit is open"""
+
+def is_outage(error):
+    """
+    Whether an error says the database is unhealthy (unreachable, overloaded,
+    timing out) rather than that the query itself is wrong
+    """
+    if isinstance(error, (ServiceUnavailable, SessionExpired, TransientError, DatabaseError,
+                          PoolExhaustedError, OSError)):
+        return True
+    if isinstance(error, ClientError):
+        return 'TimedOut' in (error.code or '')
+    return False
+
+def database_unavailable(error):
+    """Whether `error` means the database could not answer (circuit open or outage)"""
+    return isinstance(error, CircuitOpenError) or is_outage(error)
+
+class CircuitBreaker:
+    """
+    Fails fast when Neo4j is down or stalling, instead of letting every
+    worker block on it.
+
+    Outcomes of the last `window` calls are kept. Once at least `min_calls`
+    are in, the circuit opens when the share of outage errors reaches
+    `failure_rate`, or the share of calls slower than `slow_call_ms` reaches
+    `slow_call_rate`. While open every call raises CircuitOpenError. After
+    `open_seconds` a single probe call is let through (half-open): success
+    closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_rate=0.5, slow_call_ms=2000, slow_call_rate=0.8,
+                 window=50, min_calls=10, open_seconds=30):
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_ms / 1000.0
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._calls = deque(maxlen=window)  # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.trips = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a breaker from CIRCUIT_* settings"""
+        return cls(
+            failure_rate=float(settings.get('CIRCUIT_FAILURE_RATE', 0.5)),
+            slow_call_ms=float(settings.get('CIRCUIT_SLOW_CALL_MS', 2000)),
+            slow_call_rate=float(settings.get('CIRCUIT_SLOW_CALL_RATE', 0.8)),
+            window=int(settings.get('CIRCUIT_WINDOW', 50)),
+            min_calls=int(settings.get('CIRCUIT_MIN_CALLS', 10)),
+            open_seconds=float(settings.get('CIRCUIT_OPEN_SECONDS', 30))
+        )
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go to the database now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_in = max(self.open_seconds - (time.monotonic() - self._opened_at), 0)
+        raise CircuitOpenError(f"Neo4j circuit is open, retry in {retry_in:.0f}s")
+
+    def record_success(self, elapsed):
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if slow:
+                    self._trip()
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    self.logger.info("✅ Neo4j circuit closed")
+                return
+            self._calls.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self, error):
+        """Count `error` against the circuit if it is an outage; other errors are ignored"""
+        outage = is_outage(error)
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if outage:
+                    self._trip()
+                return
+            if outage:
+                self._calls.append((True, False))
+                self._evaluate()
+
+    def record_cancelled(self):
+        """A call abandoned by its caller says nothing about health; free the probe slot"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+
+    def _evaluate(self):
+        if self._state != CLOSED or len(self._calls) < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._calls if failed) / len(self._calls)
+        slow = sum(1 for _, was_slow in self._calls if was_slow) / len(self._calls)
+        if failures >= self.failure_rate or slow >= self.slow_call_rate:
+            self._trip()
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.trips += 1
+        self.logger.warning(f"⚡ Neo4j circuit opened for {self.open_seconds}s")
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'recent_calls': len(self._calls),
+                'recent_failures': sum(1 for failed, _ in self._calls if failed),
+                'recent_slow_calls': sum(1 for _, slow in self._calls if slow),
+                'trips': self.trips,
+                'rejected': self.rejected
+            }
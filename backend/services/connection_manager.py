@@ -0,0 +1,148 @@
+from neo4j import GraphDatabase
+from contextlib import contextmanager
+from services.metrics import REGISTRY
+import threading
+import logging
+import time
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled connection frees up within the acquisition timeout"""
+
+
+class Neo4jConnectionManager:
+    """
+    Owns the Neo4j driver and its connection pool for the lifetime of the process.
+
+    The driver is created once, warmed at startup and only closed on shutdown.
+    Session checkouts are gated by a semaphore sized to the pool so we can
+    report how many connections are in use and how long callers wait for one.
+    """
+
+    def __init__(self, uri, user, password, max_pool_size=50,
+                 acquisition_timeout=60.0, max_connection_lifetime=3600,
+                 max_transaction_retry_time=15.0, metrics=None):
+        self.uri = uri
+        self.max_pool_size = max_pool_size
+        self.acquisition_timeout = acquisition_timeout
+        self.max_connection_lifetime = max_connection_lifetime
+        self.logger = logging.getLogger(__name__)
+
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=max_pool_size,
+            connection_acquisition_timeout=acquisition_timeout,
+            max_connection_lifetime=max_connection_lifetime,
+            max_transaction_retry_time=max_transaction_retry_time
+        )
+
+        self._slots = threading.BoundedSemaphore(max_pool_size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._closed = False
+
+        metrics = metrics or REGISTRY
+        self._wait_seconds = metrics.histogram(
+            'neo4j_pool_acquisition_wait_seconds', 'Time spent waiting for a pooled connection')
+        self._timeout_count = metrics.counter(
+            'neo4j_pool_acquisition_timeouts_total', 'Checkouts that gave up waiting for a connection')
+
+    @classmethod
+    def from_settings(cls, uri, user, password, settings):
+        """Build a manager using the pool settings from a config mapping"""
+        return cls(
+            uri, user, password,
+            max_pool_size=int(settings.get('NEO4J_MAX_POOL_SIZE', 50)),
+            acquisition_timeout=float(settings.get('NEO4J_ACQUISITION_TIMEOUT', 60.0)),
+            max_connection_lifetime=float(settings.get('NEO4J_MAX_CONNECTION_LIFETIME', 3600)),
+            max_transaction_retry_time=float(settings.get('NEO4J_MAX_TX_RETRY_TIME', 15.0))
+        )
+
+    def warm(self, connections=1):
+        """
+        Open `connections` sessions concurrently so the pool (and the TLS
+        handshakes behind it) is ready before the first request arrives
+        """
+        self.driver.verify_connectivity()
+
+        connections = max(1, min(int(connections), self.max_pool_size))
+        if connections == 1:
+            return
+
+        def ping():
+            with self.session() as session:
+                session.run("RETURN 1").consume()
+
+        threads = [threading.Thread(target=ping) for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.logger.info(f"🔥 Warmed Neo4j connection pool with {connections} connections")
+
+    @contextmanager
+    def session(self, **kwargs):
+        """Check out a session, waiting at most `acquisition_timeout` for a free slot"""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquisition_timeout):
+            with self._lock:
+                self._timeouts += 1
+            self._timeout_count.inc()
+            raise PoolExhaustedError(
+                f"No Neo4j connection available after {self.acquisition_timeout}s"
+            )
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        self._wait_seconds.observe(waited)
+
+        try:
+            with self.driver.session(**kwargs) as session:
+                yield session
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        """
+        Snapshot of pool usage for sizing workers against the pool. Only what
+        the manager counts itself; the driver's own pool has no public stats.
+        `free_slots` is sessions that can be checked out without waiting, not
+        the driver's count of idle pooled connections (those open lazily).
+        """
+        with self._lock:
+            in_use = self._in_use
+            checkouts = self._checkouts
+            total_wait = self._total_wait
+            max_wait = self._max_wait
+            timeouts = self._timeouts
+
+        return {
+            'max_pool_size': self.max_pool_size,
+            'in_use': in_use,
+            'free_slots': self.max_pool_size - in_use,
+            'checkouts': checkouts,
+            'acquisition_timeouts': timeouts,
+            'avg_wait_ms': round(total_wait / checkouts * 1000, 3) if checkouts else 0.0,
+            'max_wait_ms': round(max_wait * 1000, 3),
+            'closed': self._closed
+        }
+
+    def close(self):
+        """Close the driver. Only call this on process shutdown."""
+        if self._closed:
+            return
+        self._closed = True
+        self.driver.close()
+        self.logger.info("🔌 Neo4j connection pool closed")
@@ -0,0 +1,354 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from services.ann_index import LSHIndex, mips_vectors, top_rows
+from services.metrics import REGISTRY
+from services.versioned_store import VersionedStore
+import json
+import os
+import time
+import numpy as np
+import scipy.sparse as sp
+
+FORMAT_VERSION = 1
+
+def _solve_rows(matrix, fixed, reg, rows, out):
+    """Least-squares update of `out[rows]` against the `fixed` side (explicit ALS)"""
+    eye = np.eye(fixed.shape[1], dtype=np.float64)
+    for row in rows:
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == end:
+            out[row] = 0.0
+            continue
+        y = fixed[matrix.indices[start:end]]
+        a = y.T @ y + reg * (end - start) * eye
+        b = y.T @ matrix.data[start:end]
+        out[row] = np.linalg.solve(a, b)
+
+def train_als(ratings, n_users, n_items, factors=64, reg=0.1, iterations=15, workers=None, seed=0, log=None):
+    """
+    Alternating least squares for explicit ratings.
+
+    Args:
+        ratings: users x items scipy sparse matrix of ratings
+        factors: Latent dimensions
+        reg: L2 regularisation, scaled per row by its rating count (ALS-WR)
+        iterations: Full user + item sweeps
+        workers: Threads solving rows in parallel (numpy releases the GIL
+            inside BLAS/LAPACK); defaults to the CPU count
+        log: Optional callable(iteration, rmse) after every sweep
+
+    Returns:
+        (user_factors, item_factors, global_mean), factors as float32
+    """
+    by_user = sp.csr_matrix(ratings, shape=(n_users, n_items), dtype=np.float64)
+    mean = float(by_user.data.mean()) if by_user.nnz else 0.0
+    by_user.data = by_user.data - mean
+    by_item = by_user.T.tocsr()
+
+    rng = np.random.default_rng(seed)
+    users = rng.normal(0, 0.1, (n_users, factors))
+    items = rng.normal(0, 0.1, (n_items, factors))
+
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='als') as pool:
+        def sweep(matrix, fixed, out):
+            chunks = np.array_split(np.arange(matrix.shape[0]), workers * 4)
+            list(pool.map(lambda rows: _solve_rows(matrix, fixed, reg, rows, out), chunks))
+
+        for iteration in range(1, iterations + 1):
+            sweep(by_user, items, users)
+            sweep(by_item, users, items)
+            if log:
+                coo = by_user.tocoo()
+                predicted = np.einsum('ij,ij->i', users[coo.row], items[coo.col])
+                log(iteration, float(np.sqrt(np.mean((predicted - coo.data) ** 2))))
+
+    return users.astype(np.float32), items.astype(np.float32), mean
+
+class FactorModel:
+    """
+    One trained version, served from memory-mapped .npy files so every
+    worker process shares the same pages instead of its own copy
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported factor format {self.meta.get('format')} in {path}")
+        self.version = self.meta['version']
+        self.mean = float(self.meta['mean'])
+
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode='r')
+        self.user_factors = load('user_factors.npy')
+        self.item_factors = load('item_factors.npy')
+        self.rated_indptr = load('rated_indptr.npy')
+        self.rated_indices = load('rated_indices.npy')
+
+        with open(os.path.join(path, 'user_ids.json')) as f:
+            self.user_index = {user_id: row for row, user_id in enumerate(json.load(f))}
+        with open(os.path.join(path, 'movie_ids.json')) as f:
+            self.movie_ids = json.load(f)
+        self.movie_index = {movie_id: col for col, movie_id in enumerate(self.movie_ids)}
+        # Saved for large catalogs only; see FactorStore.save
+        self.ann = LSHIndex.load(os.path.join(path, 'ann')) if os.path.isdir(os.path.join(path, 'ann')) else None
+
+        # Users re-solved since training: user_id -> (factors, rated movie cols).
+        # The mapped files are read-only and shared, so these live per process.
+        self._folded = {}
+
+    def has_user(self, user_id):
+        return user_id in self._folded or user_id in self.user_index
+
+    def rated_movies(self, user_id):
+        if user_id in self._folded:
+            return self._folded[user_id][1]
+        row = self.user_index[user_id]
+        return self.rated_indices[self.rated_indptr[row]:self.rated_indptr[row + 1]]
+
+    def fold_in(self, user_id, ratings):
+        """
+        Re-solve one user's factors against the fixed movie factors, from all
+        of their current ratings ({movie_id: rating}). This is the same least
+        squares step as a training sweep, for a single row.
+
+        Returns:
+            The new factor vector, or None when none of the rated movies are
+            in the model
+        """
+        known = [(self.movie_index[movie_id], rating) for movie_id, rating in ratings.items()
+                 if movie_id in self.movie_index]
+        if not known:
+            self._folded.pop(user_id, None)
+            return None
+
+        cols = np.array([col for col, _ in known], dtype=np.int32)
+        values = np.array([rating for _, rating in known], dtype=np.float64) - self.mean
+        y = np.asarray(self.item_factors[cols], dtype=np.float64)
+        reg = float(self.meta.get('regularization', 0.1))
+        a = y.T @ y + reg * len(cols) * np.eye(y.shape[1])
+        vector = np.linalg.solve(a, y.T @ values).astype(np.float32)
+
+        self._folded[user_id] = (vector, cols)
+        return vector
+
+    def recommend(self, user_id, limit=10, exclude=(), vector=None):
+        """
+        Top `limit` movies by predicted rating, skipping movies the user rated
+        at training time and the movie ids in `exclude`.
+
+        `vector` overrides the stored user factors (e.g. for users who rated
+        after training).
+
+        Returns:
+            List of {'movie_id', 'score'} dicts, best first
+        """
+        if vector is None:
+            if user_id in self._folded:
+                vector = self._folded[user_id][0]
+            elif user_id in self.user_index:
+                vector = self.user_factors[self.user_index[user_id]]
+            else:
+                return []
+
+        skip = [self.movie_index[movie_id] for movie_id in exclude if movie_id in self.movie_index]
+        if self.has_user(user_id):
+            skip.extend(np.asarray(self.rated_movies(user_id)).tolist())
+
+        cols = None
+        if self.ann is not None:
+            # Inner product search as cosine search over the augmented items
+            cols = self.ann.candidates(np.append(vector, np.float32(0.0)))
+            cols = cols[~np.isin(cols, skip)]
+            if len(cols) >= limit:
+                scores = np.asarray(self.item_factors[cols]) @ vector
+            else:
+                cols = None  # too sparse a neighbourhood; score everything
+        if cols is None:
+            cols = np.arange(len(self.movie_ids))
+            scores = self.item_factors @ vector
+            scores[skip] = -np.inf
+
+        cols, scores = top_rows(cols, scores, limit)
+        return [
+            {'movie_id': self.movie_ids[col], 'score': round(float(np.clip(score + self.mean, 1.0, 5.0)), 4)}
+            for col, score in zip(cols.tolist(), scores.tolist()) if np.isfinite(score)
+        ]
+
+class FactorStore(VersionedStore):
+    """
+    Versioned on-disk factor models (see VersionedStore). Serving workers
+    memory-map the current version.
+
+    Between trainings, `fold_in` updates a rater's factors in this process.
+    The last `max_fold_ins` fold-ins are remembered and replayed onto a newly
+    loaded version when their ratings are newer than its training data.
+    """
+
+    kind = 'factor model'
+
+    def __init__(self, directory, keep_versions=3, reload_seconds=30, max_fold_ins=10000,
+                 ann_min_items=20000, ann_tables=12, metrics=None):
+        super().__init__(directory, keep_versions, reload_seconds)
+        self.max_fold_ins = max_fold_ins
+        self.ann_min_items = ann_min_items
+        self.ann_tables = ann_tables
+        self._fold_ins = OrderedDict()  # user_id -> (when, {movie_id: rating})
+
+        metrics = metrics or REGISTRY
+        self._fold_in_seconds = metrics.histogram(
+            'mf_fold_in_duration_seconds', 'Per-user factor re-solves after a rating', (),
+            buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a store from MF_* settings"""
+        return cls(
+            directory=settings.get('MF_MODEL_DIR', 'factors'),
+            keep_versions=int(settings.get('MF_KEEP_VERSIONS', 3)),
+            reload_seconds=float(settings.get('MF_RELOAD_SECONDS', 30)),
+            max_fold_ins=int(settings.get('MF_MAX_FOLD_INS', 10000)),
+            ann_min_items=int(settings.get('ANN_MIN_ITEMS', 20000)),
+            ann_tables=int(settings.get('ANN_TABLES', 12))
+        )
+
+    def save(self, user_ids, movie_ids, user_factors, item_factors, mean, rated, meta=None):
+        """Write a new version and make it current; returns the version name"""
+        version, path = self.new_version()
+
+        rated = sp.csr_matrix(rated)
+        np.save(os.path.join(path, 'user_factors.npy'), np.ascontiguousarray(user_factors, dtype=np.float32))
+        np.save(os.path.join(path, 'item_factors.npy'), np.ascontiguousarray(item_factors, dtype=np.float32))
+        np.save(os.path.join(path, 'rated_indptr.npy'), rated.indptr.astype(np.int64))
+        np.save(os.path.join(path, 'rated_indices.npy'), rated.indices.astype(np.int32))
+        with open(os.path.join(path, 'user_ids.json'), 'w') as f:
+            json.dump(list(user_ids), f)
+        with open(os.path.join(path, 'movie_ids.json'), 'w') as f:
+            json.dump(list(movie_ids), f)
+        # Below ann_min_items a full scan is already sub-millisecond
+        if len(movie_ids) >= self.ann_min_items:
+            LSHIndex.build(mips_vectors(np.asarray(item_factors, dtype=np.float32)),
+                           n_tables=self.ann_tables).save(os.path.join(path, 'ann'))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                **(meta or {}),
+                'format': FORMAT_VERSION,
+                'version': version,
+                'mean': mean,
+                'factors': int(user_factors.shape[1]),
+                'users': len(user_ids),
+                'movies': len(movie_ids),
+                'ratings': int(rated.nnz),
+                'ann': len(movie_ids) >= self.ann_min_items,
+                'trained_at': datetime.now(timezone.utc).isoformat()
+            }, f, indent=2)
+
+        self.publish(version)
+        self.logger.info(f"💾 Saved factor model {version}")
+        return version
+
+    def _open(self, path):
+        return FactorModel(path)
+
+    def _opened(self, model):
+        self._replay_fold_ins(model)
+
+    def _replay_fold_ins(self, model):
+        as_of = model.meta.get('ratings_as_of')
+        as_of = datetime.fromisoformat(as_of) if as_of else None
+        for user_id, (when, ratings) in list(self._fold_ins.items()):
+            if as_of is None or when >= as_of:
+                model.fold_in(user_id, ratings)
+            else:
+                del self._fold_ins[user_id]  # the new training run already saw these ratings
+
+    def fold_in(self, user_id, ratings):
+        """
+        Update `user_id`'s factors in the current model from their full
+        ratings ({movie_id: rating}); their next recommendations use them
+
+        Returns:
+            Whether a model was updated
+        """
+        model = self.current()
+        if model is None:
+            return False
+
+        started = time.perf_counter()
+        vector = model.fold_in(user_id, ratings)
+        self._fold_in_seconds.observe(time.perf_counter() - started)
+
+        with self._lock:
+            self._fold_ins[user_id] = (datetime.now(timezone.utc), dict(ratings))
+            self._fold_ins.move_to_end(user_id)
+            while len(self._fold_ins) > self.max_fold_ins:
+                self._fold_ins.popitem(last=False)
+        return vector is not None
+
+    def ratings_as_of(self, user_id):
+        """
+        Epoch seconds up to which `user_id`'s factors in the current model
+        reflect their ratings: their latest fold-in here, else training
+        """
+        model = self.current()
+        if model is None:
+            return 0.0
+        with self._lock:
+            entry = self._fold_ins.get(user_id)
+        if entry is not None:
+            return entry[0].timestamp()
+        as_of = model.meta.get('ratings_as_of') or model.meta['trained_at']
+        return datetime.fromisoformat(as_of).timestamp()
+
+    def stats(self):
+        model = self.current()
+        if model is None:
+            return {'ready': False}
+        return {
+            'ready': True,
+            'version': model.version,
+            'users': model.meta['users'],
+            'movies': model.meta['movies'],
+            'factors': model.meta['factors'],
+            'trained_at': model.meta['trained_at'],
+            'rmse': model.meta.get('rmse'),
+            'folded_users': len(self._fold_ins)
+        }
+
+def train_and_save(ratings, store, factors=64, reg=0.1, iterations=15, workers=None, log=None):
+    """
+    Train on `ratings` (iterable of dicts with user_id/movie_id/rating) and
+    save the result as the store's new current version
+    """
+    # Ratings written after this point may be missed; fold-ins newer than it are replayed
+    ratings_as_of = datetime.now(timezone.utc)
+    user_index, movie_index, latest = {}, {}, {}
+    for rating in ratings:
+        row = user_index.setdefault(rating['user_id'], len(user_index))
+        col = movie_index.setdefault(rating['movie_id'], len(movie_index))
+        # The CSR constructor would sum a repeated pair; keep the last rating
+        latest[(row, col)] = float(rating['rating'])
+
+    shape = (len(user_index), len(movie_index))
+    rows, cols = zip(*latest) if latest else ((), ())
+    matrix = sp.csr_matrix((list(latest.values()), (rows, cols)), shape=shape, dtype=np.float32)
+
+    history = []
+    started = time.perf_counter()
+    user_factors, item_factors, mean = train_als(
+        matrix, shape[0], shape[1], factors=factors, reg=reg, iterations=iterations, workers=workers,
+        log=lambda i, rmse: (history.append(rmse), log and log(i, rmse))
+    )
+
+    return store.save(
+        list(user_index), list(movie_index), user_factors, item_factors, mean, matrix,
+        meta={
+            'regularization': reg,
+            'iterations': iterations,
+            'rmse': round(history[-1], 4) if history else None,
+            'train_seconds': round(time.perf_counter() - started, 2),
+            'ratings_as_of': ratings_as_of.isoformat()
+        }
+    )
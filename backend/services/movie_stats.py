@@ -0,0 +1,248 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from services.query_cache import movie_tag
+
+# Applies one batch of deltas unless a MovieStatsBatch marker says it already
+# was: the marker is created in the same transaction, so a batch retried after
+# an ambiguous failure (the commit landed but its reply was lost) is a no-op.
+# Rows arrive sorted by movie id so concurrent flushes from several workers
+# take the movies' write locks in the same order and can't deadlock. The
+# _LOCK_ property takes a movie's lock before its totals are read.
+MOVIE_STATS_DELTA_QUERY = """
+MERGE (b:MovieStatsBatch {id: $batch_id})
+ON CREATE SET b.applied_at = timestamp(), b._new_ = true
+WITH b WHERE b._new_
+REMOVE b._new_
+WITH b
+UNWIND $rows AS row
+MATCH (m:Movie {id: row.movie_id})
+SET m._LOCK_ = true
+WITH m, row,
+     coalesce(m.rating_sum, coalesce(m.avg_rating, 0.0) * coalesce(m.rating_count, 0)) + row.rating_sum as rating_sum,
+     coalesce(m.rating_count, 0) + row.rating_count as rating_count
+SET m.rating_sum = CASE WHEN rating_count > 0 THEN rating_sum ELSE 0.0 END,
+    m.rating_count = CASE WHEN rating_count > 0 THEN rating_count ELSE 0 END,
+    m.avg_rating = CASE WHEN rating_count > 0 THEN rating_sum / rating_count ELSE 0.0 END
+REMOVE m._LOCK_
+"""
+
+MOVIE_STATS_PRUNE_QUERY = """
+MATCH (b:MovieStatsBatch)
+WHERE b.applied_at < $before
+WITH b LIMIT 10000
+DELETE b
+RETURN count(*) as deleted
+"""
+
+class MovieStatsQueue:
+    """
+    Write-behind queue for the movies' rating_sum / rating_count totals, so
+    rating writes don't queue up on a popular movie's node lock.
+
+    Rating routes `record` each change; deltas are summed per movie in memory
+    and a daemon thread applies them every `flush_seconds` in batched UNWIND
+    transactions, one row per movie however many ratings it got meanwhile.
+    Each transaction carries a batch id, and a batch that fails is retried
+    as-is (same id, same rows) on the next flush, so one that did commit
+    despite the error is not applied twice. Batch markers older than
+    `batch_retention_seconds` are deleted. Only the cached reads showing a
+    changed movie are invalidated; a movie whose new average lifts it into
+    a cached list appears there when the list's entry expires.
+
+    `stop` flushes what is left. Whatever Neo4j won't take then is written
+    to `spool_dir` and picked up by the next worker to `start`. A hard crash
+    loses at most one interval of deltas; init_db's recompute_movie_stats
+    rebuilds the totals from the ratings themselves.
+    """
+
+    def __init__(self, neo4j_service, flush_seconds=0.25, batch_size=500, spool_dir=None,
+                 batch_retention_seconds=7 * 24 * 3600):
+        self.neo4j = neo4j_service
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.spool_dir = spool_dir
+        self.batch_retention_seconds = batch_retention_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._pending = {}  # movie_id -> [rating_sum delta, rating_count delta]
+        self._retry = []    # (batch_id, rows) that failed, retried unchanged by the next flush
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushed = 0
+        self.failures = 0
+        self.last_flush_ms = None
+
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+
+    @classmethod
+    def from_settings(cls, neo4j_service, settings):
+        """Build a queue from MOVIE_STATS_* settings"""
+        return cls(
+            neo4j_service,
+            flush_seconds=float(settings.get('MOVIE_STATS_FLUSH_SECONDS', 0.25)),
+            batch_size=int(settings.get('MOVIE_STATS_BATCH_SIZE', 500)),
+            spool_dir=settings.get('MOVIE_STATS_SPOOL_DIR') or None,
+            batch_retention_seconds=float(settings.get('MOVIE_STATS_BATCH_RETENTION_SECONDS', 7 * 24 * 3600))
+        )
+
+    def add(self, movie_id, rating_sum, rating_count):
+        """Queue a change to a movie's totals"""
+        with self._lock:
+            delta = self._pending.setdefault(movie_id, [0.0, 0])
+            delta[0] += rating_sum
+            delta[1] += rating_count
+
+    def record(self, movie_id, rating, old_rating=None):
+        """
+        Queue the effect of one rating write: `old_rating` is the rating it
+        replaced (None for a new one), `rating` None for a delete
+        """
+        self.add(
+            movie_id,
+            (rating or 0.0) - (old_rating or 0.0),
+            (rating is not None) - (old_rating is not None)
+        )
+
+    def pending(self):
+        """Movies with deltas not yet written, counting those in failed batches"""
+        with self._lock:
+            return len(self._pending) + sum(len(rows) for _, rows in self._retry)
+
+    def flush(self):
+        """Apply the queued deltas now; returns how many movies were written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                batches, self._retry = self._retry, []
+            rows = [
+                {'movie_id': movie_id, 'rating_sum': delta[0], 'rating_count': delta[1]}
+                for movie_id, delta in sorted(pending.items())
+                if delta[0] or delta[1]
+            ]
+            for offset in range(0, len(rows), self.batch_size):
+                batches.append((uuid.uuid4().hex, rows[offset:offset + self.batch_size]))
+            if not batches:
+                return 0
+
+            started = time.perf_counter()
+            written = 0
+            for position, (batch_id, batch) in enumerate(batches):
+                try:
+                    self.neo4j.execute_write(
+                        MOVIE_STATS_DELTA_QUERY, {'batch_id': batch_id, 'rows': batch}, name='movie_stats_flush',
+                        touches=tuple(movie_tag(row['movie_id']) for row in batch)
+                    )
+                except Exception as e:
+                    failed = batches[position:]
+                    with self._lock:
+                        self._retry = failed + self._retry
+                    self.failures += 1
+                    self.logger.warning(
+                        f"⚠️ Movie stats flush failed, {sum(len(rows) for _, rows in failed)} movies kept for retry: {e}"
+                    )
+                    break
+                written += len(batch)
+            self.flushed += written
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+            return written
+
+    def prune(self):
+        """Delete batch markers older than `batch_retention_seconds`; returns how many went"""
+        before = int((time.time() - self.batch_retention_seconds) * 1000)
+        deleted = 0
+        while True:
+            result = self.neo4j.execute_write(
+                MOVIE_STATS_PRUNE_QUERY, {'before': before}, name='movie_stats_prune', touches=('MovieStatsBatch',)
+            )
+            count = result[0]['deleted'] if result else 0
+            deleted += count
+            if count < 10000:
+                break
+        self._pruned_at = time.time()
+        return deleted
+
+    def start(self):
+        """Pick up spooled deltas and flush every `flush_seconds` on a daemon thread"""
+        self._load_spool()
+
+        def loop():
+            while not self._stop.wait(self.flush_seconds):
+                try:
+                    self.flush()
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Movie stats flush failed: {e}")
+                if time.time() - self._pruned_at > 3600:
+                    try:
+                        self.prune()
+                    except Exception as e:
+                        self._pruned_at = time.time()
+                        self.logger.warning(f"⚠️ Movie stats batch prune failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name='movie-stats', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker and flush; deltas that can't be written are spooled"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(5.0, self.flush_seconds * 4))
+        self.flush()
+        if self.pending():
+            self._save_spool()
+
+    def _save_spool(self):
+        if not self.spool_dir:
+            self.logger.error(f"❌ Lost rating totals for {self.pending()} movies: no MOVIE_STATS_SPOOL_DIR")
+            return
+        with self._lock:
+            count = len(self._pending) + sum(len(rows) for _, rows in self._retry)
+            pending, self._pending = self._pending, {}
+            batches, self._retry = self._retry, []
+        path = os.path.join(self.spool_dir, f"pending-{os.getpid()}-{int(time.time())}.json")
+        try:
+            with open(path + '.tmp', 'w') as handle:
+                # Failed batches keep their ids: they may have been applied already
+                json.dump({'pending': pending, 'batches': batches}, handle)
+            os.replace(path + '.tmp', path)
+            self.logger.warning(f"⚠️ Spooled rating totals for {count} movies to {path}")
+        except OSError as e:
+            self.logger.error(f"❌ Could not spool rating totals for {count} movies: {e}")
+
+    def _load_spool(self):
+        if not self.spool_dir:
+            return
+        for path in glob.glob(os.path.join(self.spool_dir, 'pending-*.json')):
+            # Renaming claims the file, so only one of several starting workers applies it
+            claimed = f"{path}.{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+                with open(claimed) as handle:
+                    spooled = json.load(handle)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"⚠️ Could not read spooled rating totals {path}: {e}")
+                continue
+            pending, batches = spooled['pending'], [tuple(batch) for batch in spooled['batches']]
+            for movie_id, (rating_sum, rating_count) in pending.items():
+                self.add(movie_id, rating_sum, rating_count)
+            with self._lock:
+                self._retry.extend(batches)
+            os.remove(claimed)
+            count = len(pending) + sum(len(rows) for _, rows in batches)
+            self.logger.info(f"📥 Requeued spooled rating totals for {count} movies from {path}")
+
+    def stats(self):
+        return {
+            'pending_movies': self.pending(),
+            'flushed_movies': self.flushed,
+            'failed_flushes': self.failures,
+            'last_flush_ms': self.last_flush_ms
+        }
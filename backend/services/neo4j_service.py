@@ -1,33 +1,117 @@
-from neo4j import GraphDatabase
+from neo4j import READ_ACCESS, WRITE_ACCESS, Query, unit_of_work
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from services.connection_manager import Neo4jConnectionManager
+from services.metrics import REGISTRY
+from services.slow_query_log import SlowQueryLog
+from services.query_cache import QueryCache, cache_key, query_tags, movie_tag
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+from services.batch_loader import BatchLoader, SingleFlight
+from config import Config
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import hashlib
+import threading
+import time
 import os
 import logging
 
 # Set up logging to help us debug
 logging.basicConfig(level=logging.INFO)
 
+# Key whose bookmarks the current request reads from / writes to
+_causal_key = ContextVar('neo4j_causal_key', default=None)
+
+def query_name(query, name=None):
+    """Stable metric name for a query: `name` if given, else a hash of its normalized text"""
+    if name:
+        return name
+    normalized = ' '.join(query.split())
+    return 'q_' + hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
 class Neo4jService:
     """
     This class handles all connections to our Neo4j database.
     Think of it as a bridge between our Flask app and the database.
     """
     
-    def __init__(self):
+    def __init__(self, settings=None, connection_manager=None, metrics=None):
         # Get database connection details from environment variables
         # self.uri = os.getenv('NEO4J_URI', 'neo4j://127.0.0.1:7687')
         self.uri = os.getenv('NEO4J_URI', 'neo4j+s://f5825c3a.databases.neo4j.io')
         self.user = os.getenv('NEO4J_USER', 'neo4j')
         self.password = os.getenv('NEO4J_PASSWORD', 'HezdX4vsf6zwmU6nwzyu0RW5jRGBQe7XsurMmDoFBBY')
         
+        if settings is None:
+            settings = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+        
+        # Per-call defaults for managed transactions
+        self.query_timeout = float(settings.get('NEO4J_QUERY_TIMEOUT', 0)) or None
+        
+        # Last bookmarks per causal key, so a user reads their own writes
+        self.max_bookmark_keys = int(settings.get('NEO4J_MAX_BOOKMARK_KEYS', 10000))
+        self._bookmarks = OrderedDict()
+        self._bookmarks_lock = threading.Lock()
+        
+        # Records pulled per round trip when streaming large reads
+        self.fetch_size = int(settings.get('NEO4J_FETCH_SIZE', 1000))
+        
+        # Chunking for UNWIND batch writes
+        self.batch_size = int(settings.get('NEO4J_BATCH_SIZE', 1000))
+        self.batch_max_retries = int(settings.get('NEO4J_BATCH_MAX_RETRIES', 3))
+        
+        # Per-query metrics, keyed by query_name()
+        self.metrics = metrics or REGISTRY
+        self._query_seconds = self.metrics.histogram(
+            'neo4j_query_duration_seconds', 'Client-side query latency', ('query', 'mode'))
+        self._query_available_after = self.metrics.histogram(
+            'neo4j_query_result_available_after_seconds', 'Server time until the first record was available', ('query',))
+        self._query_consumed_after = self.metrics.histogram(
+            'neo4j_query_result_consumed_after_seconds', 'Server time to stream all records', ('query',))
+        self._query_rows = self.metrics.counter(
+            'neo4j_query_rows_total', 'Records returned', ('query',))
+        self._query_errors = self.metrics.counter(
+            'neo4j_query_errors_total', 'Failed queries', ('query', 'mode'))
+        
+        # Opt-in result cache for hot catalog reads, invalidated by writes
+        self.query_cache = QueryCache.from_settings(settings)
+        self._cache_lookups = self.metrics.counter(
+            'neo4j_query_cache_requests_total', 'Query cache lookups', ('query', 'result'))
+        self.metrics.gauge(
+            'neo4j_query_cache_bytes', 'Approximate size of cached results',
+            callback=lambda: self.query_cache.stats()['bytes']
+        )
+        
+        # Coalescing of concurrent point lookups and identical cache misses
+        self.loader_window_ms = float(settings.get('NEO4J_LOADER_WINDOW_MS', 2))
+        self.loader_max_batch = int(settings.get('NEO4J_LOADER_MAX_BATCH', 100))
+        self._loaders = {}
+        self._loaders_lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        
+        # Fail fast instead of blocking workers while the database is down or stalling
+        self.breaker = CircuitBreaker.from_settings(settings)
+        self.metrics.gauge(
+            'neo4j_circuit_state', 'Circuit breaker state (0 closed, 1 half-open, 2 open)',
+            callback=lambda: {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[self.breaker.state]
+        )
+        
+        # Queries over SLOW_QUERY_MS, with a sampled PROFILE/EXPLAIN plan
+        self.slow_queries = SlowQueryLog.from_settings(settings, capture=self._capture_plan)
+        
         try:
-            # Create connection to Neo4j
-            self.driver = GraphDatabase.driver(
-                self.uri,
-                auth=(self.user, self.password)
+            # The connection manager owns the driver and its pool
+            self.connections = connection_manager or Neo4jConnectionManager.from_settings(
+                self.uri, self.user, self.password, settings
+            )
+            self.driver = self.connections.driver
+            self.metrics.gauge(
+                'neo4j_pool_session_slots', 'Session slots of the connection pool by state', ('state',),
+                callback=self._pool_gauge
             )
             
-            # Test the connection
-            with self.driver.session() as session:
-                session.run("RETURN 1")
+            # Test the connection and open the first pooled connections
+            self.connections.warm(settings.get('NEO4J_POOL_WARMUP', 1))
             logging.info("✅ Successfully connected to Neo4j database!")
             
         except Exception as e:
@@ -36,49 +120,344 @@ class Neo4jService:
             raise
 
     def close(self):
-        """Close the database connection"""
+        """Close the database connection (process shutdown only)"""
+        self.slow_queries.close()
         if self.driver:
-            self.driver.close()
+            self.connections.close()
+
+    def pool_stats(self):
+        """Connection pool usage (sessions in use, free session slots, wait time)"""
+        return self.connections.stats()
+
+    def _pool_gauge(self):
+        stats = self.pool_stats()
+        return [({'state': 'in_use'}, stats['in_use']), ({'state': 'free'}, stats['free_slots'])]
+
+    def _record_query(self, name, mode, elapsed, rows, summary=None):
+        self._query_seconds.observe(elapsed, query=name, mode=mode)
+        self._query_rows.inc(rows, query=name)
+        if summary is not None:
+            if summary.result_available_after is not None:
+                self._query_available_after.observe(summary.result_available_after / 1000.0, query=name)
+            if summary.result_consumed_after is not None:
+                self._query_consumed_after.observe(summary.result_consumed_after / 1000.0, query=name)
+
+    def batch_loader(self, name, query):
+        """
+        Shared BatchLoader for `query` (which takes `$ids` and returns a `key`
+        column), created on first use
+        """
+        with self._loaders_lock:
+            loader = self._loaders.get(name)
+            if loader is None:
+                loader = self._loaders[name] = BatchLoader(
+                    self, name, query,
+                    window_ms=self.loader_window_ms, max_batch=self.loader_max_batch
+                )
+            return loader
+
+    def _capture_plan(self, query, parameters, profile):
+        """
+        Plan for a slow query, for the slow-query log. PROFILE executes the
+        query again, so it is only used for reads; EXPLAIN only plans it.
+        """
+        prefix = 'PROFILE' if profile else 'EXPLAIN'
+        access_mode = READ_ACCESS if profile else WRITE_ACCESS
+        with self.connections.session(default_access_mode=access_mode) as session:
+            result = session.run(Query(f"{prefix} {query}", timeout=self.query_timeout), parameters or {})
+            summary = result.consume()
+        return summary.profile or summary.plan
+
+    @contextmanager
+    def causal_chain(self, key):
+        """
+        Chain bookmarks for `key` (usually a user id) so reads made inside
+        this block see every write previously made under the same key.
+        """
+        token = _causal_key.set(key)
+        try:
+            yield
+        finally:
+            _causal_key.reset(token)
+
+    def get_bookmarks(self, key):
+        """Bookmarks of the last write made under causal key `key` (None if none)"""
+        if key is None:
+            return None
+        with self._bookmarks_lock:
+            bookmarks = self._bookmarks.get(key)
+            if bookmarks is not None:
+                self._bookmarks.move_to_end(key)
+            return bookmarks
+
+    def store_bookmarks(self, key, bookmarks):
+        with self._bookmarks_lock:
+            self._bookmarks[key] = bookmarks
+            self._bookmarks.move_to_end(key)
+            while len(self._bookmarks) > self.max_bookmark_keys:
+                self._bookmarks.popitem(last=False)
+
+    def _execute_managed(self, access_mode, query, parameters=None, timeout=None, metadata=None, name=None,
+                         touches=None):
+        """
+        Run `query` inside a managed transaction function. The driver retries
+        transient failures with exponential backoff (up to
+        NEO4J_MAX_TX_RETRY_TIME) and READ work is routed to secondaries.
+        Writes invalidate cached reads of the labels/types they touch.
+        """
+        if timeout is None:
+            timeout = self.query_timeout
+        name = query_name(query, name)
+        mode = 'read' if access_mode == READ_ACCESS else 'write'
+
+        def work(tx):
+            result = tx.run(query, parameters or {})
+            records = [record.data() for record in result]
+            return records, result.consume()
+
+        work = unit_of_work(timeout=timeout or None, metadata=metadata)(work)
+        key = _causal_key.get()
+        self.breaker.before_call()
+        started = time.perf_counter()
+
+        try:
+            with self.connections.session(bookmarks=self.get_bookmarks(key)) as session:
+                if access_mode == READ_ACCESS:
+                    records, summary = session.execute_read(work)
+                else:
+                    records, summary = session.execute_write(work)
+                    if key is not None:
+                        self.store_bookmarks(key, session.last_bookmarks())
+        except Exception as e:
+            self._query_errors.inc(query=name, mode=mode)
+            self.breaker.record_failure(e)
+            raise
+        finally:
+            # A failed write may still have committed before the error reached us
+            if access_mode == WRITE_ACCESS:
+                self.query_cache.invalidate(query_tags(query) if touches is None else touches)
+
+        elapsed = time.perf_counter() - started
+        self.breaker.record_success(elapsed)
+        self._record_query(name, mode, elapsed, len(records), summary)
+        self.slow_queries.observe(name, mode, query, parameters, elapsed, user=key)
+        return records
 
-    def execute_query(self, query, parameters=None):
+    def execute_read(self, query, parameters=None, timeout=None, metadata=None, name=None,
+                     cache=False, cache_tags=None):
         """
-        Execute a read query (like finding movies or users)
+        Execute a read query in a managed READ transaction
         
         Args:
             query: The Cypher query to execute
             parameters: Dictionary of parameters for the query
+            timeout: Transaction timeout in seconds (defaults to NEO4J_QUERY_TIMEOUT, 0 = no limit)
+            metadata: Transaction metadata, visible in SHOW TRANSACTIONS / query.log
+            name: Stable name for metrics (defaults to a hash of the query text)
+            cache: Serve repeated calls from the query cache (catalog reads only;
+                cached results skip read-your-writes bookmarks)
+            cache_tags: Labels/relationship types the query reads (defaults to
+                those in its patterns). Rows of a Movie query with an `id`
+                also tag the entry with that movie (see query_cache.movie_tag)
         
         Returns:
             List of results from the query
         """
+        if cache and self.query_cache.enabled:
+            key = cache_key(query, parameters)
+            records = self.query_cache.get(key)
+            self._cache_lookups.inc(query=query_name(query, name), result='miss' if records is None else 'hit')
+            if records is not None:
+                return records
+        
         try:
-            with self.driver.session() as session:
-                result = session.run(query, parameters or {})
-                return [record.data() for record in result]
+            if cache and self.query_cache.enabled:
+                # Concurrent misses for the same key share one query
+                records = self._single_flight.do(key, lambda: self._execute_managed(
+                    READ_ACCESS, query, parameters, timeout, metadata, name
+                ))
+                records = [dict(record) for record in records]
+            else:
+                records = self._execute_managed(READ_ACCESS, query, parameters, timeout, metadata, name)
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logging.error(f"❌ Query execution failed: {e}")
             logging.error(f"Query: {query}")
             logging.error(f"Parameters: {parameters}")
             raise
+        
+        if cache and self.query_cache.enabled:
+            tags = frozenset(cache_tags) if cache_tags else query_tags(query)
+            if 'Movie' in tags:
+                tags |= {movie_tag(record['id']) for record in records if record.get('id') is not None}
+            self.query_cache.put(key, records, tags)
+        return records
 
-    def execute_write_query(self, query, parameters=None):
+    def execute_write(self, query, parameters=None, timeout=None, metadata=None, name=None, touches=None):
         """
-        Execute a write query (like creating or updating data)
+        Execute a write query in a managed WRITE transaction
         
         Args:
             query: The Cypher query to execute
             parameters: Dictionary of parameters for the query
+            timeout: Transaction timeout in seconds (defaults to NEO4J_QUERY_TIMEOUT, 0 = no limit)
+            metadata: Transaction metadata, visible in SHOW TRANSACTIONS / query.log
+            name: Stable name for metrics (defaults to a hash of the query text)
+            touches: Labels/relationship types whose data the write changes; cached
+                reads tagged with any of them are dropped (defaults to every
+                label/type in the query's patterns)
         
         Returns:
             List of results from the query
         """
         try:
-            with self.driver.session() as session:
-                with session.begin_transaction() as tx:
-                    result = tx.run(query, parameters or {})
-                    return [record.data() for record in result]
+            return self._execute_managed(WRITE_ACCESS, query, parameters, timeout, metadata, name, touches)
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logging.error(f"❌ Write query execution failed: {e}")
             logging.error(f"Query: {query}")
             logging.error(f"Parameters: {parameters}")
-            raise
\ No newline at end of file
+            raise
+
+    def stream_query(self, query, parameters=None, fetch_size=None, timeout=None, name=None):
+        """
+        Lazily yield the records of a read query, `fetch_size` records per
+        round trip, so memory stays flat no matter how many rows match.
+        The session (and its pool slot) is held until the generator is
+        exhausted or closed.
+        
+        Args:
+            query: The Cypher query to execute
+            parameters: Dictionary of parameters for the query
+            fetch_size: Records fetched per batch (defaults to NEO4J_FETCH_SIZE)
+            timeout: Transaction timeout in seconds (defaults to NEO4J_QUERY_TIMEOUT, 0 = no limit)
+            name: Stable name for metrics (defaults to a hash of the query text)
+        
+        Returns:
+            Generator yielding one dictionary per record
+        """
+        if timeout is None:
+            timeout = self.query_timeout
+        
+        # Resolve bookmarks now: the records are usually consumed after the
+        # view (and its causal_chain block) has already returned
+        session_kwargs = {
+            'default_access_mode': READ_ACCESS,
+            'fetch_size': fetch_size or self.fetch_size,
+            'bookmarks': self.get_bookmarks(_causal_key.get())
+        }
+        
+        name = query_name(query, name)
+        
+        def records():
+            self.breaker.before_call()
+            started = time.perf_counter()
+            rows = 0
+            first_batch = None
+            try:
+                with self.connections.session(**session_kwargs) as session:
+                    result = session.run(Query(query, timeout=timeout or None), parameters or {})
+                    # Judge the database by time to first batch; long exports are expected
+                    first_batch = time.perf_counter() - started
+                    self.breaker.record_success(first_batch)
+                    for record in result:
+                        rows += 1
+                        yield record.data()
+                    summary = result.consume()
+                self._record_query(name, 'stream', time.perf_counter() - started, rows, summary)
+            except Exception as e:
+                self._query_errors.inc(query=name, mode='stream')
+                if first_batch is None:
+                    self.breaker.record_failure(e)
+                logging.error(f"❌ Streaming query failed: {e}")
+                logging.error(f"Query: {query}")
+                logging.error(f"Parameters: {parameters}")
+                raise
+        
+        return records()
+
+    def execute_query(self, query, parameters=None, **kwargs):
+        """Execute a read query (like finding movies or users)"""
+        return self.execute_read(query, parameters, **kwargs)
+
+    def execute_write_query(self, query, parameters=None, **kwargs):
+        """Execute a write query (like creating or updating data)"""
+        return self.execute_write(query, parameters, **kwargs)
+
+    def execute_write_batch(self, query, rows, batch_size=None, timeout=None, progress=None, name=None,
+                            touches=None, on_batch=None):
+        """
+        Write many rows with a handful of round trips. `query` receives each
+        chunk as `$rows`, so it should start with `UNWIND $rows AS row`.
+        
+        Each chunk runs in its own managed write transaction. A chunk that
+        still fails with a transient error after the driver's own retries is
+        retried on its own up to NEO4J_BATCH_MAX_RETRIES times before the
+        batch gives up; any other error (e.g. a constraint violation, or the
+        circuit being open) can't succeed on retry and is raised at once.
+        
+        Args:
+            query: The Cypher query to execute per chunk
+            rows: List of dictionaries, one per row
+            batch_size: Rows per chunk (defaults to NEO4J_BATCH_SIZE)
+            timeout: Transaction timeout in seconds for each chunk
+            progress: Optional callable(done_rows, total_rows, batch_stats)
+            name: Stable name for metrics (defaults to a hash of the query text)
+            touches: Labels/relationship types the write changes (see execute_write)
+            on_batch: Optional callable(results) run as each chunk commits; earlier
+                chunks stay committed when a later one fails, so callers that
+                act on the written rows should do it here
+        
+        Returns:
+            Dictionary with row/batch counts, per-batch timings and results
+        """
+        rows = list(rows)
+        batch_size = batch_size or self.batch_size
+        total = len(rows)
+        summary = {'rows': total, 'batches': [], 'results': [], 'elapsed_ms': 0.0}
+        started = time.perf_counter()
+
+        for offset in range(0, total, batch_size):
+            chunk = rows[offset:offset + batch_size]
+            attempt = 0
+            while True:
+                attempt += 1
+                batch_started = time.perf_counter()
+                try:
+                    results = self._execute_managed(
+                        WRITE_ACCESS, query, {'rows': chunk}, timeout, name=name, touches=touches
+                    )
+                    break
+                except Exception as e:
+                    transient = isinstance(e, (TransientError, ServiceUnavailable, SessionExpired))
+                    if not transient or attempt > self.batch_max_retries:
+                        logging.error(f"❌ Batch write failed at rows {offset}-{offset + len(chunk)}: {e}")
+                        logging.error(f"Query: {query}")
+                        raise
+                    logging.warning(
+                        f"⚠️ Batch at rows {offset}-{offset + len(chunk)} failed "
+                        f"(attempt {attempt}), retrying: {e}"
+                    )
+                    time.sleep(min(0.2 * 2 ** (attempt - 1), 5.0))
+
+            batch_stats = {
+                'offset': offset,
+                'rows': len(chunk),
+                'attempts': attempt,
+                'elapsed_ms': round((time.perf_counter() - batch_started) * 1000, 3)
+            }
+            summary['batches'].append(batch_stats)
+            summary['results'].extend(results)
+            if on_batch:
+                on_batch(results)
+
+            done = offset + len(chunk)
+            if progress:
+                progress(done, total, batch_stats)
+            else:
+                logging.info(f"📦 Batch write {done}/{total} rows ({batch_stats['elapsed_ms']} ms)")
+
+        summary['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return summary
\ No newline at end of file
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+import threading
+
+class OnboardingRecommender:
+    """
+    Recommendations for visitors with no ratings, from a few picked genres
+    and optionally a few liked movies, answered entirely from memory.
+
+    Candidates are the precomputed ranking for the genre selection (see
+    PopularityRanking.for_genres) plus the similarity index neighbours of
+    the liked movies. With liked movies, a candidate's score blends its
+    popularity (scaled by the share of picked genres it has) with its best
+    neighbour score and its text similarity to the liked movies' centroid.
+    Answers are memoised per request in an LRU that is emptied whenever the
+    ranking is refreshed.
+    """
+
+    def __init__(self, popularity, engine, like_weight=0.5, max_liked=10, max_entries=10000):
+        self.popularity = popularity
+        self.engine = engine
+        self.like_weight = like_weight
+        self.max_liked = max_liked
+        self.max_entries = max_entries
+        self._answers = OrderedDict()
+        self._computed_at = None  # when the ranking behind the memoised answers was computed
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, popularity, engine, settings):
+        """Build a recommender from ONBOARDING_* settings"""
+        return cls(
+            popularity, engine,
+            like_weight=float(settings.get('ONBOARDING_LIKE_WEIGHT', 0.5)),
+            max_liked=int(settings.get('ONBOARDING_MAX_LIKED', 10)),
+            max_entries=int(settings.get('ONBOARDING_CACHE_ENTRIES', 10000))
+        )
+
+    def recommend(self, genres=(), movie_ids=(), limit=20):
+        """Ranked movie dicts for the picks; liked movies themselves are left out"""
+        key = (tuple(sorted({genre.lower() for genre in genres})), tuple(sorted(set(movie_ids))[:self.max_liked]), limit)
+        ranked = self.popularity.for_genres(key[0])
+        with self._lock:
+            if self._computed_at != self.popularity.computed_at:
+                self._answers.clear()
+                self._computed_at = self.popularity.computed_at
+            answer = self._answers.get(key)
+            if answer is not None:
+                self._answers.move_to_end(key)
+                return [dict(movie) for movie in answer]
+
+        answer = self._score(ranked, key[0], key[1], limit)
+        with self._lock:
+            self._answers[key] = answer
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+        return [dict(movie) for movie in answer]
+
+    def _score(self, ranked, genres, liked, limit):
+        if not liked:
+            return ranked[:limit]
+
+        # Neighbours of the liked movies join the genre ranking as candidates
+        neighbor_scores = {}
+        for movie_id in liked:
+            for item in self.engine.similar_movie_scores(movie_id) or []:
+                neighbor_scores[item['movie_id']] = max(neighbor_scores.get(item['movie_id'], 0.0), item['score'])
+        candidates = {movie['id']: movie for movie in ranked}
+        for movie_id in neighbor_scores:
+            if movie_id not in candidates:
+                movie = self.popularity.movie(movie_id)
+                if movie is not None:
+                    candidates[movie_id] = movie
+        for movie_id in liked:
+            candidates.pop(movie_id, None)
+        candidates = list(candidates.values())
+
+        text_scores = [0.0] * len(candidates)
+        vectors = self.engine.text_vectors.current() if self.engine.text_vectors is not None else None
+        if vectors is not None:
+            centroid = vectors.centroid({movie_id: 1.0 for movie_id in liked})
+            text_scores = vectors.scores(centroid, [movie['id'] for movie in candidates])
+
+        best = max((movie['popularity_score'] for movie in candidates), default=0.0) or 1.0
+        picked = set(genres)
+        scored = []
+        for movie, text in zip(candidates, text_scores):
+            like = max(neighbor_scores.get(movie['id'], 0.0), text)
+            match = len(picked.intersection(g.lower() for g in movie['genres'])) / len(picked) if picked else 1.0
+            score = (1 - self.like_weight) * match * movie['popularity_score'] / best + self.like_weight * like
+            scored.append({**movie, 'recommendation_score': round(score, 4), 'similarity_score': round(like, 4)})
+        scored.sort(key=lambda movie: movie['recommendation_score'], reverse=True)
+        return scored[:limit]
+
+    def stats(self):
+        return {'cached_answers': len(self._answers)}
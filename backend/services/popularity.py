@@ -0,0 +1,162 @@
+from collections import OrderedDict
+from itertools import combinations
+import logging
+import threading
+import time
+
+POPULARITY_QUERY = """
+MATCH (m:Movie)
+WITH m, coalesce(m.rating_count, 0) as ratings,
+     coalesce(m.imdb_rating / 2.0, m.avg_rating, 0.0) as prior
+OPTIONAL MATCH (m)-[:HAS_GENRE]->(g:Genre)
+RETURN m.id as id, m.title as title,
+       CASE WHEN m.year IS NOT NULL THEN m.year ELSE 0 END as year,
+       m.poster_url as poster_url, m.plot as plot, m.avg_rating as avg_rating,
+       ratings as rating_count, coalesce(m.votes_count, 0) as votes_count,
+       CASE WHEN ratings > 0
+            THEN (ratings * m.avg_rating + $priorVotes * prior) / (ratings + $priorVotes)
+            ELSE prior END as popularity_score,
+       collect(DISTINCT g.name) as genres
+"""
+
+class PopularityRanking:
+    """
+    The catalog ranked for users with no ratings yet, overall and per genre,
+    recomputed by one query every `refresh_seconds` on a daemon thread.
+
+    A movie's score is a Bayesian average: its users' mean rating shrunk
+    towards its IMDb rating (on the 5 point scale) as if that were
+    `prior_votes` extra ratings, so a handful of 5s can't outrank a classic.
+    Ties go to the movie with more votes. The top `top_n` overall and per
+    genre are kept; reads are a list slice.
+
+    For onboarding, every pair of genres is ranked at refresh time too: most
+    of the picked genres matched first, then popularity. Larger selections
+    are merged from the per-genre lists and memoised until the next refresh.
+    """
+
+    def __init__(self, neo4j_service, top_n=100, prior_votes=10, refresh_seconds=600, max_combinations=4096):
+        self.neo4j = neo4j_service
+        self.top_n = top_n
+        self.prior_votes = prior_votes
+        self.refresh_seconds = refresh_seconds
+        self.max_combinations = max_combinations
+        self.logger = logging.getLogger(__name__)
+        # (overall, {genre lowercased: list}, {sorted genre tuple: list}, {movie_id: movie}), swapped whole
+        self._ranking = None
+        self.computed_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_settings(cls, neo4j_service, settings):
+        """Build a ranking from POPULARITY_* settings"""
+        return cls(
+            neo4j_service,
+            top_n=int(settings.get('POPULARITY_TOP_N', 100)),
+            prior_votes=float(settings.get('POPULARITY_PRIOR_VOTES', 10)),
+            refresh_seconds=float(settings.get('POPULARITY_REFRESH_SECONDS', 600))
+        )
+
+    def refresh(self):
+        """Recompute the rankings from Neo4j"""
+        started = time.perf_counter()
+        movies = self.neo4j.execute_query(
+            POPULARITY_QUERY, {'priorVotes': self.prior_votes}, timeout=0, name='popularity')
+        for movie in movies:
+            movie['popularity_score'] = round(float(movie['popularity_score'] or 0.0), 4)
+            movie['recommendation_score'] = movie['popularity_score']
+        movies.sort(key=lambda movie: (movie['popularity_score'], movie['votes_count'] + movie['rating_count']),
+                    reverse=True)
+
+        by_genre = {}
+        for movie in movies:
+            for genre in movie['genres']:
+                ranked = by_genre.setdefault(genre.lower(), [])
+                if len(ranked) < self.top_n:
+                    ranked.append(movie)
+        combos = OrderedDict(
+            (pair, self._rank_combination(pair, by_genre)) for pair in combinations(sorted(by_genre), 2)
+        )
+        self._ranking = (movies[:self.top_n], by_genre, combos, {movie['id']: movie for movie in movies})
+        self.computed_at = time.time()
+        self.logger.info(f"📈 Ranked {len(movies)} movies by popularity in {time.perf_counter() - started:.2f}s")
+
+    def _rank_combination(self, genres, by_genre):
+        picked = set(genres)
+        candidates = {movie['id']: movie for genre in genres for movie in by_genre.get(genre, [])}
+        return sorted(
+            candidates.values(),
+            key=lambda movie: (len(picked.intersection(g.lower() for g in movie['genres'])),
+                               movie['popularity_score'], movie['votes_count'] + movie['rating_count']),
+            reverse=True
+        )[:self.top_n]
+
+    def start(self):
+        """Compute now and then every `refresh_seconds`, on a daemon thread"""
+        def loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Popularity ranking refresh failed: {e}")
+                if self._stop.wait(self.refresh_seconds):
+                    return
+
+        threading.Thread(target=loop, name='popularity', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def top(self, limit=20, genre=None):
+        """
+        The `limit` most popular movies, optionally of one genre (an unknown
+        genre gives an empty list). Computed here on first use if the
+        background refresh hasn't finished yet.
+        """
+        overall, by_genre, _, _ = self._current()
+        ranked = by_genre.get(genre.lower(), []) if genre else overall
+        return [dict(movie) for movie in ranked[:limit]]
+
+    def for_genres(self, genres):
+        """
+        Ranked movies for a set of picked genres (the overall ranking when
+        none are known); shared lists, so callers must not modify them
+        """
+        overall, by_genre, combos, _ = self._current()
+        key = tuple(sorted({genre.lower() for genre in genres} & by_genre.keys()))
+        if not key:
+            return overall
+        if len(key) == 1:
+            return by_genre[key[0]]
+        ranked = combos.get(key)
+        if ranked is None:
+            ranked = self._rank_combination(key, by_genre)
+            with self._lock:
+                combos[key] = ranked
+                while len(combos) > self.max_combinations:
+                    combos.popitem(last=False)
+        return ranked
+
+    def movie(self, movie_id):
+        """A movie's ranking entry (fields and popularity score), or None"""
+        return self._current()[3].get(movie_id)
+
+    def _current(self):
+        if self._ranking is None:
+            with self._lock:
+                if self._ranking is None:
+                    self.refresh()
+        return self._ranking
+
+    def stats(self):
+        if self._ranking is None:
+            return {'ready': False}
+        overall, by_genre, combos, catalog = self._ranking
+        return {
+            'ready': True,
+            'movies': len(catalog),
+            'genres': len(by_genre),
+            'genre_combinations': len(combos),
+            'age_seconds': round(time.time() - self.computed_at)
+        }
@@ -0,0 +1,252 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from services.metrics import REGISTRY
+from services.versioned_store import VersionedStore
+import fcntl
+import json
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+import numpy as np
+
+RATED_USERS_QUERY = """
+MATCH (u:User)-[:RATED]->(:Movie)
+RETURN DISTINCT u.id as id
+"""
+
+HIT = 'hit'
+MISSING = 'missing'
+STALE = 'stale'
+
+class PrecomputedLists:
+    """
+    One precomputed version: every user's hybrid list as JSON, back to back
+    in a memory-mapped data file, found through an offsets array
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.version = self.meta['version']
+        self.top_n = self.meta['top_n']
+        self.computed_at = datetime.fromisoformat(self.meta['computed_at']).timestamp()
+
+        with open(os.path.join(path, 'user_ids.json')) as f:
+            self.user_index = {user_id: i for i, user_id in enumerate(json.load(f))}
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+
+        with open(os.path.join(path, 'lists.bin'), 'rb') as f:
+            # mmap refuses empty files
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+
+    def get(self, user_id):
+        i = self.user_index.get(user_id)
+        if i is None:
+            return None
+        return json.loads(self.data[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+class PrecomputedRecommendationStore(VersionedStore):
+    """
+    Hybrid top-N lists computed for every user by a batch job (see
+    `precompute_recommendations.py`), so `/for-me` can answer with a
+    dictionary lookup instead of two graph queries.
+
+    A list is served only while it is younger than `max_age_seconds` and the
+    user has not rated anything since it was computed; otherwise the caller
+    computes live. Ratings made in this process are noted by `invalidate`,
+    those made in other workers come in as `get`'s `changed_at`. Lookups are counted by result
+    (hit / missing / stale) for the hit rate.
+    """
+
+    kind = 'precomputed recommendations'
+
+    def __init__(self, directory, keep_versions=2, reload_seconds=30, max_age_seconds=86400,
+                 max_invalidations=100000, metrics=None):
+        super().__init__(directory, keep_versions, reload_seconds)
+        self.max_age_seconds = max_age_seconds
+        self.max_invalidations = max_invalidations
+        self._invalidated = OrderedDict()  # user_id -> time of their latest rating here
+        self._stop = threading.Event()
+
+        metrics = metrics or REGISTRY
+        self._lookups = metrics.counter(
+            'precomputed_recommendations_lookups_total', 'Precomputed list lookups by result', ('result',))
+        metrics.gauge(
+            'precomputed_recommendations_hit_ratio', 'Share of lookups served from precomputed lists',
+            callback=self.hit_ratio
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a store from PRECOMPUTE_* settings"""
+        return cls(
+            directory=settings.get('PRECOMPUTE_DIR', 'precomputed'),
+            keep_versions=int(settings.get('PRECOMPUTE_KEEP_VERSIONS', 2)),
+            reload_seconds=float(settings.get('PRECOMPUTE_RELOAD_SECONDS', 30)),
+            max_age_seconds=float(settings.get('PRECOMPUTE_MAX_AGE_SECONDS', 86400))
+        )
+
+    def _open(self, path):
+        return PrecomputedLists(path)
+
+    def get(self, user_id, limit, changed_at=0.0):
+        """
+        The user's precomputed recommendations, or None when the caller has to
+        compute them live (no list, stale list, or `limit` above what was stored).
+        `changed_at` is when the user's ratings last changed in any worker
+        (epoch seconds, see UserRatingCounter.changed_at).
+        """
+        lists = self.current()
+        if lists is None or limit > lists.top_n:
+            self._lookups.inc(result=MISSING)
+            return None
+        if time.time() - lists.computed_at > self.max_age_seconds \
+                or max(self._invalidated.get(user_id, 0), changed_at) >= lists.computed_at:
+            self._lookups.inc(result=STALE)
+            return None
+
+        recommendations = lists.get(user_id)
+        if recommendations is None:
+            self._lookups.inc(result=MISSING)
+            return None
+        self._lookups.inc(result=HIT)
+        return recommendations[:limit]
+
+    def invalidate(self, user_id):
+        """Stop serving `user_id`'s list after they rate, until the next batch run"""
+        with self._lock:
+            self._invalidated[user_id] = time.time()
+            self._invalidated.move_to_end(user_id)
+            while len(self._invalidated) > self.max_invalidations:
+                self._invalidated.popitem(last=False)
+
+    def hit_ratio(self):
+        hits = self._lookups.value(result=HIT)
+        total = hits + self._lookups.value(result=MISSING) + self._lookups.value(result=STALE)
+        return hits / total if total else 0.0
+
+    def save(self, results, top_n, meta=None):
+        """
+        Write a new version from `results`, an iterable of {user_id: list}
+        chunks, and make it current; returns the version name
+        """
+        computed_at = datetime.now(timezone.utc)
+        version, path = self.new_version()
+        user_ids, offsets = [], [0]
+
+        with open(os.path.join(path, 'lists.bin'), 'wb') as data:
+            for chunk in results:
+                for user_id, recommendations in chunk.items():
+                    data.write(json.dumps(recommendations, separators=(',', ':'), default=str).encode('utf-8'))
+                    user_ids.append(user_id)
+                    offsets.append(data.tell())
+
+        np.save(os.path.join(path, 'offsets.npy'), np.array(offsets, dtype=np.int64))
+        with open(os.path.join(path, 'user_ids.json'), 'w') as f:
+            json.dump(user_ids, f)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                **(meta or {}),
+                'version': version,
+                'top_n': top_n,
+                'users': len(user_ids),
+                'computed_at': computed_at.isoformat(),
+                'seconds': round((datetime.now(timezone.utc) - computed_at).total_seconds(), 2)
+            }, f, indent=2)
+
+        self.publish(version)
+        self.logger.info(f"💾 Saved precomputed recommendations {version} for {len(user_ids)} users")
+        return version
+
+    def start(self, engine, interval_seconds, chunk_size=200, top_n=15):
+        """
+        In-app scheduler: recompute every `interval_seconds` on a daemon thread
+        with the app's own engine. A lock file makes sure only one worker
+        process runs a given round; the others pick up its result.
+        """
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                lists = self.current()
+                if lists is not None and time.time() - lists.computed_at < interval_seconds:
+                    continue
+                with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    try:
+                        # Another worker may have finished a round while we waited
+                        self._checked_at = 0.0
+                        lists = self.current()
+                        if lists is None or time.time() - lists.computed_at >= interval_seconds:
+                            user_ids = [row['id'] for row in engine.neo4j.stream_query(
+                                RATED_USERS_QUERY, timeout=0, name='rated_users')]
+                            self.save(compute_in_process(engine, user_ids, chunk_size, top_n), top_n)
+                    except Exception as e:
+                        self.logger.error(f"❌ Precomputing recommendations failed: {e}")
+                    finally:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+        threading.Thread(target=loop, name='precompute', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        lists = self.current()
+        if lists is None:
+            return {'ready': False, 'hit_ratio': round(self.hit_ratio(), 4)}
+        return {
+            'ready': True,
+            'version': lists.version,
+            'users': lists.meta['users'],
+            'top_n': lists.top_n,
+            'age_seconds': round(time.time() - lists.computed_at),
+            'hit_ratio': round(self.hit_ratio(), 4)
+        }
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def compute_in_process(engine, user_ids, chunk_size, top_n):
+    """Chunks of {user_id: hybrid list}, computed on this thread"""
+    for chunk in chunked(user_ids, chunk_size):
+        yield engine.get_hybrid_recommendations_batch(chunk, top_n)
+
+# Per-process state of pool workers
+_worker = {}
+
+def _init_worker(settings):
+    from services.neo4j_service import Neo4jService
+    from services.rating_counter import UserRatingCounter
+    from services.recommendation_engine import RecommendationEngine
+    # A driver must not cross a fork, so each worker opens its own. The engine
+    # is built like the app's, so batch lists get the same arms and reranking.
+    neo4j = Neo4jService(settings)
+    rating_matrix = _worker.get('rating_matrix')
+    _worker['engine'] = RecommendationEngine.from_settings(
+        neo4j, settings, rating_matrix=rating_matrix,
+        rating_counter=UserRatingCounter.from_settings(neo4j, rating_matrix, settings)
+    )
+
+def _compute_chunk(user_ids, top_n):
+    return _worker['engine'].get_hybrid_recommendations_batch(user_ids, top_n)
+
+def compute_in_pool(settings, user_ids, chunk_size, top_n, workers=None, rating_matrix=None):
+    """
+    Chunks of {user_id: hybrid list}, computed by a pool of `workers`
+    processes. Workers are forked, so a loaded `rating_matrix` is shared
+    with them copy-on-write instead of being rebuilt per process.
+    """
+    _worker['rating_matrix'] = rating_matrix
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context,
+                             initializer=_init_worker, initargs=(settings,)) as pool:
+        futures = [pool.submit(_compute_chunk, chunk, top_n) for chunk in chunked(user_ids, chunk_size)]
+        for future in as_completed(futures):
+            yield future.result()
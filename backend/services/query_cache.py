@@ -0,0 +1,151 @@
+from collections import OrderedDict
+import json
+import re
+import threading
+import time
+
+# `(m:Movie:Film {...})` -> ':Movie:Film', `[r:RATED|REVIEWED*1..2]` -> 'RATED|REVIEWED'
+_NODE_LABELS = re.compile(r'\(\s*\w*\s*((?::\s*`?\w+`?\s*)+)')
+_REL_TYPES = re.compile(r'\[\s*\w*\s*:\s*(`?\w+`?(?:\s*\|\s*:?\s*`?\w+`?)*)')
+
+def query_tags(query):
+    """Labels and relationship types a Cypher query mentions in its patterns"""
+    tags = set()
+    for labels in _NODE_LABELS.findall(query):
+        tags.update(label.strip(' `') for label in labels.split(':') if label.strip(' `'))
+    for types in _REL_TYPES.findall(query):
+        tags.update(t.strip(' :`') for t in types.split('|') if t.strip(' :`'))
+    return frozenset(tags)
+
+# Tag for entries whose query names no label or type: any write may affect them
+ANY = '*'
+
+def movie_tag(movie_id):
+    """Tag of cached rows showing one movie, for writes that change only a few movies"""
+    return f"Movie:{movie_id}"
+
+def cache_key(query, parameters):
+    return ' '.join(query.split()), json.dumps(parameters or {}, sort_keys=True, default=str)
+
+class QueryCache:
+    """
+    LRU cache of read results, bounded by entry count and an approximate
+    memory budget (size of the JSON-encoded records).
+
+    Every entry is tagged with the labels and relationship types it read,
+    and `invalidate(tags)` drops only the entries sharing a tag with a write,
+    so a new RATED edge leaves the Genre list alone. Entries also expire
+    after `ttl` seconds as a backstop for writes made by other processes.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+
+        self._entries = OrderedDict()  # key -> (records, tags, size, expires_at)
+        self._by_tag = {}              # tag -> set of keys
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a cache from QUERY_CACHE_* settings"""
+        return cls(
+            max_entries=int(settings.get('QUERY_CACHE_MAX_ENTRIES', 1000)),
+            max_bytes=int(settings.get('QUERY_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+            ttl=float(settings.get('QUERY_CACHE_TTL', 300))
+        )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key):
+        """Cached records for `key` (a fresh list of copied rows), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] is not None and entry[3] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            records = entry[0]
+        # Callers may decorate the rows they get back
+        return [dict(record) for record in records]
+
+    def put(self, key, records, tags):
+        tags = frozenset(tags) or frozenset([ANY])
+        size = len(json.dumps(records, default=str))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        records = [dict(record) for record in records]
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (records, tags, size, expires_at)
+            self._bytes += size
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        """
+        Drop every entry that read any of `tags`; returns how many were dropped.
+        No tags means the write's footprint is unknown, so everything goes.
+        """
+        with self._lock:
+            if not tags:
+                keys = set(self._entries)
+            else:
+                keys = set(self._by_tag.get(ANY, ()))
+                for tag in tags:
+                    keys.update(self._by_tag.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        records, tags, size, expires_at = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
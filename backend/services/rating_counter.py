@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import threading
+import time
+
+# Both things /for-me needs to know about a user, in one round trip
+USER_RATING_STATE_QUERY = """
+MATCH (u:User {id: $userId})
+OPTIONAL MATCH (u)-[r:RATED]->(:Movie)
+RETURN count(r) as rating_count, u.ratings_changed_at as changed_at
+"""
+
+class UserRatingCounter:
+    """
+    How many movies each user has rated, so `/for-me` can spot new users
+    without a count query per request, and when their ratings last changed.
+
+    One query reads both the count and the u.ratings_changed_at the rating
+    routes write, cached per user in an LRU of `max_entries`. `changed_at`
+    lets per-process state (cached responses, precomputed lists, folded-in
+    factors) tell it is stale after a rating in any worker; it is re-read
+    after `changed_ttl_seconds`, so another worker's rating may go unnoticed
+    for that long, and the same query refreshes the count. `count` on its
+    own trusts a cached row for `ttl_seconds`, then falls back to the
+    in-memory rating matrix when it is loaded (which lags other workers by
+    up to RATING_MATRIX_SYNC_SECONDS), else queries. This process's own
+    rating writes update the cache at once through `record`.
+    """
+
+    def __init__(self, neo4j_service, rating_matrix=None, max_entries=100000, ttl_seconds=60,
+                 changed_ttl_seconds=1.0):
+        self.neo4j = neo4j_service
+        self.rating_matrix = rating_matrix
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.changed_ttl_seconds = changed_ttl_seconds
+        # user_id -> [count or None if unknown, epoch seconds changed, monotonic time read]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @classmethod
+    def from_settings(cls, neo4j_service, rating_matrix, settings):
+        """Build a counter from RATING_COUNTER_* settings"""
+        return cls(
+            neo4j_service, rating_matrix,
+            max_entries=int(settings.get('RATING_COUNTER_MAX_ENTRIES', 100000)),
+            ttl_seconds=float(settings.get('RATING_COUNTER_TTL_SECONDS', 60)),
+            changed_ttl_seconds=float(settings.get('RATING_CHANGES_TTL_SECONDS', 1.0))
+        )
+
+    def _cached(self, user_id, ttl):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[2] < ttl:
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                return list(entry)
+            self._misses += 1
+            return None
+
+    def _query(self, user_id):
+        rows = self.neo4j.execute_query(USER_RATING_STATE_QUERY, {'userId': user_id}, name='user_rating_state')
+        count = rows[0]['rating_count'] if rows else 0
+        changed = float(rows[0]['changed_at'] or 0.0) if rows else 0.0
+        with self._lock:
+            entry = self._entries.get(user_id)
+            # A write recorded here meanwhile is newer than what the query saw
+            if entry is not None and entry[1] > changed:
+                changed = entry[1]
+                count = entry[0] if entry[0] is not None else count
+            self._entries[user_id] = [count, changed, time.monotonic()]
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return count, changed
+
+    def count(self, user_id):
+        entry = self._cached(user_id, self.ttl_seconds)
+        if entry is not None and entry[0] is not None:
+            return entry[0]
+        if self.rating_matrix is not None and self.rating_matrix.ready:
+            cols, _ = self.rating_matrix.user_ratings(user_id)
+            return len(cols)
+        return self._query(user_id)[0]
+
+    def changed_at(self, user_id):
+        """Epoch seconds of the user's latest rating write in any worker (0.0 if none)"""
+        entry = self._cached(user_id, self.changed_ttl_seconds)
+        if entry is not None:
+            return entry[1]
+        return self._query(user_id)[1]
+
+    def _changed(self, user_id, count):
+        """Note a rating write made here now; `count` is the new count or None if unknown"""
+        with self._lock:
+            self._entries[user_id] = [count, time.time(), time.monotonic()]
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, user_id, rating):
+        """
+        Account for a rating the user just wrote (rating=None when deleted).
+        A first rating is counted directly; otherwise whether it was new or an
+        update is unknown, so the count is read again on next use.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+        first = rating is not None and entry is not None and entry[0] == 0
+        self._changed(user_id, 1 if first else None)
+
+    def invalidate(self, user_id):
+        """Forget the user's count after a change made here, e.g. a bulk import"""
+        self._changed(user_id, None)
+
+    def stats(self):
+        total = self._hits + self._misses
+        return {
+            'entries': len(self._entries),
+            'hit_ratio': round(self._hits / total, 4) if total else 0.0,
+            'source': 'rating_matrix' if self.rating_matrix is not None and self.rating_matrix.ready else 'cache'
+        }
@@ -1,124 +1,601 @@
+import asyncio
 import logging
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Tuple
+from services.circuit_breaker import database_unavailable
+
+COLLABORATIVE_QUERY = """
+// Find users who have similar ratings to our target user
+MATCH (target:User {id: $userId})-[tr:RATED]->(m:Movie)<-[sr:RATED]-(similar:User)
+WHERE target <> similar 
+  AND tr.rating >= 3.0 
+  AND sr.rating >= 3.5
+  AND abs(tr.rating - sr.rating) <= 1.5
+
+// Count common movies and calculate similarity
+WITH target, similar, 
+     COUNT(m) as commonMovies,
+     AVG(abs(tr.rating - sr.rating)) as avgDiff
+WHERE commonMovies >= 2  // Reduced from 3 for your smaller dataset
+
+// Get recommendations from similar users
+MATCH (similar)-[r:RATED]->(rec:Movie)
+WHERE NOT EXISTS((target)-[:RATED]->(rec))  // User hasn't rated this movie
+  AND r.rating >= 4.0  // Similar user liked it
+
+// Score and return results
+WITH rec, 
+     AVG(r.rating) as avgRating, 
+     COUNT(r) as voteCount,
+     AVG(commonMovies) as avgSimilarity
+WHERE voteCount >= 1
+
+RETURN rec.id as id, 
+       rec.title as title, 
+       CASE WHEN rec.year IS NOT NULL THEN rec.year ELSE 0 END as year,
+       rec.poster_url as poster_url,
+       rec.plot as plot,
+       avgRating as recommendation_score,
+       rec.avg_rating as avg_rating,
+       voteCount as vote_count
+ORDER BY avgRating DESC, rec.avg_rating DESC
+LIMIT $limit
+"""
+
+CONTENT_BASED_QUERY = """
+// Find user's favorite genres (rating 4.0+)
+MATCH (u:User {id: $userId})-[r:RATED]->(m:Movie)-[:HAS_GENRE]->(g:Genre)
+WHERE r.rating >= 4.0
+
+// Calculate genre preferences
+WITH u, g, 
+     COUNT(m) as genreCount, 
+     AVG(r.rating) as avgGenreRating
+ORDER BY genreCount DESC, avgGenreRating DESC
+LIMIT 3  // Top 3 favorite genres
+
+// Find good movies in these genres that user hasn't rated
+MATCH (g)<-[:HAS_GENRE]-(rec:Movie)
+WHERE NOT EXISTS((u)-[:RATED]->(rec))  // User hasn't rated it
+  AND rec.avg_rating >= 3.5  // It's a good movie
+
+// Score based on genre preferences
+WITH rec, 
+     SUM(genreCount * avgGenreRating) as contentScore,
+     COUNT(DISTINCT g) as genreMatches,
+     AVG(avgGenreRating) as avgUserGenreRating
+WHERE genreMatches >= 1
+
+RETURN rec.id as id,
+       rec.title as title,
+       CASE WHEN rec.year IS NOT NULL THEN rec.year ELSE 0 END as year,
+       rec.poster_url as poster_url,
+       rec.plot as plot,
+       contentScore as recommendation_score,
+       rec.avg_rating as avg_rating,
+       genreMatches as genre_match_count
+ORDER BY contentScore DESC, rec.avg_rating DESC
+LIMIT $limit
+"""
+
+# Movie fields for ids scored outside Cypher, in the order given
+MOVIES_BY_IDS_QUERY = """
+UNWIND range(0, size($ids) - 1) AS position
+MATCH (rec:Movie {id: $ids[position]})
+RETURN rec.id as id,
+       rec.title as title,
+       CASE WHEN rec.year IS NOT NULL THEN rec.year ELSE 0 END as year,
+       rec.poster_url as poster_url,
+       rec.plot as plot,
+       rec.avg_rating as avg_rating,
+       rec.rating_count as rating_count
+ORDER BY position
+"""
+
+def per_user_batch(query: str, columns: List[str]) -> str:
+    """
+    Run a single-user `$userId` query for every id in `$userIds` in one
+    round trip; each user's LIMIT applies within their own subquery
+    """
+    return (
+        "UNWIND $userIds AS batchUserId\nCALL {\n  WITH batchUserId\n"
+        + query.replace('$userId', 'batchUserId')
+        + "}\nRETURN batchUserId as user_id, " + ", ".join(columns)
+    )
+
+COLLABORATIVE_BATCH_QUERY = per_user_batch(COLLABORATIVE_QUERY, [
+    'id', 'title', 'year', 'poster_url', 'plot', 'recommendation_score', 'avg_rating', 'vote_count'
+])
+
+CONTENT_BASED_BATCH_QUERY = per_user_batch(CONTENT_BASED_QUERY, [
+    'id', 'title', 'year', 'poster_url', 'plot', 'recommendation_score', 'avg_rating', 'genre_match_count'
+])
+
+USER_RATINGS_QUERY = """
+MATCH (u:User {id: $userId})-[r:RATED]->(m:Movie)
+RETURN m.id as movie_id, r.rating as rating
+"""
+
+USER_RATINGS_BATCH_QUERY = per_user_batch(USER_RATINGS_QUERY, ['movie_id', 'rating'])
+
 
 class RecommendationEngine:
     """
     Fixed recommendation system based on your actual Neo4j data structure
     """
     
-    def __init__(self, neo4j_service):
+    def __init__(self, neo4j_service, neo4j_async=None, rating_matrix=None, factor_store=None,
+                 hybrid_deadline_ms=800, similarity_index=None, text_vectors=None,
+                 text_content_weight=1.0, text_similar_weight=0.3, rating_counter=None):
         self.neo4j = neo4j_service
+        self.neo4j_async = neo4j_async
+        self.hybrid_deadline_ms = hybrid_deadline_ms
+        self.similarity_index = similarity_index
+        self.text_vectors = text_vectors
+        self.text_content_weight = text_content_weight
+        self.text_similar_weight = text_similar_weight
+        self.rating_matrix = rating_matrix
+        self.factor_store = factor_store
+        # Tells when a user's ratings last changed in any worker
+        self.rating_counter = rating_counter
         self.logger = logging.getLogger(__name__)
     
-    def get_collaborative_recommendations(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    @classmethod
+    def from_settings(cls, neo4j_service, settings, neo4j_async=None, rating_matrix=None, rating_counter=None):
         """
-        SIMPLIFIED Collaborative Filtering - works with your data structure
+        Build an engine with the factor model, similarity index and text
+        vectors from settings, so the app and the precompute workers score alike
+        """
+        from services.factor_model import FactorStore
+        from services.similarity_index import SimilarityIndexStore
+        from services.text_vectors import TextVectorStore
+        return cls(
+            neo4j_service, neo4j_async, rating_matrix,
+            # Trained offline by train_mf.py; empty until the first run
+            FactorStore.from_settings(settings),
+            hybrid_deadline_ms=float(settings.get('HYBRID_DEADLINE_MS', 800)),
+            similarity_index=SimilarityIndexStore.from_settings(settings),
+            text_vectors=TextVectorStore.from_settings(settings),
+            text_content_weight=float(settings.get('TEXT_CONTENT_WEIGHT', 1.0)),
+            text_similar_weight=float(settings.get('TEXT_SIMILAR_WEIGHT', 0.3)),
+            rating_counter=rating_counter
+        )
+    
+    def get_collaborative_recommendations(self, user_id: str, limit: int = 10,
+                                          timeout: float = None) -> List[Dict[str, Any]]:
         """
+        SIMPLIFIED Collaborative Filtering - works with your data structure
         
-        query = """
-        // Find users who have similar ratings to our target user
-        MATCH (target:User {id: $userId})-[tr:RATED]->(m:Movie)<-[sr:RATED]-(similar:User)
-        WHERE target <> similar 
-          AND tr.rating >= 3.0 
-          AND sr.rating >= 3.5
-          AND abs(tr.rating - sr.rating) <= 1.5
-        
-        // Count common movies and calculate similarity
-        WITH target, similar, 
-             COUNT(m) as commonMovies,
-             AVG(abs(tr.rating - sr.rating)) as avgDiff
-        WHERE commonMovies >= 2  // Reduced from 3 for your smaller dataset
-        
-        // Get recommendations from similar users
-        MATCH (similar)-[r:RATED]->(rec:Movie)
-        WHERE NOT EXISTS((target)-[:RATED]->(rec))  // User hasn't rated this movie
-          AND r.rating >= 4.0  // Similar user liked it
-        
-        // Score and return results
-        WITH rec, 
-             AVG(r.rating) as avgRating, 
-             COUNT(r) as voteCount,
-             AVG(commonMovies) as avgSimilarity
-        WHERE voteCount >= 1
-        
-        RETURN rec.id as id, 
-               rec.title as title, 
-               CASE WHEN rec.year IS NOT NULL THEN rec.year ELSE 0 END as year,
-               rec.poster_url as poster_url,
-               rec.plot as plot,
-               avgRating as recommendation_score,
-               rec.avg_rating as avg_rating,
-               voteCount as vote_count
-        ORDER BY avgRating DESC, rec.avg_rating DESC
-        LIMIT $limit
+        Served from the in-memory rating matrix once it has loaded, otherwise
+        by the Cypher traversal. `timeout` (seconds) bounds the queries.
         """
+        if self.rating_matrix is not None and self.rating_matrix.ready:
+            try:
+                return self.get_matrix_collaborative_recommendations(user_id, limit, timeout)
+            except Exception as e:
+                if database_unavailable(e):
+                    raise
+                self.logger.error(f"❌ Rating matrix recommendations failed, using Cypher: {e}")
         
         try:
-            results = self.neo4j.execute_query(query, {'userId': user_id, 'limit': limit})
+            results = self.neo4j.execute_query(COLLABORATIVE_QUERY, {'userId': user_id, 'limit': limit},
+                                               name='collaborative', timeout=timeout)
             self.logger.info(f"🎯 Found {len(results)} collaborative recommendations for user {user_id}")
             return results
         except Exception as e:
+            if database_unavailable(e):
+                raise  # let the route serve its snapshot instead of an empty list
             self.logger.error(f"❌ Error getting collaborative recommendations: {e}")
             return []
     
-    def get_content_based_recommendations(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_matrix_collaborative_recommendations(self, user_id: str, limit: int = 10,
+                                                 timeout: float = None) -> List[Dict[str, Any]]:
         """
-        SIMPLIFIED Content-Based Filtering - works with your data structure
+        User-based collaborative filtering over the in-memory rating matrix;
+        only the winning movies are fetched from Neo4j
         """
-        
-        query = """
-        // Find user's favorite genres (rating 4.0+)
-        MATCH (u:User {id: $userId})-[r:RATED]->(m:Movie)-[:HAS_GENRE]->(g:Genre)
-        WHERE r.rating >= 4.0
-        
-        // Calculate genre preferences
-        WITH u, g, 
-             COUNT(m) as genreCount, 
-             AVG(r.rating) as avgGenreRating
-        ORDER BY genreCount DESC, avgGenreRating DESC
-        LIMIT 3  // Top 3 favorite genres
-        
-        // Find good movies in these genres that user hasn't rated
-        MATCH (g)<-[:HAS_GENRE]-(rec:Movie)
-        WHERE NOT EXISTS((u)-[:RATED]->(rec))  // User hasn't rated it
-          AND rec.avg_rating >= 3.5  // It's a good movie
-        
-        // Score based on genre preferences
-        WITH rec, 
-             SUM(genreCount * avgGenreRating) as contentScore,
-             COUNT(DISTINCT g) as genreMatches,
-             AVG(avgGenreRating) as avgUserGenreRating
-        WHERE genreMatches >= 1
-        
-        RETURN rec.id as id,
-               rec.title as title,
-               CASE WHEN rec.year IS NOT NULL THEN rec.year ELSE 0 END as year,
-               rec.poster_url as poster_url,
-               rec.plot as plot,
-               contentScore as recommendation_score,
-               rec.avg_rating as avg_rating,
-               genreMatches as genre_match_count
-        ORDER BY contentScore DESC, rec.avg_rating DESC
-        LIMIT $limit
+        scored = self.rating_matrix.recommend(user_id, limit)
+        return self.hydrate_movies(
+            scored,
+            lambda item: {'recommendation_score': item['score'], 'vote_count': item['vote_count']},
+            timeout
+        )
+    
+    def get_mf_recommendations(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
+        Matrix factorization: one dot product of the user's factors with every
+        movie's, then top-k. Users the current model has not seen yet get
+        collaborative recommendations instead.
         
+        Fold-ins live in the memory of the worker that served the rating, so
+        a user whose ratings changed since their factors here were solved
+        (in another worker, or since training) is folded in first, from the
+        ratings in the database.
+        """
+        model = self.factor_store.current() if self.factor_store is not None else None
+        if model is not None and self.rating_counter is not None:
+            try:
+                if self.rating_counter.changed_at(user_id) > self.factor_store.ratings_as_of(user_id):
+                    self.fold_in_user(user_id, from_database=True)
+            except Exception as e:
+                if database_unavailable(e):
+                    raise
+                self.logger.error(f"❌ Folding in user {user_id} failed: {e}")
+        if model is None or not model.has_user(user_id):
+            return self.get_collaborative_recommendations(user_id, limit)
+
+        # Ratings made since training, so a just-rated movie is not recommended back
+        exclude = ()
+        if self.rating_matrix is not None and self.rating_matrix.ready:
+            cols, _ = self.rating_matrix.user_ratings(user_id)
+            exclude = [self.rating_matrix.movie_ids[col] for col in cols.tolist()]
+
+        scored = model.recommend(user_id, limit, exclude=exclude)
+        self.logger.info(f"🧮 Found {len(scored)} matrix factorization recommendations for user {user_id}")
+        return self.hydrate_movies(
+            scored,
+            lambda item: {'recommendation_score': item['score'], 'model_version': model.version}
+        )
+    
+    def fold_in_user(self, user_id: str, from_database: bool = False) -> bool:
+        """
+        Re-solve a user's matrix factorization factors from their current
+        ratings, so `get_mf_recommendations` reflects a rating right away.
+        `from_database` skips the rating matrix, which only catches up with
+        other workers' ratings on its next sync.
+        """
+        if self.factor_store is None or self.factor_store.current() is None:
+            return False
+        if not from_database and self.rating_matrix is not None and self.rating_matrix.ready:
+            cols, values = self.rating_matrix.user_ratings(user_id)
+            ratings = dict(zip((self.rating_matrix.movie_ids[col] for col in cols.tolist()), values.tolist()))
+        else:
+            rows = self.neo4j.execute_query(USER_RATINGS_QUERY, {'userId': user_id}, name='user_ratings')
+            ratings = {row['movie_id']: row['rating'] for row in rows}
+        return self.factor_store.fold_in(user_id, ratings)
+    
+    def get_indexed_similar_movies(self, movie_id: str, limit: int = 10, min_rating: float = 3.5):
+        """
+        Movies most similar to `movie_id` from the precomputed index, fetched
+        with one keyed lookup. Movies the index doesn't have yet fall back to
+        their nearest plot/cast text vectors; None when neither knows them.
+        """
+        # Extra rows make up for the rating filter below
+        neighbors = self.similar_movie_scores(movie_id, limit * 3)
+        if neighbors is None:
+            return None
+        movies = self.hydrate_movies(
+            neighbors,
+            lambda item: {'similarity_score': item['score'], **({'text_similarity': item['text_similarity']} if 'text_similarity' in item else {})}
+        )
+        return [movie for movie in movies if (movie.get('avg_rating') or 0) >= min_rating][:limit]
+    
+    def similar_movie_scores(self, movie_id: str, limit: int = None):
+        """
+        [{'movie_id', 'score'}] neighbours of `movie_id`, best first, without
+        movie fields: the similarity index blended with text similarity, or
+        the nearest text vectors for movies the index lacks. None when
+        neither knows the movie.
+        """
+        index = self.similarity_index.current() if self.similarity_index is not None else None
+        neighbors = index.similar(movie_id) if index is not None else None
+        vectors = self.text_vectors.current() if self.text_vectors is not None else None
+        target = vectors.vector(movie_id) if vectors is not None else None
+        if neighbors is None:
+            if target is None:
+                return None
+            return [
+                {'movie_id': other, 'score': round(score, 4), 'text_similarity': round(score, 4)}
+                for other, score in vectors.nearest(target, limit or 50, exclude=(movie_id,))
+            ]
+        elif target is not None:
+            # Blend in plot/cast text similarity to the target movie
+            weight = self.text_similar_weight
+            text_scores = vectors.scores(target, [item['movie_id'] for item in neighbors])
+            neighbors = sorted(
+                ({**item, 'text_similarity': round(text, 4), 'score': round((1 - weight) * item['score'] + weight * text, 4)}
+                 for item, text in zip(neighbors, text_scores)),
+                key=lambda item: item['score'], reverse=True
+            )
+        return neighbors[:limit]
+    
+    def hydrate_movies(self, scored: List[Dict[str, Any]], extra, timeout: float = None) -> List[Dict[str, Any]]:
+        """Fetch movie fields for `scored` items (with a movie_id), keeping their order"""
+        if not scored:
+            return []
+        movies = self.neo4j.execute_query(
+            MOVIES_BY_IDS_QUERY, {'ids': [item['movie_id'] for item in scored]}, name='movies_by_ids',
+            timeout=timeout
+        )
+        by_id = {movie['id']: movie for movie in movies}
+        results = []
+        for item in scored:
+            movie = by_id.get(item['movie_id'])
+            if movie is not None:
+                results.append({**movie, **extra(item)})
+        return results
+    
+    def get_content_based_recommendations(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        SIMPLIFIED Content-Based Filtering - works with your data structure
+        """
         try:
-            results = self.neo4j.execute_query(query, {'userId': user_id, 'limit': limit})
+            # With text vectors, rank a wider candidate set by plot/cast similarity too
+            candidates = limit * 2 if self.text_vectors_ready() else limit
+            results = self.neo4j.execute_query(CONTENT_BASED_QUERY, {'userId': user_id, 'limit': candidates}, name='content_based')
+            results = self.rerank_by_text(user_id, results)[:limit]
             self.logger.info(f"🎬 Found {len(results)} content-based recommendations for user {user_id}")
             return results
         except Exception as e:
+            if database_unavailable(e):
+                raise  # let the route serve its snapshot instead of an empty list
             self.logger.error(f"❌ Error getting content-based recommendations: {e}")
             return []
     
+    def text_vectors_ready(self) -> bool:
+        return self.text_vectors is not None and self.text_vectors.current() is not None
+    
+    def liked_movies(self, user_id: str, ratings: Dict[str, float] = None) -> Dict[str, float]:
+        """
+        {movie_id: weight} of the movies the user rated 4.0+, weighted by how
+        far above 3 the rating is; `ratings` ({movie_id: rating}) skips the lookup
+        """
+        if ratings is None:
+            if self.rating_matrix is not None and self.rating_matrix.ready:
+                cols, values = self.rating_matrix.user_ratings(user_id)
+                ratings = dict(zip((self.rating_matrix.movie_ids[col] for col in cols.tolist()), values.tolist()))
+            else:
+                rows = self.neo4j.execute_query(USER_RATINGS_QUERY, {'userId': user_id}, name='user_ratings')
+                ratings = {row['movie_id']: row['rating'] for row in rows}
+        return {movie_id: rating - 3.0 for movie_id, rating in ratings.items() if rating >= 4.0}
+    
+    def rerank_by_text(self, user_id: str, recs: List[Dict[str, Any]],
+                       ratings: Dict[str, float] = None) -> List[Dict[str, Any]]:
+        """
+        Boost content candidates by the cosine between their plot/title/cast
+        vector and the centroid of the user's liked movies:
+        score * (1 + text_content_weight * similarity). A no-op without vectors.
+        """
+        vectors = self.text_vectors.current() if self.text_vectors is not None else None
+        if vectors is None or not recs:
+            return recs
+        centroid = vectors.centroid(self.liked_movies(user_id, ratings))
+        if centroid is None:
+            return recs
+        
+        boosted = [
+            {
+                **rec,
+                'recommendation_score': (rec.get('recommendation_score') or 0.0) * (1 + self.text_content_weight * similarity),
+                'text_similarity': round(similarity, 4)
+            }
+            for rec, similarity in zip(recs, vectors.scores(centroid, [rec['id'] for rec in recs]))
+        ]
+        boosted.sort(key=lambda rec: rec['recommendation_score'], reverse=True)
+        return boosted
+    
     def get_hybrid_recommendations(self, user_id: str, limit: int = 15) -> List[Dict[str, Any]]:
         """
         HYBRID APPROACH - Best of both worlds!
         """
+        return self.get_hybrid_recommendations_with_arms(user_id, limit)[0]
+    
+    def get_hybrid_recommendations_with_arms(self, user_id: str, limit: int = 15) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Hybrid recommendations plus per-arm metadata, for sync callers; runs
+        the deadline-bounded concurrent version when the async driver is there
+        """
+        if self.neo4j_async is not None:
+            return self.neo4j_async.run(self.get_hybrid_recommendations_budgeted(user_id, limit))
         
         # Get recommendations from both methods
+        started = time.perf_counter()
         collab_recs = self.get_collaborative_recommendations(user_id, limit * 2)
+        collab_ms = (time.perf_counter() - started) * 1000
         content_recs = self.get_content_based_recommendations(user_id, limit * 2)
+        content_ms = (time.perf_counter() - started) * 1000 - collab_ms
+        
+        hybrid_results = self.merge_hybrid(collab_recs, content_recs, limit)
+        
+        self.logger.info(f"🚀 Generated {len(hybrid_results)} hybrid recommendations for user {user_id}")
+        return hybrid_results, {
+            'deadline_ms': None,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'partial': False,
+            'arms': {
+                'collaborative': {'status': 'ok', 'ms': round(collab_ms, 1), 'count': len(collab_recs)},
+                'content': {'status': 'ok', 'ms': round(content_ms, 1), 'count': len(content_recs)}
+            }
+        }
+    
+    async def get_hybrid_recommendations_async(self, user_id: str, limit: int = 15) -> List[Dict[str, Any]]:
+        """
+        Hybrid recommendations with the collaborative and content queries
+        running concurrently, so latency is the slower of the two, not their sum
+        """
+        return (await self.get_hybrid_recommendations_budgeted(user_id, limit))[0]
+    
+    async def get_hybrid_recommendations_budgeted(self, user_id: str, limit: int = 15,
+                                                  deadline_ms: float = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Run the collaborative, content and popular arms concurrently and merge
+        whatever finished within the deadline (`hybrid_deadline_ms` by default).
+        Arms still running at the deadline are cancelled. Slots the finished
+        arms leave empty are backfilled with popular movies the user hasn't
+        rated.
         
+        Cancelling a threaded arm only abandons it, so their queries get the
+        deadline as a transaction timeout and Neo4j stops them when it
+        passes, releasing the thread and its connection.
+        
+        Every arm reads inside the caller's causal chain (read_your_writes):
+        the async reads pick the key up from this coroutine's context, which
+        AsyncNeo4jService.run carries over for sync callers, and to_thread
+        copies it into the threaded arms. So /for-me right after /rate
+        includes the new rating.
+        
+        Returns:
+            (recommendations, metadata) where metadata['arms'] gives each arm's
+            status (ok / timeout / error), time taken, rows returned and how
+            many recommendations it contributed
+        """
+        deadline = (deadline_ms if deadline_ms is not None else self.hybrid_deadline_ms) / 1000.0
+        params = {'userId': user_id, 'limit': limit * 2}
+        matrix_ready = self.rating_matrix is not None and self.rating_matrix.ready
+        started = time.perf_counter()
+        took = {}
+        
+        async def timed(name, arm):
+            try:
+                return await arm
+            finally:
+                took[name] = round((time.perf_counter() - started) * 1000, 1)
+        
+        arms = {}
+        if matrix_ready:
+            arms['collaborative'] = asyncio.to_thread(self.get_collaborative_recommendations, user_id, limit * 2, deadline)
+        else:
+            arms['collaborative'] = self.neo4j_async.execute_read(COLLABORATIVE_QUERY, params, name='collaborative')
+        arms['content'] = self.neo4j_async.execute_read(CONTENT_BASED_QUERY, params, name='content_based')
+        # Cached catalog read, so normally back long before the others
+        arms['popular'] = asyncio.to_thread(self.get_popular_movies, None, limit * 2, deadline)
+        if not matrix_ready:
+            arms['rated'] = self.neo4j_async.execute_read(USER_RATINGS_QUERY, {'userId': user_id}, name='user_ratings')
+        
+        tasks = {name: asyncio.ensure_future(timed(name, arm)) for name, arm in arms.items()}
+        done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        for task in pending:
+            task.cancel()
+        
+        results, meta = {}, {}
+        for name, task in tasks.items():
+            if task in pending:
+                meta[name] = {'status': 'timeout', 'ms': round(deadline * 1000, 1), 'count': 0}
+                continue
+            error = task.exception()
+            if error is not None:
+                # Like the sync arms, a failing arm contributes nothing unless the database is down
+                if name in ('collaborative', 'content') and database_unavailable(error):
+                    raise error
+                self.logger.error(f"❌ Hybrid {name} arm failed: {error}")
+                meta[name] = {'status': 'error', 'ms': took.get(name), 'count': 0}
+                continue
+            results[name] = task.result()
+            meta[name] = {'status': 'ok', 'ms': took.get(name), 'count': len(results[name])}
+        
+        # Text scoring needs the user's ratings; don't block the loop fetching them
+        if 'content' in results and (matrix_ready or 'rated' in results):
+            ratings = None if matrix_ready else {row['movie_id']: row['rating'] for row in results['rated']}
+            results['content'] = self.rerank_by_text(user_id, results['content'], ratings)
+        
+        hybrid_results = self.merge_hybrid(results.get('collaborative', []), results.get('content', []), limit)
+        
+        # Backfill only when we know which movies to skip
+        if matrix_ready:
+            rated = self._matrix_rated(user_id)
+        elif 'rated' in results:
+            rated = {row['movie_id'] for row in results['rated']}
+        else:
+            rated = None
+        if rated is not None:
+            self.backfill_popular(hybrid_results, results.get('popular', []), rated, limit)
+        
+        meta.pop('rated', None)
+        for name, arm in meta.items():
+            arm['contributed'] = sum(1 for movie in hybrid_results if name in movie['recommendation_sources'])
+        
+        self.logger.info(f"🚀 Generated {len(hybrid_results)} hybrid recommendations for user {user_id}")
+        return hybrid_results, {
+            'deadline_ms': round(deadline * 1000, 1),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'partial': any(meta[name]['status'] != 'ok' for name in ('collaborative', 'content')),
+            'arms': meta
+        }
+    
+    def get_hybrid_recommendations_batch(self, user_ids: List[str], limit: int = 15) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        `get_hybrid_recommendations` for many users at once: each arm is one
+        query for the whole chunk (collaborative from the rating matrix when
+        it is loaded), then merged per user with the same weights and
+        backfilled with popular movies like the live path
+        
+        Returns:
+            {user_id: hybrid recommendations}
+        """
+        if not user_ids:
+            return {}
+        params = {'userIds': list(user_ids), 'limit': limit * 2}
+        matrix_ready = self.rating_matrix is not None and self.rating_matrix.ready
+        
+        collab = {user_id: [] for user_id in user_ids}
+        if matrix_ready:
+            scored = {user_id: self.rating_matrix.recommend(user_id, limit * 2) for user_id in user_ids}
+            # One hydration query for every movie in the chunk
+            wanted = list(dict.fromkeys(item['movie_id'] for items in scored.values() for item in items))
+            movies = self.neo4j.execute_query(MOVIES_BY_IDS_QUERY, {'ids': wanted}, name='movies_by_ids') if wanted else []
+            by_id = {movie['id']: movie for movie in movies}
+            for user_id, items in scored.items():
+                collab[user_id] = [
+                    {**by_id[item['movie_id']], 'recommendation_score': item['score'], 'vote_count': item['vote_count']}
+                    for item in items if item['movie_id'] in by_id
+                ]
+        else:
+            for row in self.neo4j.execute_query(COLLABORATIVE_BATCH_QUERY, params, name='collaborative_batch'):
+                collab[row.pop('user_id')].append(row)
+        
+        content = {user_id: [] for user_id in user_ids}
+        for row in self.neo4j.execute_query(CONTENT_BASED_BATCH_QUERY, params, name='content_based_batch'):
+            content[row.pop('user_id')].append(row)
+        
+        # Text scoring and the backfill need each user's ratings
+        ratings = None
+        if not matrix_ready:
+            ratings = {user_id: {} for user_id in user_ids}
+            for row in self.neo4j.execute_query(USER_RATINGS_BATCH_QUERY, {'userIds': list(user_ids)}, name='user_ratings_batch'):
+                ratings[row['user_id']][row['movie_id']] = row['rating']
+        
+        if self.text_vectors_ready():
+            for user_id in user_ids:
+                content[user_id] = self.rerank_by_text(user_id, content[user_id], ratings and ratings[user_id])
+        
+        popular = None
+        recommendations = {}
+        for user_id in user_ids:
+            hybrid_results = self.merge_hybrid(collab[user_id], content[user_id], limit)
+            if len(hybrid_results) < limit:
+                if popular is None:
+                    popular = self.get_popular_movies(None, limit * 2)
+                rated = ratings[user_id] if ratings is not None else self._matrix_rated(user_id)
+                self.backfill_popular(hybrid_results, popular, rated, limit)
+            recommendations[user_id] = hybrid_results
+        return recommendations
+    
+    def _matrix_rated(self, user_id):
+        """Ids of the movies `user_id` has rated, from the rating matrix"""
+        cols, _ = self.rating_matrix.user_ratings(user_id)
+        return {self.rating_matrix.movie_ids[col] for col in cols.tolist()}
+    
+    @staticmethod
+    def backfill_popular(hybrid_results: List[Dict[str, Any]], popular: List[Dict[str, Any]], rated,
+                         limit: int) -> List[Dict[str, Any]]:
+        """Fill `hybrid_results` up to `limit` with `popular` movies not in it and not `rated`"""
+        seen = {movie['id'] for movie in hybrid_results} | set(rated)
+        for movie in popular:
+            if len(hybrid_results) >= limit:
+                break
+            if movie['id'] not in seen:
+                seen.add(movie['id'])
+                hybrid_results.append({
+                    **movie,
+                    'recommendation_score': movie.get('avg_rating') or 0.0,
+                    'recommendation_sources': ['popular']
+                })
+        return hybrid_results
+    
+    @staticmethod
+    def merge_hybrid(collab_recs: List[Dict[str, Any]], content_recs: List[Dict[str, Any]],
+                     limit: int) -> List[Dict[str, Any]]:
+        """Weight, combine and rank collaborative and content-based results"""
         # Combine and weight the recommendations
         movie_scores = {}
         
@@ -162,10 +639,9 @@ class RecommendationEngine:
             movie_data['recommendation_sources'] = data['sources']
             hybrid_results.append(movie_data)
         
-        self.logger.info(f"🚀 Generated {len(hybrid_results)} hybrid recommendations for user {user_id}")
         return hybrid_results
     
-    def get_popular_movies(self, genre: str = None, limit: int = 20) -> List[Dict[str, Any]]:
+    def get_popular_movies(self, genre: str = None, limit: int = 20, timeout: float = None) -> List[Dict[str, Any]]:
         """
         Get popular movies - FIXED for your data structure (no rating_count property)
         """
@@ -196,10 +672,12 @@ class RecommendationEngine:
             params = {'limit': limit}
         
         try:
-            results = self.neo4j.execute_query(query, params)
+            results = self.neo4j.execute_query(query, params, name='popular', cache=True, timeout=timeout)
             self.logger.info(f"📈 Found {len(results)} popular movies")
             return results
         except Exception as e:
+            if database_unavailable(e):
+                raise  # let the route serve its snapshot instead of an empty list
             self.logger.error(f"❌ Error getting popular movies: {e}")
             return []
     
@@ -288,9 +766,11 @@ class RecommendationEngine:
         """
         
         try:
-            results = self.neo4j.execute_query(query, {'userId': user_id, 'limit': limit})
+            results = self.neo4j.execute_query(query, {'userId': user_id, 'limit': limit}, name='simple')
             self.logger.info(f"🔍 Simple recommendations found: {len(results)}")
             return results
         except Exception as e:
+            if database_unavailable(e):
+                raise  # let the route serve its snapshot instead of an empty list
             self.logger.error(f"❌ Error in simple recommendations: {e}")
             return []
\ No newline at end of file
@@ -0,0 +1,275 @@
+from concurrent.futures import ThreadPoolExecutor
+from services.circuit_breaker import database_unavailable
+from services.metrics import REGISTRY
+from services.recommendation_engine import USER_RATINGS_QUERY
+import contextvars
+import logging
+import time
+
+NEW_RELEASES_QUERY = """
+MATCH (m:Movie)
+WHERE m.year IS NOT NULL AND m.avg_rating >= $minRating
+WITH max(m.year) as latest
+MATCH (rec:Movie)
+WHERE rec.year >= latest - $years AND rec.avg_rating >= $minRating
+RETURN rec.id as id, rec.title as title, rec.year as year,
+       rec.poster_url as poster_url, rec.plot as plot, rec.avg_rating as avg_rating
+ORDER BY rec.year DESC, rec.avg_rating DESC
+LIMIT $limit
+"""
+
+RECENT_LIKED_QUERY = """
+MATCH (u:User {id: $userId})-[r:RATED]->(m:Movie)
+WHERE r.rating >= 4.0
+RETURN m.id as movie_id, r.rating as rating
+ORDER BY r.timestamp DESC
+LIMIT $limit
+"""
+
+# Candidate counts out of each stage
+CANDIDATE_BUCKETS = (0, 5, 10, 25, 50, 100, 200, 500, 1000)
+
+class PipelineRequest:
+    """
+    One user's run through the pipeline. Generators and stages share the
+    user's ratings through it, so they are looked up at most once.
+    """
+
+    def __init__(self, engine, user_id, limit):
+        self.engine = engine
+        self.user_id = user_id
+        self.limit = limit
+        self._ratings = None
+
+    def ratings(self):
+        """{movie_id: rating} of everything the user has rated"""
+        if self._ratings is None:
+            matrix = self.engine.rating_matrix
+            if matrix is not None and matrix.ready:
+                cols, values = matrix.user_ratings(self.user_id)
+                self._ratings = dict(zip((matrix.movie_ids[col] for col in cols.tolist()), values.tolist()))
+            else:
+                rows = self.engine.neo4j.execute_query(USER_RATINGS_QUERY, {'userId': self.user_id}, name='user_ratings')
+                self._ratings = {row['movie_id']: row['rating'] for row in rows}
+        return self._ratings
+
+class CandidateGenerator:
+    """
+    A source of candidate movies. `generate` returns at most `budget` movie
+    dicts with an 'id' and a 'recommendation_score', best first; the merge
+    stage scales each generator's scores by its `weight`.
+    """
+
+    name = 'generator'
+
+    def __init__(self, weight=1.0, budget=50):
+        self.weight = weight
+        self.budget = budget
+
+    def generate(self, request):
+        raise NotImplementedError
+
+class CollaborativeGenerator(CandidateGenerator):
+    name = 'collaborative'
+
+    def generate(self, request):
+        return request.engine.get_collaborative_recommendations(request.user_id, self.budget)
+
+class ContentGenerator(CandidateGenerator):
+    name = 'content'
+
+    def generate(self, request):
+        return request.engine.get_content_based_recommendations(request.user_id, self.budget)
+
+class PopularGenerator(CandidateGenerator):
+    name = 'popular'
+
+    def generate(self, request):
+        return [
+            {**movie, 'recommendation_score': movie.get('avg_rating') or 0.0}
+            for movie in request.engine.get_popular_movies(None, self.budget)
+        ]
+
+class NewReleasesGenerator(CandidateGenerator):
+    """Well rated movies from the catalog's latest `years` years"""
+
+    name = 'new_releases'
+
+    def __init__(self, weight=1.0, budget=50, years=2, min_rating=3.5):
+        super().__init__(weight, budget)
+        self.years = years
+        self.min_rating = min_rating
+
+    def generate(self, request):
+        movies = request.engine.neo4j.execute_query(
+            NEW_RELEASES_QUERY, {'years': self.years, 'minRating': self.min_rating, 'limit': self.budget},
+            name='new_releases', cache=True
+        )
+        return [{**movie, 'recommendation_score': movie.get('avg_rating') or 0.0} for movie in movies]
+
+class SimilarToRecentGenerator(CandidateGenerator):
+    """
+    Neighbours of the user's `seeds` most recently liked movies from the
+    similarity index, each scored by its best similarity times how much
+    the user liked the seed
+    """
+
+    name = 'similar_to_recent'
+
+    def __init__(self, weight=1.0, budget=50, seeds=5):
+        super().__init__(weight, budget)
+        self.seeds = seeds
+
+    def generate(self, request):
+        engine = request.engine
+        recent = engine.neo4j.execute_query(
+            RECENT_LIKED_QUERY, {'userId': request.user_id, 'limit': self.seeds}, name='recent_liked'
+        )
+        scores = {}
+        for seed in recent:
+            for item in engine.similar_movie_scores(seed['movie_id'], self.budget) or []:
+                score = item['score'] * (seed['rating'] - 3.0)
+                if score > scores.get(item['movie_id'], 0.0):
+                    scores[item['movie_id']] = score
+        best = sorted(scores.items(), key=lambda pair: pair[1], reverse=True)[:self.budget]
+        return engine.hydrate_movies(
+            [{'movie_id': movie_id, 'score': score} for movie_id, score in best],
+            lambda item: {'recommendation_score': item['score']}
+        )
+
+GENERATORS = {
+    generator.name: generator
+    for generator in (CollaborativeGenerator, ContentGenerator, PopularGenerator,
+                      NewReleasesGenerator, SimilarToRecentGenerator)
+}
+
+class RecommendationPipeline:
+    """
+    Recommendations in four stages, each with a fixed candidate budget:
+
+    1. generate: every candidate generator runs concurrently and returns at
+       most its own `budget` movies
+    2. merge: candidates are deduplicated. Each generator's scores are
+       normalised to its best one and weighted, and a movie's score is the
+       sum over the generators that proposed it. The best `merge_budget` go on.
+    3. filter: movies the user already rated are dropped
+    4. rank: the best `rank_budget` are re-scored (text similarity to the
+       user's liked movies) and the top `limit` returned
+
+    Every stage's time and output size is recorded per request, in the
+    returned metadata and as histograms labelled by stage.
+
+    Generators run on a pool of `workers` threads shared by every request in
+    the process (PIPELINE_WORKERS), each in a copy of the request's context
+    so their reads stay in the user's read-your-writes chain. About
+    `workers / len(generators)` pipeline requests run at once (6 with the
+    configured five generators and 32 workers); beyond that generators
+    queue for a thread.
+    """
+
+    def __init__(self, engine, generators, merge_budget=200, rank_budget=100, workers=32, metrics=None):
+        self.engine = engine
+        self.generators = list(generators)
+        self.merge_budget = merge_budget
+        self.rank_budget = rank_budget
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pipeline')
+
+        metrics = metrics or REGISTRY
+        self._seconds = metrics.histogram(
+            'recommendation_pipeline_stage_seconds', 'Recommendation pipeline time per stage', ('stage',))
+        self._candidates = metrics.histogram(
+            'recommendation_pipeline_candidates', 'Candidates out of each recommendation pipeline stage', ('stage',),
+            buckets=CANDIDATE_BUCKETS)
+
+    @classmethod
+    def from_settings(cls, engine, settings):
+        """
+        Build a pipeline from PIPELINE_* settings; PIPELINE_GENERATORS is a
+        comma separated list of name:weight pairs
+        """
+        budget = int(settings.get('PIPELINE_GENERATOR_BUDGET', 50))
+        generators = []
+        for entry in settings.get('PIPELINE_GENERATORS', 'collaborative:0.6,content:0.4').split(','):
+            name, _, weight = entry.strip().partition(':')
+            if name not in GENERATORS:
+                raise ValueError(f"Unknown candidate generator {name}")
+            generators.append(GENERATORS[name](weight=float(weight or 1.0), budget=budget))
+        return cls(
+            engine, generators,
+            merge_budget=int(settings.get('PIPELINE_MERGE_BUDGET', 200)),
+            rank_budget=int(settings.get('PIPELINE_RANK_BUDGET', 100)),
+            workers=int(settings.get('PIPELINE_WORKERS', 32))
+        )
+
+    def _record(self, stage, started, count, meta):
+        seconds = time.perf_counter() - started
+        self._seconds.observe(seconds, stage=stage)
+        self._candidates.observe(count, stage=stage)
+        meta[stage] = {'ms': round(seconds * 1000, 1), 'count': count}
+
+    def _generate(self, generator, request, meta):
+        started = time.perf_counter()
+        try:
+            candidates = generator.generate(request)[:generator.budget]
+        except Exception as e:
+            if database_unavailable(e):
+                raise
+            self.logger.error(f"❌ Candidate generator {generator.name} failed: {e}")
+            candidates = []
+        self._record(f"generate.{generator.name}", started, len(candidates), meta)
+        return candidates
+
+    def run(self, user_id, limit=15):
+        """
+        Returns:
+            (recommendations, metadata) where metadata['stages'] gives each
+            stage's time and the candidates it passed on
+        """
+        request = PipelineRequest(self.engine, user_id, limit)
+        started = time.perf_counter()
+        stages = {}
+
+        stage_started = time.perf_counter()
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, self._generate, generator, request, stages)
+            for generator in self.generators
+        ]
+        generated = [(generator, future.result()) for generator, future in zip(self.generators, futures)]
+        self._record('generate', stage_started, sum(len(candidates) for _, candidates in generated), stages)
+
+        stage_started = time.perf_counter()
+        candidates = self.merge(generated)[:self.merge_budget]
+        self._record('merge', stage_started, len(candidates), stages)
+
+        stage_started = time.perf_counter()
+        rated = request.ratings()
+        candidates = [movie for movie in candidates if movie['id'] not in rated]
+        self._record('filter', stage_started, len(candidates), stages)
+
+        stage_started = time.perf_counter()
+        ranked = self.engine.rerank_by_text(user_id, candidates[:self.rank_budget], rated)[:limit]
+        self._record('rank', stage_started, len(ranked), stages)
+
+        self.logger.info(f"🧪 Pipeline produced {len(ranked)} recommendations for user {user_id}")
+        return ranked, {'elapsed_ms': round((time.perf_counter() - started) * 1000, 1), 'stages': stages}
+
+    @staticmethod
+    def merge(generated):
+        """Deduplicate [(generator, candidates)] into one list, best combined score first"""
+        merged = {}
+        for generator, candidates in generated:
+            best = max((movie.get('recommendation_score') or 0.0 for movie in candidates), default=0.0)
+            for movie in candidates:
+                score = generator.weight * (movie.get('recommendation_score') or 0.0) / best if best > 0 else 0.0
+                entry = merged.get(movie['id'])
+                if entry is None:
+                    merged[movie['id']] = {**movie, 'recommendation_score': score,
+                                           'recommendation_sources': [generator.name]}
+                else:
+                    entry['recommendation_score'] += score
+                    entry['recommendation_sources'].append(generator.name)
+        return sorted(merged.values(), key=lambda movie: movie['recommendation_score'], reverse=True)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
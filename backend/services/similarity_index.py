@@ -0,0 +1,262 @@
+from services.versioned_store import VersionedStore
+import json
+import math
+import os
+import numpy as np
+import scipy.sparse as sp
+
+MOVIE_IDS_QUERY = """
+MATCH (m:Movie)
+RETURN m.id as id
+"""
+
+MOVIE_FEATURES_QUERY = """
+MATCH (m:Movie)
+WHERE $ids IS NULL OR m.id IN $ids
+OPTIONAL MATCH (m)-[:HAS_GENRE]->(g:Genre)
+WITH m, collect(DISTINCT g.name) as genres
+OPTIONAL MATCH (m)-[:DIRECTED_BY]->(d:Director)
+WITH m, genres, collect(DISTINCT d.name) as directors
+OPTIONAL MATCH (m)-[:STARS]->(a:Actor)
+RETURN m.id as id, genres, directors, collect(DISTINCT a.name) as actors
+"""
+
+FEATURE_TYPES = (('genre', 'genres'), ('director', 'directors'), ('actor', 'actors'))
+
+def _idf(df, n):
+    return math.log((n + 1) / (df + 1)) + 1.0
+
+def _top_k(scores, k):
+    """Per row, column indices and values of the k best finite scores, best first (-1 pads)"""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.full((scores.shape[0], 0), -1, dtype=np.int32), np.zeros((scores.shape[0], 0), dtype=np.float32)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-values, axis=1)
+    top, values = np.take_along_axis(top, order, axis=1), np.take_along_axis(values, order, axis=1)
+    empty = ~np.isfinite(values) | (values <= 0)
+    top[empty], values[empty] = -1, 0.0
+    return top.astype(np.int32), values.astype(np.float32)
+
+class SimilarityIndex:
+    """
+    One built version: the `top_k` most similar movies of every movie as
+    two memory-mapped (movies x top_k) arrays of neighbour rows and scores
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.version = self.meta['version']
+        with open(os.path.join(path, 'movie_ids.json')) as f:
+            self.movie_ids = json.load(f)
+        self.movie_index = {movie_id: row for row, movie_id in enumerate(self.movie_ids)}
+        self.neighbors = np.load(os.path.join(path, 'neighbors.npy'), mmap_mode='r')
+        self.scores = np.load(os.path.join(path, 'scores.npy'), mmap_mode='r')
+
+    def __contains__(self, movie_id):
+        return movie_id in self.movie_index
+
+    def similar(self, movie_id, limit=None):
+        """[{'movie_id', 'score'}] best first, or None when the movie isn't indexed"""
+        row = self.movie_index.get(movie_id)
+        if row is None:
+            return None
+        neighbors, scores = self.neighbors[row][:limit], self.scores[row][:limit]
+        return [
+            {'movie_id': self.movie_ids[col], 'score': round(float(score), 4)}
+            for col, score in zip(neighbors.tolist(), scores.tolist()) if col >= 0
+        ]
+
+class SimilarityIndexStore(VersionedStore):
+    """
+    Offline-built item-item similarity (see `build_similarity_index.py`).
+
+    Movies are described by their genres, director and actors. Every feature
+    is weighted by its type's weight times its IDF, so a shared director
+    counts for more than a shared "Drama". Rows are L2 normalised and
+    similarity is their cosine. The index keeps each movie's `top_k`
+    neighbours.
+
+    `add_movies` inserts new movies without a rebuild. Their features reuse
+    the saved vocabulary and IDF, and existing movies only gain a new
+    neighbour if it beats their current ones. IDF drift from many additions
+    is corrected by the next full `build`.
+    """
+
+    kind = 'similarity index'
+
+    def __init__(self, directory, top_k=50, genre_weight=1.0, director_weight=2.0, actor_weight=1.0,
+                 keep_versions=2, reload_seconds=30, chunk_size=1024):
+        super().__init__(directory, keep_versions, reload_seconds)
+        self.top_k = top_k
+        self.weights = {'genre': genre_weight, 'director': director_weight, 'actor': actor_weight}
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a store from SIMILAR_* settings"""
+        return cls(
+            directory=settings.get('SIMILAR_INDEX_DIR', 'similarity'),
+            top_k=int(settings.get('SIMILAR_TOP_K', 50)),
+            genre_weight=float(settings.get('SIMILAR_GENRE_WEIGHT', 1.0)),
+            director_weight=float(settings.get('SIMILAR_DIRECTOR_WEIGHT', 2.0)),
+            actor_weight=float(settings.get('SIMILAR_ACTOR_WEIGHT', 1.0)),
+            keep_versions=int(settings.get('SIMILAR_KEEP_VERSIONS', 2)),
+            reload_seconds=float(settings.get('SIMILAR_RELOAD_SECONDS', 30))
+        )
+
+    def _open(self, path):
+        return SimilarityIndex(path)
+
+    def _features(self, movies, vocab, idf, n_movies):
+        """
+        Normalised feature rows for `movies` (dicts with id/genres/directors/actors).
+        Unknown features are appended to `vocab`/`idf` in place, with the IDF
+        of their frequency among `movies`.
+        """
+        keyed = [
+            [f"{kind}:{name}" for kind, field in FEATURE_TYPES for name in (movie.get(field) or []) if name]
+            for movie in movies
+        ]
+        new_df = {}
+        for keys in keyed:
+            for key in set(keys):
+                if key not in vocab:
+                    new_df[key] = new_df.get(key, 0) + 1
+        for key, df in new_df.items():
+            vocab[key] = len(vocab)
+            idf.append(_idf(df, n_movies))
+
+        rows, cols, values = [], [], []
+        for row, keys in enumerate(keyed):
+            for key in set(keys):
+                col = vocab[key]
+                rows.append(row)
+                cols.append(col)
+                values.append(self.weights[key.split(':', 1)[0]] * idf[col])
+        features = sp.csr_matrix((values, (rows, cols)), shape=(len(movies), len(vocab)), dtype=np.float32)
+        norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sp.diags(1.0 / norms).dot(features).tocsr().astype(np.float32)
+
+    def build(self, movies):
+        """Full build from `movies` (iterable of feature dicts); returns the new version"""
+        movies = list(movies)
+        df = {}
+        for movie in movies:
+            for key in {f"{kind}:{name}" for kind, field in FEATURE_TYPES for name in (movie.get(field) or []) if name}:
+                df[key] = df.get(key, 0) + 1
+        vocab = {key: col for col, key in enumerate(df)}
+        idf = [_idf(df[key], len(movies)) for key in vocab]
+
+        features = self._features(movies, vocab, idf, len(movies))
+        neighbors = np.full((len(movies), self.top_k), -1, dtype=np.int32)
+        scores = np.zeros((len(movies), self.top_k), dtype=np.float32)
+        transposed = features.T.tocsc()
+        for start in range(0, len(movies), self.chunk_size):
+            block = (features[start:start + self.chunk_size] @ transposed).toarray()
+            rows = np.arange(block.shape[0])
+            block[rows, rows + start] = -np.inf  # a movie isn't its own neighbour
+            top, values = _top_k(block, self.top_k)
+            neighbors[start:start + len(rows), :top.shape[1]] = top
+            scores[start:start + len(rows), :top.shape[1]] = values
+
+        return self._save([movie['id'] for movie in movies], features, vocab, idf, neighbors, scores, 'build')
+
+    def add_movies(self, movies):
+        """
+        Insert new movies into the current version and publish the result as a
+        new version; returns it (or None when nothing was new)
+        """
+        current = self.current()
+        if current is None:
+            return self.build(movies)
+        movies = [movie for movie in movies if movie['id'] not in current]
+        if not movies:
+            return None
+
+        path = current.path
+        old = sp.load_npz(os.path.join(path, 'features.npz')).tocsr()
+        with open(os.path.join(path, 'vocab.json')) as f:
+            vocab = json.load(f)
+        idf = np.load(os.path.join(path, 'idf.npy')).tolist()
+        n_old, n_total = old.shape[0], old.shape[0] + len(movies)
+
+        new = self._features(movies, vocab, idf, n_total)
+        old.resize((n_old, len(vocab)))
+        features = sp.vstack([old, new]).tocsr()
+
+        # New movies against everything
+        block = (new @ features.T).toarray()
+        rows = np.arange(len(movies))
+        block[rows, rows + n_old] = -np.inf
+        new_neighbors, new_scores = _top_k(block, self.top_k)
+
+        # Existing movies: current neighbours compete with the new movies
+        old_neighbors = np.asarray(current.neighbors)
+        old_scores = np.where(old_neighbors >= 0, np.asarray(current.scores), -np.inf)
+        candidates = np.hstack([old_neighbors, np.broadcast_to(np.arange(n_old, n_total), (n_old, len(movies)))])
+        candidate_scores = np.hstack([old_scores, block[:, :n_old].T])
+        top, values = _top_k(candidate_scores, self.top_k)
+        merged = np.where(top >= 0, np.take_along_axis(candidates, np.maximum(top, 0), axis=1), -1)
+
+        neighbors = np.full((n_total, self.top_k), -1, dtype=np.int32)
+        scores = np.zeros((n_total, self.top_k), dtype=np.float32)
+        neighbors[:n_old, :merged.shape[1]], scores[:n_old, :values.shape[1]] = merged, values
+        neighbors[n_old:, :new_neighbors.shape[1]], scores[n_old:, :new_scores.shape[1]] = new_neighbors, new_scores
+
+        movie_ids = current.movie_ids + [movie['id'] for movie in movies]
+        return self._save(movie_ids, features, vocab, idf, neighbors, scores, 'add_movies')
+
+    def _save(self, movie_ids, features, vocab, idf, neighbors, scores, how):
+        version, path = self.new_version()
+        np.save(os.path.join(path, 'neighbors.npy'), neighbors)
+        np.save(os.path.join(path, 'scores.npy'), scores)
+        sp.save_npz(os.path.join(path, 'features.npz'), features)
+        np.save(os.path.join(path, 'idf.npy'), np.asarray(idf, dtype=np.float64))
+        with open(os.path.join(path, 'vocab.json'), 'w') as f:
+            json.dump(vocab, f)
+        with open(os.path.join(path, 'movie_ids.json'), 'w') as f:
+            json.dump(movie_ids, f)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': version,
+                'movies': len(movie_ids),
+                'features': len(vocab),
+                'top_k': self.top_k,
+                'weights': self.weights,
+                'how': how
+            }, f, indent=2)
+
+        self.publish(version)
+        # Serve the new version here right away
+        self._checked_at = 0.0
+        self.logger.info(f"💾 Saved similarity index {version} ({how}, {len(movie_ids)} movies)")
+        return version
+
+    def stats(self):
+        index = self.current()
+        if index is None:
+            return {'ready': False}
+        return {'ready': True, 'version': index.version, 'movies': index.meta['movies'], 'top_k': index.meta['top_k']}
+
+def sync_similarity_index(neo4j_service, store, rebuild=False):
+    """
+    Bring the index up to date with the movies in Neo4j: a full build when
+    `rebuild` is set or there is no index yet, else only the new movies.
+    Returns the new version, or None when nothing changed.
+    """
+    current = None if rebuild else store.current()
+    if current is None:
+        return store.build(neo4j_service.stream_query(
+            MOVIE_FEATURES_QUERY, {'ids': None}, timeout=0, name='movie_features'))
+
+    new_ids = [row['id'] for row in neo4j_service.stream_query(MOVIE_IDS_QUERY, timeout=0, name='movie_ids')
+               if row['id'] not in current]
+    if not new_ids:
+        return None
+    return store.add_movies(neo4j_service.execute_query(
+        MOVIE_FEATURES_QUERY, {'ids': new_ids}, timeout=0, name='movie_features'))
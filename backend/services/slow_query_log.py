@@ -0,0 +1,208 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+import json
+import logging
+import os
+import random
+import threading
+
+# Parameter names whose values never reach the log
+SENSITIVE_PARAMS = ('password', 'token', 'secret', 'email', 'review')
+
+MAX_PARAM_STRING = 200
+MAX_PARAM_ITEMS = 10
+
+def redact_params(value, key=None):
+    """Copy of query parameters that is safe to log: secrets masked, big values trimmed"""
+    if key is not None and any(word in str(key).lower() for word in SENSITIVE_PARAMS):
+        return '[REDACTED]'
+    if isinstance(value, dict):
+        return {k: redact_params(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [redact_params(item) for item in value[:MAX_PARAM_ITEMS]]
+        if len(value) > MAX_PARAM_ITEMS:
+            items.append(f"... {len(value) - MAX_PARAM_ITEMS} more ({len(value)} items)")
+        return items
+    if isinstance(value, str) and len(value) > MAX_PARAM_STRING:
+        return value[:MAX_PARAM_STRING] + '...'
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+def summarize_plan(plan):
+    """
+    Flatten a PROFILE/EXPLAIN plan (the dict from ResultSummary.profile or
+    .plan) into total db hits plus one row per operator, depth-first
+    """
+    operators = []
+
+    def walk(node, depth):
+        args = node.get('args', {})
+        operators.append({
+            'operator': node.get('operatorType'),
+            'depth': depth,
+            'db_hits': node.get('dbHits'),
+            'rows': node.get('rows'),
+            'estimated_rows': args.get('EstimatedRows'),
+            'details': args.get('Details')
+        })
+        for child in node.get('children', []):
+            walk(child, depth + 1)
+
+    walk(plan, 0)
+    return {
+        'db_hits': sum(op['db_hits'] or 0 for op in operators),
+        'rows': plan.get('rows'),
+        'operators': operators
+    }
+
+class SlowQueryLog:
+    """
+    Records queries slower than `threshold_ms` to a rotating JSON-lines file.
+
+    A sampled share of slow queries also gets its plan captured on a
+    background thread: reads are re-run under PROFILE (db hits and rows per
+    operator), writes only under EXPLAIN so they are never applied twice.
+    Parameters are redacted before anything is written.
+    """
+
+    def __init__(self, capture=None, threshold_ms=500, sample_rate=0.1, plan_mode='profile',
+                 path=None, max_bytes=5 * 1024 * 1024, backup_count=5,
+                 max_entries=500, max_pending=4):
+        self.capture = capture
+        self.threshold_ms = float(threshold_ms)
+        self.sample_rate = float(sample_rate)
+        self.plan_mode = plan_mode
+        self.path = path
+        self.backup_count = backup_count
+        self.max_pending = max_pending
+
+        self._recent = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None
+
+        self.logger = logging.getLogger('slow_queries')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if path and not self.logger.handlers:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+
+    @classmethod
+    def from_settings(cls, settings, capture=None):
+        """Build a log from SLOW_QUERY_* settings"""
+        return cls(
+            capture=capture,
+            threshold_ms=float(settings.get('SLOW_QUERY_MS', 500)),
+            sample_rate=float(settings.get('SLOW_QUERY_SAMPLE_RATE', 0.1)),
+            plan_mode=settings.get('SLOW_QUERY_PLAN', 'profile'),
+            path=settings.get('SLOW_QUERY_LOG_PATH') or None,
+            max_bytes=int(settings.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024)),
+            backup_count=int(settings.get('SLOW_QUERY_LOG_BACKUPS', 5))
+        )
+
+    @property
+    def enabled(self):
+        return self.threshold_ms > 0
+
+    def observe(self, name, mode, query, parameters, elapsed, user=None):
+        """Log the query if `elapsed` (seconds) is over the threshold"""
+        elapsed_ms = elapsed * 1000
+        if not self.enabled or elapsed_ms < self.threshold_ms:
+            return
+
+        # Per-user traversals take the user as a parameter when not run under a causal chain
+        parameters = parameters or {}
+        if user is None:
+            user = parameters.get('userId') or parameters.get('user_id')
+
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'query_name': name,
+            'mode': mode,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'user': user,
+            'parameters': redact_params(parameters),
+            'query': ' '.join(query.split()),
+            'plan': None
+        }
+
+        if self.capture and self.plan_mode != 'none' and random.random() < self.sample_rate:
+            with self._lock:
+                if self._pending < self.max_pending:
+                    self._pending += 1
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-plan')
+                    self._executor.submit(self._capture_and_write, entry, query, parameters, mode)
+                    return
+
+        self._write(entry)
+
+    def _capture_and_write(self, entry, query, parameters, mode):
+        profile = self.plan_mode == 'profile' and mode == 'read'
+        try:
+            plan = self.capture(query, parameters, profile)
+            if plan:
+                entry['plan'] = dict(summarize_plan(plan), kind='profile' if profile else 'explain')
+        except Exception as e:
+            entry['plan_error'] = str(e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        self._write(entry)
+
+    def _write(self, entry):
+        with self._lock:
+            self._recent.append(entry)
+        self.logger.info(json.dumps(entry, default=str))
+
+    def _read_file_entries(self):
+        """Entries from the rotating files, oldest first"""
+        files = [self.path]
+        files += [f"{self.path}.{i}" for i in range(1, self.backup_count + 1)]
+        entries = []
+        for path in reversed(files):
+            if not os.path.exists(path):
+                continue
+            with open(path) as handle:
+                for line in handle:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        return entries
+
+    def entries(self, limit=50, query_name=None, user=None, min_ms=None):
+        """
+        Most recent slow queries first, optionally filtered. Reads the log
+        files when configured (all workers, survives restarts), otherwise
+        this process's in-memory buffer.
+        """
+        if self.path:
+            entries = self._read_file_entries()
+        else:
+            with self._lock:
+                entries = list(self._recent)
+
+        matches = []
+        for entry in reversed(entries):
+            if query_name and entry.get('query_name') != query_name:
+                continue
+            if user and entry.get('user') != user:
+                continue
+            if min_ms is not None and entry.get('elapsed_ms', 0) < min_ms:
+                continue
+            matches.append(entry)
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def close(self):
+        """Wait for in-flight plan captures (process shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
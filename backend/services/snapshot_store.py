@@ -0,0 +1,131 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+class SnapshotStore:
+    """
+    Last known good response per endpoint key, served while Neo4j is down.
+
+    Snapshots are kept in an in-memory LRU and, when `directory` is set,
+    mirrored to one JSON file per key so a restarted worker can still serve
+    browse pages during an incident. A key's file is rewritten at most every
+    `refresh_seconds` (or sooner when the body changes). A key evicted from
+    the LRU has its file deleted too, and on start the directory is pruned
+    to the `max_entries` most recently written files, so it stays bounded
+    however many distinct keys are seen.
+    """
+
+    def __init__(self, directory=None, max_entries=2000, refresh_seconds=60):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._snapshots = OrderedDict()  # key -> snapshot dict
+        self._lock = threading.Lock()
+        self.served = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._prune()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a store from SNAPSHOT_* settings"""
+        return cls(
+            directory=settings.get('SNAPSHOT_DIR') or None,
+            max_entries=int(settings.get('SNAPSHOT_MAX_ENTRIES', 2000)),
+            refresh_seconds=float(settings.get('SNAPSHOT_REFRESH_SECONDS', 60))
+        )
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def save(self, key, body, mimetype):
+        """Remember `body` (text) as the latest good response for `key`"""
+        now = time.time()
+        with self._lock:
+            previous = self._snapshots.get(key)
+            fresh = (
+                previous is not None
+                and previous['body'] == body
+                and now - previous['persisted_at'] < self.refresh_seconds
+            )
+            snapshot = {
+                'key': key,
+                'body': body,
+                'mimetype': mimetype,
+                'stored_at': now,
+                'persisted_at': previous['persisted_at'] if fresh else now
+            }
+            self._snapshots[key] = snapshot
+            self._snapshots.move_to_end(key)
+            evicted = []
+            while len(self._snapshots) > self.max_entries:
+                evicted.append(self._snapshots.popitem(last=False)[0])
+
+        if self.directory:
+            for evicted_key in evicted:
+                self._remove(self._path(evicted_key))
+        if self.directory and not fresh:
+            try:
+                tmp_path = self._path(key) + '.tmp'
+                with open(tmp_path, 'w') as handle:
+                    json.dump(snapshot, handle)
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                self.logger.warning(f"⚠️ Could not persist snapshot for {key}: {e}")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"⚠️ Could not remove snapshot {path}: {e}")
+
+    def _prune(self):
+        """Delete all but the `max_entries` newest snapshot files, and stray .tmp files"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError as e:
+            self.logger.warning(f"⚠️ Could not list snapshots in {self.directory}: {e}")
+            return
+        snapshots = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if name.endswith('.json.tmp'):
+                self._remove(path)
+            elif name.endswith('.json'):
+                try:
+                    snapshots.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        snapshots.sort(reverse=True)
+        for _, path in snapshots[self.max_entries:]:
+            self._remove(path)
+        if len(snapshots) > self.max_entries:
+            self.logger.info(f"🧹 Pruned {len(snapshots) - self.max_entries} old snapshots from {self.directory}")
+
+    def load(self, key):
+        """Latest snapshot for `key` (dict with body, mimetype, stored_at), or None"""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot is None and self.directory:
+            try:
+                with open(self._path(key)) as handle:
+                    snapshot = json.load(handle)
+            except (OSError, ValueError):
+                return None
+        if snapshot is not None:
+            with self._lock:
+                self.served += 1
+        return snapshot
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._snapshots), 'served': self.served}
@@ -0,0 +1,247 @@
+from services.ann_index import LSHIndex, top_rows
+from services.similarity_index import MOVIE_IDS_QUERY
+from services.versioned_store import VersionedStore
+import json
+import math
+import os
+import re
+import zlib
+import numpy as np
+import scipy.sparse as sp
+
+MOVIE_TEXT_QUERY = """
+MATCH (m:Movie)
+WHERE $ids IS NULL OR m.id IN $ids
+OPTIONAL MATCH (m)-[:STARS]->(a:Actor)
+WITH m, collect(DISTINCT a.name) as actors
+OPTIONAL MATCH (m)-[:DIRECTED_BY]->(d:Director)
+RETURN m.id as id, m.title as title, m.plot as plot, actors, collect(DISTINCT d.name) as directors
+"""
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOP_WORDS = frozenset("""
+a about after again against all an and any are as at be because been before being between both but by
+can could did do does doing down during each few for from further had has have having he her here hers
+him his how i if in into is it its itself just me more most my no nor not now of off on once only or
+other our out over own same she should so some such than that the their them then there these they this
+those through to too under until up very was we were what when where which while who whom why will with
+you your one two new film movie story life
+""".split())
+
+def tokens(movie):
+    """
+    Terms for one movie: plot and title words (title counted twice, stop
+    words dropped) plus each actor and director name as a single term
+    """
+    words = [w for w in _WORD.findall((movie.get('plot') or '').lower()) if w not in STOP_WORDS]
+    title = [w for w in _WORD.findall((movie.get('title') or '').lower()) if w not in STOP_WORDS]
+    names = [
+        'name:' + '_'.join(_WORD.findall(name.lower()))
+        for name in (movie.get('actors') or []) + (movie.get('directors') or []) if name
+    ]
+    return words + title * 2 + names
+
+def hash_counts(terms, n_features):
+    """{bucket: count} with a stable hash (Python's own is salted per process)"""
+    counts = {}
+    for term in terms:
+        bucket = zlib.crc32(term.encode('utf-8')) % n_features
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+def l2_normalize(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.diags(1.0 / norms).dot(matrix).tocsr().astype(np.float32)
+
+class TextVectors:
+    """
+    One built version: L2-normalised TF-IDF rows (movies x hashed terms),
+    memory-mapped from its CSR arrays
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.version = self.meta['version']
+        with open(os.path.join(path, 'movie_ids.json')) as f:
+            self.movie_ids = json.load(f)
+        self.movie_index = {movie_id: row for row, movie_id in enumerate(self.movie_ids)}
+
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode='r')
+        self.matrix = sp.csr_matrix(
+            (load('data.npy'), load('indices.npy'), load('indptr.npy')),
+            shape=(len(self.movie_ids), self.meta['n_features']), copy=False
+        )
+        self.ann = LSHIndex.load(os.path.join(path, 'ann')) if os.path.isdir(os.path.join(path, 'ann')) else None
+
+    def __contains__(self, movie_id):
+        return movie_id in self.movie_index
+
+    def centroid(self, weights):
+        """
+        Normalised weighted mean of the vectors of `weights` ({movie_id: weight});
+        None when none of the movies have vectors
+        """
+        known = [(self.movie_index[movie_id], weight) for movie_id, weight in weights.items()
+                 if movie_id in self.movie_index and weight > 0]
+        if not known:
+            return None
+        rows = np.array([row for row, _ in known])
+        w = sp.csr_matrix(np.array([[weight for _, weight in known]], dtype=np.float32))
+        return l2_normalize(w @ self.matrix[rows])
+
+    def vector(self, movie_id):
+        row = self.movie_index.get(movie_id)
+        return None if row is None else self.matrix[row]
+
+    def scores(self, query, movie_ids):
+        """Cosine of each of `movie_ids` with the `query` row vector (0.0 for unknown movies)"""
+        rows = [self.movie_index.get(movie_id, -1) for movie_id in movie_ids]
+        known = [row for row in rows if row >= 0]
+        if query is None or not known:
+            return [0.0] * len(movie_ids)
+        values = iter((self.matrix[known] @ query.T).toarray().ravel().tolist())
+        return [next(values) if row >= 0 else 0.0 for row in rows]
+
+    def nearest(self, query, limit=10, exclude=()):
+        """
+        [(movie_id, cosine)] of the movies closest to the `query` row vector,
+        best first. Large catalogs are searched through the ANN index.
+        """
+        if query is None:
+            return []
+        skip = [self.movie_index[movie_id] for movie_id in exclude if movie_id in self.movie_index]
+        rows = self.ann.candidates(query) if self.ann is not None else np.arange(len(self.movie_ids))
+        rows = rows[~np.isin(rows, skip)] if skip else rows
+        scores = (self.matrix[rows] @ query.T).toarray().ravel()
+        rows, scores = top_rows(rows, scores, limit)
+        return [(self.movie_ids[row], float(score)) for row, score in zip(rows.tolist(), scores.tolist()) if score > 0]
+
+class TextVectorStore(VersionedStore):
+    """
+    Plot, title and cast text of every movie as hashed TF-IDF vectors
+    (see `build_text_vectors.py`), built offline with no external service.
+
+    Terms are hashed into `n_features` buckets, so new movies can be added
+    without a vocabulary; their rows reuse the saved IDF. Term frequency is
+    sublinear (1 + log tf). Catalogs of `ann_min_items` or more also get an
+    LSH index for `nearest`, which new movies are inserted into.
+    """
+
+    kind = 'text vectors'
+
+    def __init__(self, directory, n_features=2 ** 18, keep_versions=2, reload_seconds=30,
+                 ann_min_items=20000, ann_tables=12):
+        super().__init__(directory, keep_versions, reload_seconds)
+        self.n_features = n_features
+        self.ann_min_items = ann_min_items
+        self.ann_tables = ann_tables
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build a store from TEXT_VECTORS_* settings"""
+        return cls(
+            directory=settings.get('TEXT_VECTORS_DIR', 'text_vectors'),
+            n_features=int(settings.get('TEXT_VECTORS_FEATURES', 2 ** 18)),
+            keep_versions=int(settings.get('TEXT_VECTORS_KEEP_VERSIONS', 2)),
+            reload_seconds=float(settings.get('TEXT_VECTORS_RELOAD_SECONDS', 30)),
+            ann_min_items=int(settings.get('ANN_MIN_ITEMS', 20000)),
+            ann_tables=int(settings.get('ANN_TABLES', 12))
+        )
+
+    def _open(self, path):
+        return TextVectors(path)
+
+    def _term_frequencies(self, movies, n_features):
+        rows, cols, values = [], [], []
+        for row, movie in enumerate(movies):
+            for bucket, count in hash_counts(tokens(movie), n_features).items():
+                rows.append(row)
+                cols.append(bucket)
+                values.append(1.0 + math.log(count))
+        return sp.csr_matrix((values, (rows, cols)), shape=(len(movies), n_features), dtype=np.float32)
+
+    def build(self, movies):
+        """Full build from `movies` (dicts with id/title/plot/actors/directors); returns the new version"""
+        movies = list(movies)
+        tf = self._term_frequencies(movies, self.n_features)
+        df = np.bincount(tf.indices, minlength=self.n_features)
+        idf = (np.log((len(movies) + 1) / (df + 1)) + 1.0).astype(np.float32)
+        matrix = l2_normalize(tf.multiply(idf).tocsr())
+        return self._save([movie['id'] for movie in movies], matrix, idf, self._build_ann(matrix), 'build')
+
+    def _build_ann(self, matrix):
+        # Below ann_min_items a full scan is already sub-millisecond
+        return LSHIndex.build(matrix, n_tables=self.ann_tables) if matrix.shape[0] >= self.ann_min_items else None
+
+    def add_movies(self, movies):
+        """Vectorise movies missing from the current version; returns the new version or None"""
+        current = self.current()
+        if current is None:
+            return self.build(movies)
+        movies = [movie for movie in movies if movie['id'] not in current]
+        if not movies:
+            return None
+
+        idf = np.load(os.path.join(current.path, 'idf.npy'))
+        tf = self._term_frequencies(movies, current.meta['n_features'])
+        new = l2_normalize(tf.multiply(idf).tocsr())
+        matrix = sp.vstack([current.matrix, new]).tocsr()
+        if current.ann is not None:
+            ann = LSHIndex.load(os.path.join(current.path, 'ann'))
+            ann.insert(new)
+        else:
+            ann = self._build_ann(matrix)
+        return self._save(current.movie_ids + [movie['id'] for movie in movies], matrix, idf, ann, 'add_movies')
+
+    def _save(self, movie_ids, matrix, idf, ann, how):
+        version, path = self.new_version()
+        np.save(os.path.join(path, 'data.npy'), matrix.data.astype(np.float32))
+        np.save(os.path.join(path, 'indices.npy'), matrix.indices.astype(np.int32))
+        np.save(os.path.join(path, 'indptr.npy'), matrix.indptr.astype(np.int64))
+        np.save(os.path.join(path, 'idf.npy'), idf)
+        with open(os.path.join(path, 'movie_ids.json'), 'w') as f:
+            json.dump(movie_ids, f)
+        if ann is not None:
+            ann.save(os.path.join(path, 'ann'))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': version,
+                'movies': len(movie_ids),
+                'n_features': matrix.shape[1],
+                'nnz': int(matrix.nnz),
+                'ann': ann is not None,
+                'how': how
+            }, f, indent=2)
+
+        self.publish(version)
+        self._checked_at = 0.0
+        self.logger.info(f"💾 Saved text vectors {version} ({how}, {len(movie_ids)} movies)")
+        return version
+
+    def stats(self):
+        vectors = self.current()
+        if vectors is None:
+            return {'ready': False}
+        return {'ready': True, 'version': vectors.version, 'movies': vectors.meta['movies'], 'nnz': vectors.meta['nnz']}
+
+def sync_text_vectors(neo4j_service, store, rebuild=False):
+    """
+    Bring the vectors up to date with the movies in Neo4j: a full build when
+    `rebuild` is set or nothing is built yet, else only the new movies.
+    Returns the new version, or None when nothing changed.
+    """
+    current = None if rebuild else store.current()
+    if current is None:
+        return store.build(neo4j_service.stream_query(
+            MOVIE_TEXT_QUERY, {'ids': None}, timeout=0, name='movie_text'))
+
+    new_ids = [row['id'] for row in neo4j_service.stream_query(MOVIE_IDS_QUERY, timeout=0, name='movie_ids')
+               if row['id'] not in current]
+    if not new_ids:
+        return None
+    return store.add_movies(neo4j_service.execute_query(
+        MOVIE_TEXT_QUERY, {'ids': new_ids}, timeout=0, name='movie_text'))
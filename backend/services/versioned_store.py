@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+import logging
+import os
+import shutil
+import threading
+import time
+
+CURRENT_FILE = 'CURRENT'
+
+class VersionedStore:
+    """
+    Base for artifacts built offline and served read-only by every worker.
+
+    Each build writes a new `v<timestamp>` directory, then points the
+    CURRENT file at it with an atomic rename, so readers never see a half
+    written version. Readers reopen the current version when it changes,
+    checking at most every `reload_seconds`. The newest `keep_versions`
+    versions are kept for rollback.
+
+    Subclasses implement `_open(path)`, returning the loaded artifact, which
+    must expose a `version` attribute.
+    """
+
+    kind = 'version'
+
+    def __init__(self, directory, keep_versions=3, reload_seconds=30):
+        self.directory = directory
+        self.keep_versions = keep_versions
+        self.reload_seconds = reload_seconds
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._checked_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self, path):
+        raise NotImplementedError
+
+    def _opened(self, loaded):
+        """Hook run on a newly opened version before it is served"""
+
+    def new_version(self):
+        """Create an empty directory for the next version; returns (version, path)"""
+        version = 'v' + datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')
+        path = os.path.join(self.directory, version)
+        os.makedirs(path)
+        return version, path
+
+    def publish(self, version):
+        """Make a fully written version current and prune old ones"""
+        self._point_current(version)
+        for old in self.versions()[self.keep_versions:]:
+            shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+
+    def _point_current(self, version):
+        tmp = os.path.join(self.directory, CURRENT_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.directory, CURRENT_FILE))
+
+    def versions(self):
+        """Saved versions, newest first"""
+        return sorted(
+            (name for name in os.listdir(self.directory)
+             if name.startswith('v') and os.path.isdir(os.path.join(self.directory, name))),
+            reverse=True
+        )
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def rollback(self, version):
+        """Make an older saved version current again"""
+        if version not in self.versions():
+            raise ValueError(f"Unknown {self.kind} {version}")
+        self._point_current(version)
+
+    def current(self):
+        """The current version, opened (None before the first build)"""
+        now = time.monotonic()
+        if self._loaded is not None and now - self._checked_at < self.reload_seconds:
+            return self._loaded
+
+        with self._lock:
+            self._checked_at = now
+            version = self.current_version()
+            if version and (self._loaded is None or self._loaded.version != version):
+                try:
+                    loaded = self._open(os.path.join(self.directory, version))
+                    self._opened(loaded)
+                    self._loaded = loaded
+                    self.logger.info(f"📂 Serving {self.kind} {version}")
+                except Exception as e:
+                    self.logger.error(f"❌ Could not load {self.kind} {version}: {e}")
+            return self._loaded
@@ -0,0 +1,116 @@
+from contextlib import nullcontext
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from routes.ratings import ratings_bp, resolve_bulk_movies, validate_bulk_rows
+
+def test_validate_accepts_ids_titles_and_export_columns():
+    ratings, errors = validate_bulk_rows([
+        {'movie_id': ' m1 ', 'rating': '4.5', 'review': 'good'},
+        {'movie_title': 'Heat', 'movie_year': '1995', 'rating': 5},
+    ])
+    assert errors == []
+    assert ratings == [
+        {'row': 1, 'movie_id': 'm1', 'title': '', 'year': None, 'rating': 4.5, 'review': 'good'},
+        {'row': 2, 'movie_id': '', 'title': 'Heat', 'year': 1995, 'rating': 5.0, 'review': ''},
+    ]
+
+def test_validate_reports_every_bad_row():
+    ratings, errors = validate_bulk_rows([
+        {'rating': 4},
+        {'movie_id': 'm1', 'rating': 'great'},
+        {'movie_id': 'm1', 'rating': 6},
+        {'movie_id': 'm1', 'rating': 3, 'year': 'soon'},
+        {'movie_id': 'm1', 'rating': 3, 'review': 'x' * 1001},
+        {'movie_id': 'm2', 'rating': 1},
+    ])
+    assert [rating['row'] for rating in ratings] == [6]
+    assert [error['row'] for error in errors] == [1, 2, 3, 4, 5]
+    assert errors[0]['message'] == 'Movie ID or title is required'
+    assert errors[2]['message'] == 'Rating must be between 1.0 and 5.0'
+
+class FakeMovies:
+    def execute_query(self, query, parameters=None, name=None):
+        if name == 'bulk_movies_by_id':
+            return [{'movie_id': movie_id} for movie_id in parameters['ids'] if movie_id.startswith('m')]
+        return [
+            {'title': 'Heat', 'movie_id': 'heat-1995', 'year': 1995},
+            {'title': 'Heat', 'movie_id': 'heat-1986', 'year': 1986},
+            {'title': 'Alien', 'movie_id': 'alien', 'year': 1979},
+        ]
+
+def test_resolve_titles_and_check_ids():
+    ratings, _ = validate_bulk_rows([
+        {'movie_id': 'm1', 'rating': 4},
+        {'movie_id': 'x9', 'rating': 4},
+        {'title': 'Alien', 'rating': 4},
+        {'title': 'Heat', 'rating': 4},
+        {'title': 'Heat', 'year': 1995, 'rating': 4},
+        {'title': 'Nope', 'rating': 4},
+    ])
+    resolved, errors = resolve_bulk_movies(FakeMovies(), ratings)
+    assert [rating['movie_id'] for rating in resolved] == ['m1', 'alien', 'heat-1995']
+    assert [error['row'] for error in errors] == [2, 4, 6]
+
+class FakeNeo4j(FakeMovies):
+    """Commits chunks of two rows, then fails on the chunk given by `fail_at`"""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+
+    def causal_chain(self, key):
+        return nullcontext()
+
+    def execute_write_batch(self, query, rows, name=None, touches=None, on_batch=None, **kwargs):
+        results = []
+        for index, offset in enumerate(range(0, len(rows), 2)):
+            if index == self.fail_at:
+                raise ConnectionError('connection reset')
+            chunk = [{'movie_id': row['movie_id'], 'old_rating': None} for row in rows[offset:offset + 2]]
+            results.extend(chunk)
+            on_batch(chunk)
+        return {'results': results}
+
+class RecordingStats:
+    def __init__(self):
+        self.recorded = []
+
+    def record(self, movie_id, rating, old_rating=None):
+        self.recorded.append((movie_id, rating, old_rating))
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY='test-secret-key-of-at-least-32-bytes', BULK_RATINGS_MAX_ROWS=100)
+    JWTManager(app)
+    app.register_blueprint(ratings_bp, url_prefix='/api/ratings')
+    app.movie_stats = RecordingStats()
+    app.rating_matrix = None
+    return app
+
+def post_bulk(app, rows):
+    with app.app_context():
+        token = create_access_token(identity='u1')
+    return app.test_client().post('/api/ratings/bulk', json=rows, headers={'Authorization': f'Bearer {token}'})
+
+def test_bulk_rejects_invalid_rows_before_writing(app):
+    app.neo4j_service = FakeNeo4j()
+    response = post_bulk(app, [{'movie_id': 'm1', 'rating': 4}, {'movie_id': 'm2', 'rating': 9}])
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'row': 2, 'message': 'Rating must be between 1.0 and 5.0'}]
+    assert app.movie_stats.recorded == []
+
+def test_bulk_imports_all_rows(app):
+    app.neo4j_service = FakeNeo4j()
+    response = post_bulk(app, [{'movie_id': f'm{i}', 'rating': 4} for i in range(3)])
+    assert response.status_code == 200
+    assert response.get_json()['imported'] == 3
+    assert response.get_json()['created'] == 3
+    assert len(app.movie_stats.recorded) == 3
+
+def test_bulk_failure_keeps_committed_chunks_counted(app):
+    app.neo4j_service = FakeNeo4j(fail_at=1)
+    response = post_bulk(app, [{'movie_id': f'm{i}', 'rating': 4} for i in range(5)])
+    assert response.status_code == 500
+    assert response.get_json()['imported'] == 2
+    assert [movie_id for movie_id, _, _ in app.movie_stats.recorded] == ['m0', 'm1']
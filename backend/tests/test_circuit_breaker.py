@@ -0,0 +1,103 @@
+import pytest
+from neo4j.exceptions import ServiceUnavailable
+from services import circuit_breaker
+from services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, database_unavailable
+)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', clock)
+    return clock
+
+def breaker(**kwargs):
+    settings = dict(failure_rate=0.5, slow_call_ms=100, slow_call_rate=0.8, window=10, min_calls=4, open_seconds=30)
+    settings.update(kwargs)
+    return CircuitBreaker(**settings)
+
+def trip(b):
+    for _ in range(b.min_calls):
+        b.before_call()
+        b.record_failure(ServiceUnavailable('down'))
+
+def test_stays_closed_below_min_calls(clock):
+    b = breaker()
+    for _ in range(3):
+        b.record_failure(ServiceUnavailable('down'))
+    assert b.state == CLOSED
+    b.before_call()
+
+def test_opens_on_failure_rate_and_rejects(clock):
+    b = breaker()
+    trip(b)
+    assert b.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        b.before_call()
+    assert b.stats()['rejected'] == 1
+    assert b.stats()['trips'] == 1
+
+def test_query_errors_do_not_count(clock):
+    b = breaker()
+    for _ in range(10):
+        b.record_failure(ValueError('bad query'))
+    assert b.state == CLOSED
+    assert b.stats()['recent_calls'] == 0
+
+def test_opens_on_slow_call_rate(clock):
+    b = breaker()
+    for _ in range(4):
+        b.record_success(0.5)
+    assert b.state == OPEN
+
+def test_half_open_lets_one_probe_through(clock):
+    b = breaker()
+    trip(b)
+    clock.now += 30
+    assert b.state == HALF_OPEN
+    b.before_call()
+    with pytest.raises(CircuitOpenError):
+        b.before_call()
+
+def test_successful_probe_closes(clock):
+    b = breaker()
+    trip(b)
+    clock.now += 30
+    b.before_call()
+    b.record_success(0.01)
+    assert b.state == CLOSED
+    b.before_call()
+
+def test_failed_or_slow_probe_reopens(clock):
+    b = breaker()
+    trip(b)
+    clock.now += 30
+    b.before_call()
+    b.record_failure(ServiceUnavailable('still down'))
+    assert b.state == OPEN
+
+    clock.now += 30
+    b.before_call()
+    b.record_success(1.0)
+    assert b.state == OPEN
+    assert b.stats()['trips'] == 3
+
+def test_cancelled_probe_frees_the_slot(clock):
+    b = breaker()
+    trip(b)
+    clock.now += 30
+    b.before_call()
+    b.record_cancelled()
+    b.before_call()
+
+def test_database_unavailable():
+    assert database_unavailable(CircuitOpenError('open'))
+    assert database_unavailable(ServiceUnavailable('down'))
+    assert not database_unavailable(ValueError('bad'))
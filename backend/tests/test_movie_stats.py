@@ -0,0 +1,115 @@
+import json
+import os
+import pytest
+from services.movie_stats import MOVIE_STATS_DELTA_QUERY, MovieStatsQueue
+from services.query_cache import movie_tag
+
+class FakeNeo4j:
+    """Applies MOVIE_STATS_DELTA_QUERY like Neo4j would, once per batch id"""
+
+    def __init__(self):
+        self.totals = {}       # movie_id -> [rating_sum, rating_count]
+        self.batches = set()
+        self.touched = []
+        self.fail = []         # per call: None, 'before' (nothing committed) or 'after' (reply lost)
+
+    def execute_write(self, query, parameters=None, name=None, touches=None):
+        assert query == MOVIE_STATS_DELTA_QUERY
+        failure = self.fail.pop(0) if self.fail else None
+        if failure == 'before':
+            raise ConnectionError('connection reset')
+        if parameters['batch_id'] not in self.batches:
+            self.batches.add(parameters['batch_id'])
+            for row in parameters['rows']:
+                totals = self.totals.setdefault(row['movie_id'], [0.0, 0])
+                totals[0] += row['rating_sum']
+                totals[1] += row['rating_count']
+        self.touched.append(set(touches))
+        if failure == 'after':
+            raise ConnectionError('reply lost')
+        return []
+
+@pytest.fixture
+def neo4j():
+    return FakeNeo4j()
+
+def test_deltas_coalesce_per_movie(neo4j):
+    queue = MovieStatsQueue(neo4j)
+    queue.record('m1', 4.0)
+    queue.record('m1', 2.0, old_rating=4.0)
+    queue.record('m2', 3.0)
+    queue.record('m3', None, old_rating=5.0)
+    assert queue.pending() == 3
+    assert queue.flush() == 3
+    assert neo4j.totals == {'m1': [2.0, 1], 'm2': [3.0, 1], 'm3': [-5.0, -1]}
+    assert queue.pending() == 0
+    assert queue.flush() == 0
+
+def test_net_zero_deltas_are_not_written(neo4j):
+    queue = MovieStatsQueue(neo4j)
+    queue.record('m1', 4.0)
+    queue.record('m1', None, old_rating=4.0)
+    assert queue.flush() == 0
+    assert neo4j.totals == {}
+
+def test_batches_invalidate_only_their_movies(neo4j):
+    queue = MovieStatsQueue(neo4j, batch_size=2)
+    for movie_id in ('m1', 'm2', 'm3'):
+        queue.record(movie_id, 4.0)
+    queue.flush()
+    assert neo4j.touched == [{movie_tag('m1'), movie_tag('m2')}, {movie_tag('m3')}]
+
+def test_failed_batch_is_retried(neo4j):
+    queue = MovieStatsQueue(neo4j)
+    neo4j.fail = ['before']
+    queue.record('m1', 4.0)
+    assert queue.flush() == 0
+    assert queue.pending() == 1
+    assert queue.failures == 1
+    assert queue.flush() == 1
+    assert neo4j.totals == {'m1': [4.0, 1]}
+
+def test_batch_committed_despite_error_is_not_applied_twice(neo4j):
+    queue = MovieStatsQueue(neo4j)
+    neo4j.fail = ['after']
+    queue.record('m1', 4.0)
+    queue.flush()
+    queue.record('m1', 5.0, old_rating=4.0)
+    queue.flush()
+    assert neo4j.totals == {'m1': [5.0, 1]}
+    assert queue.pending() == 0
+
+def test_later_batches_wait_behind_a_failed_one(neo4j):
+    queue = MovieStatsQueue(neo4j, batch_size=1)
+    neo4j.fail = [None, 'before']
+    for movie_id in ('m1', 'm2', 'm3'):
+        queue.record(movie_id, 4.0)
+    assert queue.flush() == 1
+    assert queue.pending() == 2
+    assert queue.flush() == 2
+    assert neo4j.totals == {'m1': [4.0, 1], 'm2': [4.0, 1], 'm3': [4.0, 1]}
+
+def test_stop_spools_what_cannot_be_written_and_start_picks_it_up(neo4j, tmp_path):
+    queue = MovieStatsQueue(neo4j, spool_dir=str(tmp_path))
+    neo4j.fail = ['after', 'before']
+    queue.record('m1', 4.0)
+    queue.flush()
+    queue.record('m2', 3.0)
+    queue.stop()
+    spooled = os.listdir(tmp_path)
+    assert len(spooled) == 1
+    with open(os.path.join(tmp_path, spooled[0])) as f:
+        spool = json.load(f)
+    # Both were cut into batches before failing, so both keep their ids
+    assert spool['pending'] == {}
+    assert len(spool['batches']) == 2
+
+    restarted = MovieStatsQueue(neo4j, spool_dir=str(tmp_path), flush_seconds=60)
+    restarted.start()
+    try:
+        assert restarted.pending() == 2
+        assert restarted.flush() == 2
+    finally:
+        restarted._stop.set()
+    assert os.listdir(tmp_path) == []
+    assert neo4j.totals == {'m1': [4.0, 1], 'm2': [3.0, 1]}
@@ -0,0 +1,83 @@
+from services import query_cache
+from services.query_cache import ANY, QueryCache, cache_key, movie_tag, query_tags
+
+def test_query_tags_reads_labels_and_types():
+    query = """
+    MATCH (u:User {id: $id})-[r:RATED]->(m:Movie:`Film`)
+    OPTIONAL MATCH (m)-[:HAS_GENRE|DIRECTED_BY*1..2]->(g:Genre)
+    RETURN m
+    """
+    assert query_tags(query) == {'User', 'RATED', 'Movie', 'Film', 'HAS_GENRE', 'DIRECTED_BY', 'Genre'}
+
+def test_query_tags_ignores_unlabelled_patterns():
+    assert query_tags("MATCH (n) RETURN n") == frozenset()
+
+def test_cache_key_ignores_whitespace_and_parameter_order():
+    assert cache_key("MATCH  (m)\n RETURN m", {'a': 1, 'b': 2}) == cache_key("MATCH (m) RETURN m", {'b': 2, 'a': 1})
+
+def test_get_returns_copies():
+    cache = QueryCache()
+    cache.put('k', [{'id': 1}], {'Movie'})
+    cache.get('k')[0]['id'] = 2
+    assert cache.get('k') == [{'id': 1}]
+    assert cache.get('missing') is None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+def test_invalidate_drops_only_entries_sharing_a_tag():
+    cache = QueryCache()
+    cache.put('genres', [{'name': 'Drama'}], {'Genre'})
+    cache.put('rated', [{'id': 1}], {'User', 'RATED', 'Movie'})
+    assert cache.invalidate({'RATED'}) == 1
+    assert cache.get('genres') is not None
+    assert cache.get('rated') is None
+
+def test_untagged_entries_go_with_any_write():
+    cache = QueryCache()
+    cache.put('unknown', [{'n': 1}], ())
+    cache.put('genres', [{'name': 'Drama'}], {'Genre'})
+    cache.invalidate({'RATED'})
+    assert cache.get('unknown') is None
+    assert cache.get('genres') is not None
+
+def test_invalidate_without_tags_clears_everything():
+    cache = QueryCache()
+    cache.put('a', [{}], {'Genre'})
+    cache.put('b', [{}], {'Movie'})
+    assert cache.invalidate(()) == 2
+    assert cache.stats()['entries'] == 0
+
+def test_movie_tags_invalidate_one_movie():
+    cache = QueryCache()
+    cache.put('top', [{'id': 'm1'}, {'id': 'm2'}], {'Movie', movie_tag('m1'), movie_tag('m2')})
+    cache.put('recent', [{'id': 'm3'}], {'Movie', movie_tag('m3')})
+    cache.invalidate([movie_tag('m2')])
+    assert cache.get('top') is None
+    assert cache.get('recent') is not None
+
+def test_evicts_least_recently_used_by_count_and_bytes():
+    cache = QueryCache(max_entries=2)
+    cache.put('a', [{}], {'Movie'})
+    cache.put('b', [{}], {'Movie'})
+    cache.get('a')
+    cache.put('c', [{}], {'Movie'})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
+
+    small = QueryCache(max_bytes=40)
+    small.put('a', [{'x': 'y' * 10}], {'Movie'})
+    small.put('b', [{'x': 'y' * 10}], {'Movie'})
+    assert small.get('a') is None
+    small.put('huge', [{'x': 'y' * 100}], {'Movie'})
+    assert small.get('huge') is None
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_cache.time, 'monotonic', lambda: now[0])
+    cache = QueryCache(ttl=10)
+    cache.put('a', [{}], {ANY})
+    now[0] += 9
+    assert cache.get('a') is not None
+    now[0] += 2
+    assert cache.get('a') is None
@@ -0,0 +1,57 @@
+import os
+import time
+from services.snapshot_store import SnapshotStore
+
+def test_save_and_load_in_memory():
+    store = SnapshotStore()
+    store.save('GET /a', '{"a": 1}', 'application/json')
+    snapshot = store.load('GET /a')
+    assert snapshot['body'] == '{"a": 1}'
+    assert snapshot['mimetype'] == 'application/json'
+    assert store.load('GET /missing') is None
+    assert store.stats() == {'entries': 1, 'served': 1}
+
+def test_lru_evicts_oldest():
+    store = SnapshotStore(max_entries=2)
+    store.save('a', '1', 'text/plain')
+    store.save('b', '2', 'text/plain')
+    store.save('a', '1', 'text/plain')
+    store.save('c', '3', 'text/plain')
+    assert store.load('b') is None
+    assert store.load('a') is not None
+    assert store.load('c') is not None
+
+def test_persisted_snapshot_survives_restart(tmp_path):
+    SnapshotStore(str(tmp_path)).save('GET /a', 'body', 'text/plain')
+    snapshot = SnapshotStore(str(tmp_path)).load('GET /a')
+    assert snapshot['body'] == 'body'
+
+def test_unchanged_body_is_not_rewritten_within_refresh(tmp_path):
+    store = SnapshotStore(str(tmp_path), refresh_seconds=60)
+    store.save('k', 'body', 'text/plain')
+    path = store._path('k')
+    os.utime(path, (0, 0))
+    store.save('k', 'body', 'text/plain')
+    assert os.path.getmtime(path) == 0
+    store.save('k', 'changed', 'text/plain')
+    assert os.path.getmtime(path) > 0
+
+def test_evicted_snapshot_files_are_deleted(tmp_path):
+    store = SnapshotStore(str(tmp_path), max_entries=3)
+    for i in range(10):
+        store.save(f'k{i}', 'body', 'text/plain')
+    assert len(os.listdir(tmp_path)) == 3
+    assert store.load('k0') is None
+    assert store.load('k9') is not None
+
+def test_start_prunes_directory_to_newest(tmp_path):
+    store = SnapshotStore(str(tmp_path), max_entries=10)
+    for i in range(5):
+        store.save(f'k{i}', 'body', 'text/plain')
+        os.utime(store._path(f'k{i}'), (time.time() + i, time.time() + i))
+    open(os.path.join(tmp_path, 'stray.json.tmp'), 'w').close()
+
+    pruned = SnapshotStore(str(tmp_path), max_entries=2)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(store._path(f'k{i}')) for i in (3, 4))
+    assert pruned.load('k4') is not None
+    assert pruned.load('k0') is None
@@ -0,0 +1,78 @@
+import os
+import time
+import pytest
+from services.versioned_store import CURRENT_FILE, VersionedStore
+
+class Loaded:
+    def __init__(self, path):
+        self.version = os.path.basename(path)
+        with open(os.path.join(path, 'data.txt')) as f:
+            self.data = f.read()
+
+class TextStore(VersionedStore):
+    kind = 'text'
+
+    def _open(self, path):
+        return Loaded(path)
+
+    def build(self, data, publish=True):
+        time.sleep(0.001)  # versions are named by timestamp
+        version, path = self.new_version()
+        with open(os.path.join(path, 'data.txt'), 'w') as f:
+            f.write(data)
+        if publish:
+            self.publish(version)
+        return version
+
+def test_nothing_current_before_first_build(tmp_path):
+    assert TextStore(str(tmp_path)).current() is None
+
+def test_unpublished_version_is_not_served(tmp_path):
+    store = TextStore(str(tmp_path), reload_seconds=0)
+    store.build('draft', publish=False)
+    assert store.current() is None
+
+def test_publish_swaps_current_atomically(tmp_path):
+    store = TextStore(str(tmp_path), reload_seconds=0)
+    first = store.build('one')
+    assert store.current().data == 'one'
+    second = store.build('two')
+    assert store.current().version == second != first
+    assert store.current().data == 'two'
+    assert not os.path.exists(os.path.join(tmp_path, CURRENT_FILE + '.tmp'))
+
+def test_other_readers_pick_up_a_new_version_after_reload_seconds(tmp_path, monkeypatch):
+    from services import versioned_store
+    now = [100.0]
+    monkeypatch.setattr(versioned_store.time, 'monotonic', lambda: now[0])
+    writer = TextStore(str(tmp_path))
+    reader = TextStore(str(tmp_path), reload_seconds=30)
+    writer.build('one')
+    assert reader.current().data == 'one'
+    writer.build('two')
+    now[0] += 10
+    assert reader.current().data == 'one'
+    now[0] += 30
+    assert reader.current().data == 'two'
+
+def test_old_versions_are_pruned(tmp_path):
+    store = TextStore(str(tmp_path), keep_versions=2, reload_seconds=0)
+    versions = [store.build(str(i)) for i in range(4)]
+    assert store.versions() == versions[:1:-1]
+
+def test_rollback(tmp_path):
+    store = TextStore(str(tmp_path), reload_seconds=0)
+    first = store.build('one')
+    store.build('two')
+    store.rollback(first)
+    assert store.current().data == 'one'
+    with pytest.raises(ValueError):
+        store.rollback('v0')
+
+def test_broken_version_keeps_the_previous_one_served(tmp_path):
+    store = TextStore(str(tmp_path), reload_seconds=0)
+    store.build('one')
+    assert store.current().data == 'one'
+    version, _ = store.new_version()
+    store.publish(version)  # no data.txt: fails to open
+    assert store.current().data == 'one'
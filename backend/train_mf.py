@@ -0,0 +1,64 @@
+"""
+Matrix Factorization Trainer
+Trains ALS user/movie factors on every rating in Neo4j and saves them as a
+new version under MF_MODEL_DIR, where the API workers pick it up.
+
+Usage (from backend/):
+    python train_mf.py
+    python train_mf.py --factors 96 --iterations 20 --reg 0.05
+    python train_mf.py --rollback v20250101120000000000
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import config
+from services.neo4j_service import Neo4jService
+from services.factor_model import FactorStore, train_and_save
+from services.rating_matrix import ALL_RATINGS_QUERY
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def train(settings, factors=None, iterations=None, reg=None, workers=None):
+    """Train on the current ratings and publish the model; returns its version"""
+    store = FactorStore.from_settings(settings)
+    neo4j = Neo4jService(settings)
+    try:
+        ratings = neo4j.stream_query(ALL_RATINGS_QUERY, timeout=0, name='all_ratings')
+        return train_and_save(
+            ratings, store,
+            factors=factors or settings['MF_FACTORS'],
+            reg=reg if reg is not None else settings['MF_REGULARIZATION'],
+            iterations=iterations or settings['MF_ITERATIONS'],
+            workers=workers or settings['MF_WORKERS'] or None,
+            log=lambda i, rmse: print(f"   iteration {i}: train RMSE {rmse:.4f}")
+        )
+    finally:
+        neo4j.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--factors', type=int)
+    parser.add_argument('--iterations', type=int)
+    parser.add_argument('--reg', type=float)
+    parser.add_argument('--workers', type=int, help='Solver threads (default: CPU count)')
+    parser.add_argument('--rollback', metavar='VERSION', help='Make a saved version current instead of training')
+    args = parser.parse_args()
+
+    config_class = config[os.getenv('FLASK_ENV', 'development')]
+    settings = {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+
+    if args.rollback:
+        FactorStore.from_settings(settings).rollback(args.rollback)
+        print(f"✅ Serving factor model {args.rollback}")
+        return
+
+    print("🧮 Training matrix factorization model...")
+    version = train(settings, args.factors, args.iterations, args.reg, args.workers)
+    print(f"✅ Saved factor model {version}")
+
+if __name__ == "__main__":
+    main()